@@ -1,27 +1,17 @@
 # app.py
 import os
-import json
-import sqlite3
-from datetime import date, datetime
-from typing import Dict, Any, Optional
+import time
+from datetime import date
 
-import pandas as pd
-import numpy as np
 import streamlit as st
-import plotly.express as px
 
-from utils.storage import Storage, ensure_settings
-from utils.reporting import (
-    compute_closed_pnl, compute_open_pnl,
-    currency_totals, best_trades, goal_progress, days_held_col, roi_col
-)
-from utils.llm import get_trade_insights
+from utils import profiler, perf
 from utils.ui import (
-    app_header, sidebar_nav, currency_badge, show_toast,
+    app_header, sidebar_nav, sync_status, currency_badge, show_toast, profile_panel, trade_browser, perf_panel,
     market_to_currency_default, sectors_list, trade_types_list
 )
-from utils.github_sync import maybe_sync_csv_to_github
 
+profiler.start_run()
 st.set_page_config(page_title="Trading Journal", layout="wide", page_icon="📈")
 
 
@@ -48,34 +38,60 @@ def check_auth() -> bool:
 
 
 if not check_auth():
+    profiler.first_render("Login")
     st.stop()
 
+# Heavy modules load after sign-in, so the login screen only pays for streamlit.
+# Page-only dependencies (plotly, the LLM/bars stack, importer, analytics) are imported
+# in their page below; either way they stay in sys.modules across reruns.
+with profiler.phase("core"):
+    import pandas as pd
+    from utils.storage import BACKENDS, BROWSE_SORTS
+    from utils.reporting import compute_open_pnl, compute_closed_pnl, fx_to_base
+    from utils.cache import (get_user_storage, load_settings, monthly_counts, month_report, browse_trades,
+                             statement)
+    from utils.github_sync import maybe_sync_csv_to_github, get_sync_worker
+
 
 # -------------------- Init storage & settings --------------------
 backend_default = "sqlite"
-storage = Storage(backend=os.environ.get("JOURNAL_BACKEND", backend_default))
-settings = ensure_settings(storage)
+# one partition per user (data/users/<name>/: trades, settings, caches), cached per process:
+# reruns reuse the Storage and only re-read data after a write
+storage = get_user_storage(st.session_state.get("user", "local"),
+                           os.environ.get("JOURNAL_BACKEND", backend_default))
+settings = load_settings(storage)
 
 # -------------------- UI Header --------------------
 app_header("My Trade Journal")
 
 # -------------------- Sidebar Navigation --------------------
 page = sidebar_nav()
+sync_worker = get_sync_worker(storage)  # starts the background push (and any pending one)
+if sync_worker is not None:
+    sync_status(sync_worker.status())
+
+page_started = time.perf_counter()
+
+
+def chart(make, *args, **kwargs):
+    # build + send a plotly figure, timed as render.plotly
+    with perf.timer("render.plotly"):
+        st.plotly_chart(make(*args, **kwargs), use_container_width=True)
 
-# -------------------- Helper: load trades df --------------------
-def load_trades_df() -> pd.DataFrame:
-    df = storage.read_trades()
-    if df.empty:
-        # enforce dtypes/columns
-        cols = ["id","user","market","symbol","currency","sector","trade_type",
-                "entry_date","exit_date","qty","entry_price","exit_price",
-                "capital_invested","sl","target","notes","created_at","updated_at"]
-        return pd.DataFrame(columns=cols)
-    return df
 
+# -------------------- Helper: report columns --------------------
+# Columns the Monthly Report renders; everything else stays in storage.
+REPORT_COLUMNS = ["id","market","symbol","currency","sector","trade_type",
+                  "entry_date","exit_date","qty","entry_price","exit_price",
+                  "capital_invested","sl","target","notes"]
+# what the report metrics read (typed, via Storage.load_trades); notes come in per browser page
+METRIC_COLUMNS = [c for c in REPORT_COLUMNS if c != "notes"]
 
 # -------------------- Page: Record Trade --------------------
 if page == "Record Trade":
+    with profiler.phase("page"):
+        from utils.llm import get_insight_service
+        from utils.planner import load_watchlist, plan_watchlist
     with st.container(border=True):
         st.subheader("➕ Record a Trade")
         c1, c2, c3 = st.columns(3)
@@ -128,6 +144,55 @@ if page == "Record Trade":
             show_toast("Trade saved ✅")
             st.rerun()
 
+    # Scale in / out: fills go to the position ledger, matched into lots per symbol
+    with st.container(border=True):
+        st.subheader("🔁 Scale In / Out")
+        user = st.session_state.get("user", "local")
+        t_close, t_fill = st.tabs(["Close / partial close a trade", "Add a fill"])
+        with t_close:
+            k1, k2, k3, k4 = st.columns(4)
+            close_id = k1.number_input("Trade ID", min_value=0, step=1, value=0)
+            close_qty = k2.number_input("Quantity to close", min_value=0.0, step=1.0)
+            close_px = k3.number_input("Exit Price", min_value=0.0, format="%.4f", key="close_px")
+            close_dt = k4.date_input("Exit Date", value=date.today(), key="close_dt")
+            if st.button("Record exit", use_container_width=True):
+                try:
+                    storage.close_trade(int(close_id), close_qty, close_px, close_dt, user=user)
+                except ValueError as e:
+                    st.error(str(e))
+                else:
+                    maybe_sync_csv_to_github(storage)  # a full close rewrites the trade row
+                    show_toast(f"Closed {close_qty:g} of trade {int(close_id)} ✅")
+        with t_fill:
+            f1, f2, f3 = st.columns(3)
+            f_market = f1.selectbox("Market", ["India", "US", "Australia"], index=2, key="fill_mkt")
+            f_symbol = f1.text_input("Symbol", key="fill_sym")
+            f_side = f2.radio("Side", ["BUY", "SELL"], horizontal=True)
+            f_date = f2.date_input("Date", value=date.today(), key="fill_dt")
+            f_qty = f3.number_input("Quantity", min_value=0.0, step=1.0, key="fill_qty")
+            f_px = f3.number_input("Price", min_value=0.0, format="%.4f", key="fill_px")
+            f_fees = f3.number_input("Fees", min_value=0.0, format="%.2f", key="fill_fees")
+            if st.button("Add fill", use_container_width=True):
+                try:
+                    storage.add_fills([{"user": user, "market": f_market, "symbol": f_symbol.strip().upper(),
+                                        "currency": market_to_currency_default(f_market), "side": f_side,
+                                        "date": str(f_date), "qty": f_qty, "price": f_px, "fees": f_fees}])
+                except ValueError as e:
+                    st.error(str(e))
+                else:
+                    show_toast("Fill recorded ✅")
+        positions = storage.open_positions(user)
+        if not positions.empty:
+            st.caption(f"Open positions ({storage.ledger.method.upper()} matching)")
+            st.dataframe(positions.drop(columns=["user", "exit_price"]), use_container_width=True, hide_index=True)
+
+    with st.expander("🔎 Browse trades"):
+        user = st.session_state.get("user", "local")
+        trade_browser(lambda search, sort, descending, after: browse_trades(
+                          storage, user=user, search=search, sort=sort, descending=descending, after=after,
+                          columns=REPORT_COLUMNS),
+                      list(BROWSE_SORTS), key="all_browser")
+
     # AI Insights panel
     with st.container(border=True):
         st.subheader("🤖 AI Insights (optional)")
@@ -144,77 +209,267 @@ if page == "Record Trade":
             risk_perc = st.slider("Baseline Risk %", 0.2, 3.0, 1.0, 0.1,
                                   help="Used by the heuristic when LLM is unavailable.")
         if st.button("Get AI Suggestion"):
-            ai_text = get_trade_insights(mkt_ai, sym_ai, entry_ai, type_ai, baseline_risk_pct=risk_perc)
-            st.markdown(ai_text)
+            # heuristic shows immediately; the LLM answer streams in without blocking the page
+            st.session_state.ai_job = get_insight_service().request(
+                mkt_ai, sym_ai, entry_ai, type_ai, baseline_risk_pct=risk_perc)
+        ai_job = st.session_state.get("ai_job")
+        if ai_job is not None and ai_job.done:
+            st.markdown(ai_job.text())
+            if ai_job.cached:
+                st.caption("Cached suggestion.")
+            elif ai_job.timed_out or ai_job.error:
+                st.caption("LLM unavailable; showing the rule-based suggestion.")
+        elif ai_job is not None:
+            @st.fragment(run_every=0.5)
+            def ai_stream():
+                job = st.session_state.ai_job
+                st.markdown(job.text())
+                if job.done:
+                    st.rerun()  # stop polling
+                st.caption("⏳ Waiting for the LLM…")
+            ai_stream()
+
+        with st.expander("Batch planner (watchlist)"):
+            st.caption("Upload a CSV with `symbol` and optionally `market`, `entry`, `bias`, `risk_pct`. "
+                       "SL/T1/T2 use the same ATR rules as above, from cached daily bars; a blank entry "
+                       "uses the last close.")
+            wl_file = st.file_uploader("Watchlist CSV", type=["csv"], key="wl_file")
+            risk_amt = st.number_input("Risk per trade (cash, for position size)", min_value=0.0, value=0.0,
+                                       step=50.0, key="wl_risk")
+            if wl_file is not None and st.button("Plan watchlist"):
+                try:
+                    plan = plan_watchlist(load_watchlist(wl_file), risk_amount=risk_amt or None)
+                except ValueError as e:
+                    st.error(str(e))
+                else:
+                    st.dataframe(plan, use_container_width=True, hide_index=True)
+                    st.download_button("Download plan (CSV)", plan.to_csv(index=False).encode(),
+                                       file_name=f"watchlist_plan_{date.today()}.csv", mime="text/csv")
+
+
+# -------------------- Page: Import Trades --------------------
+elif page == "Import Trades":
+    with profiler.phase("page"):
+        from utils.importer import import_trades, load_mapping, default_mapping_yaml
+    st.subheader("📥 Import Broker Statement")
+    st.caption("Upload a CSV export from your broker. Rows are validated, de-duplicated against "
+               "trades already in the journal, and saved in batches. Adjust the mapping if your "
+               "broker uses different column names or exchange codes.")
+    upload = st.file_uploader("Broker CSV export", type=["csv"])
+    mapping_text = st.text_area("Column / market / currency mapping (YAML)",
+                                value=default_mapping_yaml(), height=260)
+    dry_run = st.checkbox("Dry run (validate only, don't save)")
+    if upload is not None and st.button("Import", type="primary", use_container_width=True):
+        try:
+            mapping = load_mapping(text=mapping_text)
+        except Exception as e:
+            st.error(f"Invalid mapping: {e}")
+            st.stop()
+        status = st.empty()
+        res = import_trades(storage, upload, st.session_state.get("user", "local"), mapping,
+                            dry_run=dry_run,
+                            progress=lambda s: status.caption(f"{s['read']:,} rows read "
+                                                              f"({s['rows_per_sec']:,.0f} rows/sec)"))
+        i1, i2, i3, i4 = st.columns(4)
+        i1.metric("Imported" if not dry_run else "Would import", f"{res['inserted']:,}")
+        i2.metric("Duplicates skipped", f"{res['duplicates']:,}")
+        i3.metric("Rejected", f"{res['rejected']:,}")
+        i4.metric("Throughput", f"{res['rows_per_sec']:,.0f} rows/s")
+        for err in res["errors"]:
+            st.warning(err)
+        if res["inserted"] and not dry_run:
+            maybe_sync_csv_to_github(storage)  # if CSV backend & secrets provided
+            show_toast(f"Imported {res['inserted']:,} trades ✅")
 
 
 # -------------------- Page: Monthly Report --------------------
 elif page == "Monthly Report":
+    with profiler.phase("page"):
+        import plotly.express as px
     st.subheader("📊 Dashboard & Monthly Report")
-    df = load_trades_df()
-    if df.empty:
-        st.info("No trades yet. Record trades to see reports.")
+    user = st.session_state.get("user", "local")
+    counts = monthly_counts(storage, user=user)
+    if counts.empty:
+        st.info("No trades yet. Record trades with an Entry Date to see reports.")
     else:
-        # derived fields
-        df["entry_date"] = pd.to_datetime(df["entry_date"], errors="coerce")
-        df["exit_date"] = pd.to_datetime(df["exit_date"], errors="coerce")
-        df["days_held"] = days_held_col(df)
-        df["roi_pct"] = roi_col(df)
-
         # Month options
-        month_opts = sorted(df["entry_date"].dropna().dt.to_period("M").unique().astype(str))
-        if not month_opts:
-            st.info("No dated entries yet. Add at least one trade with an Entry Date.")
+        month_opts = counts["ym"].tolist()
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            sel_month = st.selectbox("Month (by entry)", month_opts, index=len(month_opts) - 1)
+        with col2:
+            rep_ccy = st.selectbox("Reporting Currency (base)", ["AUD", "USD", "INR"],
+                                   index=["AUD","USD","INR"].index(settings["base_currency"]))
+        with col3:
+            show_open = st.checkbox("Include open trades (est. P&L)", value=True)
+        with col4:
+            goal_by_ccy = st.selectbox("Goal currency for progress", ["All (base)", "AUD", "USD", "INR"], index=0)
+
+        # a closed month with an up-to-date pre-rendered statement (python -m utils.statements) is
+        # served from it; open P&L on still-open trades and per-currency goals need the live view
+        stmt = None
+        if goal_by_ccy == "All (base)":
+            stmt = statement(storage, user, sel_month, rep_ccy)
+        if stmt is not None and show_open and stmt["summary"]["open_trades"]:
+            stmt = None
+        if stmt is not None and st.toggle("Live view", key="stmt_live",
+                                          help=f"Statement rendered {stmt['rendered_at']}; recompute instead"):
+            stmt = None
+        if stmt is not None:
+            report, derived, open_pnl = stmt["summary"], stmt["derived"], 0.0
+        else:
+            # compute (only the selected month's rows are loaded)
+            mdf, report = month_report(storage, user, sel_month, METRIC_COLUMNS, goal_by_ccy, settings, base=rep_ccy)
+            open_pnl = compute_open_pnl(mdf, fx_rate=report["fx_rate"]) if show_open else 0.0
+            derived = mdf[["id", "days_held", "roi_pct", "pnl_base"]]
+        closed_pnl = report["closed_pnl_base"]
+
+        # currency totals (converted to the reporting currency)
+        totals_base = report["currency_totals_base"]
+        progress = report["goal_base"] if goal_by_ccy == "All (base)" else report["goal"]
+        goal_ccy_label = rep_ccy if goal_by_ccy == "All (base)" else goal_by_ccy
+
+        # top row metrics
+        m1, m2, m3, m4 = st.columns(4)
+        m1.metric(f"Closed P&L ({rep_ccy})", f"{closed_pnl:,.2f}",
+                  help=f"Native currencies sum: {report['closed_pnl']:,.2f}")
+        m2.metric(f"Open P&L (est., {rep_ccy})", f"{open_pnl:,.2f}")
+        m3.metric(f"Goal Progress ({goal_ccy_label})", f"{progress['progress_pct']:.1f}%",
+                  help=f"Goal {progress['goal']:,.2f} {goal_ccy_label}; Achieved {progress['achieved']:,.2f} {goal_ccy_label}")
+        m4.metric("Best Trade (ROI%)", f"{report['best'].get('best_roi_pct','N/A')}")
+
+        # lot-level P&L from the position ledger (scale-ins/outs), if any fills were recorded
+        lots = storage.realized_lots(user, sel_month)
+        positions = storage.open_positions(user)
+        positions = positions if show_open else positions.iloc[:0]
+        if not lots.empty or not positions.empty:
+            fx_all = storage.fx_rates()
+            lot_rate = fx_to_base(lots["currency"], lots["exit_date"], rep_ccy, fx_all, settings)
+            pos_rate = fx_to_base(positions["currency"], [date.today()] * len(positions), rep_ccy, fx_all, settings)
+            l1, l2, l3 = st.columns(3)
+            l1.metric(f"Ledger realized P&L ({rep_ccy})", f"{compute_closed_pnl(lots, fx_rate=lot_rate):,.2f}",
+                      help="Lots closed this month (by exit date), net of fees")
+            l2.metric(f"Ledger open P&L (est., {rep_ccy})",
+                      f"{compute_open_pnl(positions, fx_rate=pos_rate) if len(positions) else 0.0:,.2f}")
+            l3.metric("Lots closed", f"{len(lots):,}")
+
+        if report["fx_missing"]:
+            st.warning(f"No FX rate to {rep_ccy} for {report['fx_missing']} trade(s); they are left out of "
+                       f"{rep_ccy} totals. Add rates in Settings.")
+
+        st.divider()
+        if stmt is not None:
+            st.caption(f"📄 Pre-rendered statement ({stmt['rendered_at']})")
+            d1, d2, d3 = st.columns(3)
+            for col, (fmt, data) in zip((d1, d2, d3), stmt["downloads"].items()):
+                col.download_button(f"Download {fmt.upper()}", data, file_name=f"statement-{sel_month}.{fmt}",
+                                    use_container_width=True, key=f"stmt_{fmt}")
+            cA, cB = st.columns([1.2, 1.0])
+            with perf.timer("render.plotly"):
+                cA.plotly_chart(stmt["charts"]["by_currency"], use_container_width=True)
+                cB.plotly_chart(stmt["charts"]["per_month"], use_container_width=True)
         else:
-            col1, col2, col3, col4 = st.columns(4)
-            with col1:
-                sel_month = st.selectbox("Month (by entry)", month_opts, index=len(month_opts) - 1)
-            with col2:
-                rep_ccy = st.selectbox("Reporting Currency (base)", ["AUD", "USD", "INR"],
-                                       index=["AUD","USD","INR"].index(settings["base_currency"]))
-            with col3:
-                show_open = st.checkbox("Include open trades (est. P&L)", value=True)
-            with col4:
-                goal_by_ccy = st.selectbox("Goal currency for progress", ["AUD", "USD", "INR"], index=0)
-
-            # compute
-            month_mask = df["entry_date"].dt.to_period("M").astype(str) == sel_month
-            mdf = df.loc[month_mask].copy()
-            closed_pnl = compute_closed_pnl(mdf)
-            open_pnl = compute_open_pnl(mdf) if show_open else 0.0
-
-            # currency totals
-            totals_native = currency_totals(mdf)
-            progress = goal_progress(mdf, goal_by_ccy, settings)
-
-            # top row metrics
-            m1, m2, m3, m4 = st.columns(4)
-            m1.metric("Closed P&L (native currencies sum)", f"{closed_pnl:,.2f}")
-            m2.metric("Open P&L (est.)", f"{open_pnl:,.2f}")
-            m3.metric(f"Goal Progress ({goal_by_ccy})", f"{progress['progress_pct']:.1f}%",
-                      help=f"Goal {progress['goal']} {goal_by_ccy}; Achieved {progress['achieved']} {goal_by_ccy}")
-            m4.metric("Best Trade (ROI%)", f"{best_trades(mdf).get('best_roi_pct','N/A')}")
-
-            st.divider()
             cA, cB = st.columns([1.2, 1.0])
             with cA:
                 # By currency bar
-                cur_df = pd.DataFrame([{"currency": k, "pnl": v} for k, v in totals_native.items()])
+                cur_df = pd.DataFrame([{"currency": k, "pnl": v} for k, v in totals_base.items()])
                 if not cur_df.empty:
-                    fig = px.bar(cur_df, x="currency", y="pnl", title="P&L by Currency (native)", text_auto=True)
-                    st.plotly_chart(fig, use_container_width=True)
+                    chart(px.bar, cur_df, x="currency", y="pnl", title=f"P&L by Currency (in {rep_ccy})", text_auto=True)
                 else:
                     st.write("No P&L yet for this month.")
 
             with cB:
                 # Trades by month count
-                df["ym"] = df["entry_date"].dt.to_period("M").astype(str)
-                cnt = df.groupby("ym")["id"].count().reset_index().rename(columns={"id": "trades"})
-                fig2 = px.line(cnt, x="ym", y="trades", markers=True, title="Trades per Month")
-                st.plotly_chart(fig2, use_container_width=True)
-
-            st.subheader("Trades (this month)")
-            st.dataframe(mdf.sort_values("entry_date", ascending=False),
+                chart(px.line, counts, x="ym", y="trades", markers=True, title="Trades per Month")
+
+        st.subheader("Trades (this month)")
+
+        def month_page(search, sort, descending, after):
+            rows, nxt = browse_trades(storage, user=user, month=sel_month, search=search, sort=sort,
+                                      descending=descending, after=after, columns=REPORT_COLUMNS)
+            return rows.merge(derived, on="id", how="left"), nxt
+        trade_browser(month_page, list(BROWSE_SORTS), key="month_browser")
+
+
+# -------------------- Page: Analytics --------------------
+elif page == "Analytics":
+    with profiler.phase("page"):
+        import plotly.express as px
+        from utils.cache import analytics
+        from utils.analytics import SHARPE_WINDOW
+    st.subheader("📈 Performance Analytics")
+    user = st.session_state.get("user", "local")
+    a1, a2, a3 = st.columns(3)
+    with a1:
+        an_ccy = st.selectbox("Reporting Currency (base)", ["AUD", "USD", "INR"],
+                              index=["AUD","USD","INR"].index(settings["base_currency"]), key="an_ccy")
+    with a2:
+        start_cap = st.number_input(f"Starting capital ({an_ccy})", min_value=0.0, value=0.0, step=1000.0,
+                                    help="0 = returns are measured on capital deployed in open trades.")
+    with a3:
+        sharpe_win = st.number_input("Rolling Sharpe window (days)", min_value=5, max_value=504,
+                                     value=SHARPE_WINDOW, step=1)
+    res = analytics(storage, user, settings, base=an_ccy, start_capital=start_cap, window=sharpe_win)
+    summ, curve = res["summary"], res["curve"]
+    if summ["trades"] == 0:
+        st.info("No closed trades yet. Analytics need trades with an exit date and price.")
+    else:
+        def _fmt(v, spec=",.2f", suffix=""):
+            return "N/A" if v is None or pd.isna(v) else f"{v:{spec}}{suffix}"
+        k1, k2, k3, k4, k5, k6 = st.columns(6)
+        k1.metric(f"Realized P&L ({an_ccy})", _fmt(summ["pnl"]), help=f"{summ['trades']:,} closed trades")
+        k2.metric("Win rate", _fmt(summ["win_rate"], ".1f", "%"))
+        k3.metric("Profit factor", _fmt(summ["profit_factor"]))
+        k4.metric(f"Expectancy ({an_ccy})", _fmt(summ["expectancy"]))
+        k5.metric("Avg R-multiple", _fmt(summ["avg_r"]), help="P&L / planned risk (qty × |entry − SL|)")
+        k6.metric(f"Max drawdown ({an_ccy})", _fmt(summ["max_drawdown"]),
+                  help=f"{_fmt(summ['max_drawdown_pct'], '.1f', '%')} of peak; latest rolling Sharpe "
+                       f"{_fmt(summ['sharpe'])}")
+
+        chart(px.line, curve, x="date", y=["equity", "peak"], title=f"Equity curve ({an_ccy})")
+        cD, cS = st.columns(2)
+        with cD:
+            chart(px.area, curve, x="date", y="drawdown", title="Drawdown")
+        with cS:
+            chart(px.line, curve, x="date", y="rolling_sharpe",
+                  title=f"Rolling Sharpe ({int(sharpe_win)}d, annualized)")
+
+        st.subheader("Breakdown")
+        tabs = st.tabs(["Sector", "Strategy", "Market", "Month"])
+        for tab, dim in zip(tabs, ["sector", "trade_type", "market", "month"]):
+            with tab:
+                g = res["groups"][dim].reset_index()
+                chart(px.bar, g, x=dim, y="pnl", title=f"P&L by {dim.replace('_', ' ')} ({an_ccy})",
+                      hover_data=["trades", "win_rate", "profit_factor", "avg_r"])
+                st.dataframe(g.round(2), use_container_width=True, hide_index=True)
+
+    with st.expander("🎯 Plan replay: SL / target vs what you did"):
+        st.caption("Walks each trade's daily bars from entry to exit (to today while open) and checks whether "
+                   "its SL or target was hit first. Plan P&L exits there; MAE/MFE are the worst/best move "
+                   "against/for the trade. Uses cached bars; only changed trades are recomputed.")
+        fetch_bars = st.checkbox("Fetch missing daily bars first (network)", value=False, key="replay_fetch")
+        if st.toggle("Run replay", key="replay_on"):
+            from utils.cache import get_replayer, load_trades
+            from utils.replay import replay_summary
+            jdf = load_trades(storage, user=user)
+            with st.spinner("Replaying plans..."):
+                rep = get_replayer(storage.data_dir).run(jdf, fetch=fetch_bars)
+            as_of = jdf["exit_date"].fillna(pd.Timestamp.today().normalize())
+            rs = replay_summary(rep, fx_to_base(jdf["currency"], as_of, an_ccy, storage.fx_rates(), settings))
+            r1, r2, r3, r4 = st.columns(4)
+            r1.metric("SL hit first", f"{rs['sl'] + rs['both']:,}",
+                      help=f"{rs['both']:,} hit SL and target on the same bar (counted as SL)")
+            r2.metric("Target hit first", f"{rs['target']:,}",
+                      help=f"{rs['none']:,} hit neither; {rs['no_bars']:,} have no cached bars")
+            r3.metric(f"Plan-followed P&L ({an_ccy})", f"{rs['plan_pnl']:,.2f}",
+                      delta=f"{rs['plan_pnl'] - rs['actual_pnl']:,.2f} vs actual")
+            r4.metric("Avg MAE / MFE", f"{rs['avg_mae_pct']:.1f}% / {rs['avg_mfe_pct']:.1f}%")
+            gaps = rep.assign(symbol=jdf["symbol"].astype(str).to_numpy(), entry_date=jdf["entry_date"].to_numpy(),
+                              plan_minus_actual=rep["plan_pnl"] - rep["actual_pnl"])
+            gaps = gaps.reindex(gaps["plan_minus_actual"].abs().sort_values(ascending=False).index[:50])
+            st.caption("Largest gaps between the plan and the actual exit (native currency)")
+            money = ["plan_exit", "plan_pnl", "actual_pnl", "plan_minus_actual", "mae_pct", "mfe_pct"]
+            st.dataframe(gaps[["id", "symbol", "entry_date", "outcome", "hit_date"] + money].round(dict.fromkeys(money, 2)),
                          use_container_width=True, hide_index=True)
 
 
@@ -222,10 +477,10 @@ elif page == "Monthly Report":
 elif page == "Settings":
     st.subheader("⚙️ Settings")
     # Backend
-    be = st.selectbox("Storage backend", ["sqlite", "csv"], index=["sqlite", "csv"].index(storage.backend))
+    be = st.selectbox("Storage backend", BACKENDS, index=BACKENDS.index(storage.backend),
+                      help="Switching doesn't copy trades; use `python -m utils.storage migrate --from X --to Y`.")
     if st.button("Switch Backend"):
-        storage.backend = be
-        storage.save_backend_choice(be)
+        storage.switch_backend(be)
         st.success(f"Backend switched to {be}.")
         st.rerun()
 
@@ -250,10 +505,48 @@ elif page == "Settings":
         new_settings["fx_to_base"] = {"AUD": fx_aud, "USD": fx_usd, "INR": fx_inr}
         new_settings["goals"] = {"AUD": g_aud, "USD": g_usd, "INR": g_inr}
         storage.save_settings(new_settings)
+        # today's manual rates also go into the dated FX history used by reports
+        storage.save_fx_rates(pd.DataFrame({"date": str(date.today()), "currency": ["AUD", "USD", "INR"],
+                                            "base": bc, "rate": [fx_aud, fx_usd, fx_inr]}))
         st.success("Settings saved.")
         st.rerun()
 
+    # FX history
+    with st.expander("FX rate history"):
+        st.caption("Reports convert each trade at the rate in effect on its exit date (entry date while open). "
+                   "Upload a CSV with `date, currency, rate` and optionally `base` (defaults to the base currency "
+                   "above); `rate` is units of base for 1 unit of currency. Trades before the first rate fall back "
+                   "to the FX to Base values above.")
+        fx_file = st.file_uploader("FX rates CSV", type=["csv"], key="fx_file")
+        if fx_file is not None and st.button("Import FX rates"):
+            fx_df = pd.read_csv(fx_file)
+            fx_df.columns = [c.strip().lower() for c in fx_df.columns]
+            if "base" not in fx_df.columns:
+                fx_df["base"] = bc
+            missing = [c for c in ("date", "currency", "rate") if c not in fx_df.columns]
+            if missing:
+                st.error(f"FX CSV is missing column(s): {', '.join(missing)}")
+            else:
+                st.success(f"Saved {storage.save_fx_rates(fx_df):,} FX rate(s).")
+        fx_hist = storage.fx_rates()
+        st.dataframe(fx_hist.tail(200), use_container_width=True, hide_index=True)
+
+    # Monthly statements
+    with st.expander("Monthly statements"):
+        st.caption("Renders an HTML/CSV/XLSX statement per month into the journal's `statements/` folder; "
+                   "unchanged months are skipped. The Monthly Report serves closed months from them. "
+                   "Batch runs: `python -m utils.statements --all-users`.")
+        if st.button("Render statements"):
+            from utils.statements import generate_statements
+            with st.spinner("Rendering..."):
+                res = generate_statements(storage, st.session_state.get("user", "local"))
+            st.success(f"Rendered {len(res['rendered'])} month(s), {len(res['skipped'])} unchanged.")
+
 
 # -------------------- Footer --------------------
 st.markdown("---")
 st.caption("Built by Dheeraj Sena")
+
+perf.observe(f"page.{page}", time.perf_counter() - page_started)
+perf_panel(perf)
+profile_panel(profiler.first_render(page))
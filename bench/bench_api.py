@@ -0,0 +1,101 @@
+# Load test for the ingestion API (utils.api): starts the server on a temp journal in a
+# subprocess, then keeps N keep-alive clients posting trade batches for a fixed time per
+# (clients, batch) case. Reports sustained rows committed/sec, requests/sec, p50/p99
+# latency (submit to committed ack) and 503 backpressure replies, then checks the row count.
+# Usage: python -m bench.bench_api [--clients 1,16,64] [--batches 1,100] [--seconds 10] [--backend sqlite]
+import argparse, asyncio, json, os, subprocess, sys, tempfile, time
+
+from bench.synthetic import make_trade_rows
+
+
+async def request(reader, writer, method: str, path: str, body: bytes = b""):
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: bench\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    size = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        if line.lower().startswith(b"content-length:"):
+            size = int(line.split(b":")[1])
+    return status, await reader.readexactly(size)
+
+
+async def client(port: int, payloads, until: float, latencies, counters):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    i = 0
+    while time.perf_counter() < until:
+        body, rows = payloads[i % len(payloads)]
+        t = time.perf_counter()
+        status, _ = await request(reader, writer, "POST", "/trades", body)
+        if status == 201:
+            latencies.append(time.perf_counter() - t)
+            counters["rows"] += rows
+            i += 1
+        elif status == 503:
+            counters["busy"] += 1
+            await asyncio.sleep(0.05)
+        else:
+            raise RuntimeError(f"POST /trades -> {status}")
+    writer.close()
+
+
+async def run_case(port: int, clients: int, batch: int, seconds: float, rows):
+    payloads = [(json.dumps(rows[i:i + batch]).encode(), batch) for i in range(0, len(rows) - batch + 1, batch)]
+    latencies, counters = [], {"rows": 0, "busy": 0}
+    t = time.perf_counter()
+    await asyncio.gather(*(client(port, payloads[c::clients] or payloads, t + seconds, latencies, counters)
+                           for c in range(clients)))
+    elapsed = time.perf_counter() - t
+    lat = sorted(latencies)
+    p = lambda q: lat[min(len(lat) - 1, int(q * len(lat)))] * 1000 if lat else float("nan")
+    print(f"{clients:>8}{batch:>7}{counters['rows'] / elapsed:>12,.0f}{len(lat) / elapsed:>10,.0f}"
+          f"{p(0.5):>9.1f}{p(0.99):>9.1f}{counters['busy']:>7}")
+    return counters["rows"]
+
+
+async def main_async(args, port: int):
+    rows = [dict(r, user="loadtest") for r in make_trade_rows(20_000, users=1)]
+    print(f"{'clients':>8}{'batch':>7}{'rows/s':>12}{'req/s':>10}{'p50 ms':>9}{'p99 ms':>9}{'503s':>7}")
+    sent = 0
+    for clients in map(int, args.clients.split(",")):
+        for batch in map(int, args.batches.split(",")):
+            sent += await run_case(port, clients, batch, args.seconds, rows)
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    _, health = await request(reader, writer, "GET", "/health")
+    t = time.perf_counter()
+    _, summary = await request(reader, writer, "GET", "/summary?user=loadtest")
+    summary_ms = (time.perf_counter() - t) * 1000
+    writer.close()
+    health = json.loads(health)
+    print(f"acked {sent:,} rows; server committed {health['committed']:,} in {health['batches']:,} batches "
+          f"(avg {health['committed'] / max(health['batches'], 1):,.0f} rows/commit); "
+          f"/summary over {sum(m['trades'] for m in json.loads(summary)['months']):,} trades: {summary_ms:.0f} ms")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--clients", default="1,16,64")
+    ap.add_argument("--batches", default="1,100")
+    ap.add_argument("--seconds", type=float, default=10.0)
+    ap.add_argument("--backend", default="sqlite")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        server = subprocess.Popen([sys.executable, "-m", "utils.api", "--port", "0", "--data-dir", data_dir,
+                                   "--backend", args.backend, "--insecure"], stdout=subprocess.PIPE, text=True,
+                                  env={**os.environ, "JOURNAL_API_TOKEN": ""})
+        try:
+            line = server.stdout.readline()  # "listening on http://127.0.0.1:<port>"
+            port = int(line.rsplit(":", 1)[1])
+            print(f"{args.backend} backend, {os.cpu_count()} CPU(s), {args.seconds:g}s per case")
+            asyncio.run(main_async(args, port))
+        finally:
+            server.terminate()
+            server.wait(timeout=60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# Single-row insert latency for the CSV backend as the journal grows.
+# Usage: python -m bench.bench_csv [--sizes 1000,10000,100000,1000000] [--inserts 50] [--legacy-max 100000]
+import argparse, os, statistics, tempfile, time
+
+import pandas as pd
+
+from bench.synthetic import make_trade_rows
+from utils.storage import Storage, SCHEMA_COLUMNS
+
+
+def legacy_insert(path, payload):
+    # The original Storage.insert_trade: read whole file, concat one row, rewrite.
+    df = pd.read_csv(path)
+    new_id = int(df["id"].max()) + 1 if df.shape[0] > 0 else 1
+    row = {c: payload.get(c) for c in SCHEMA_COLUMNS if c != "id"}
+    row["id"] = new_id
+    pd.concat([df, pd.DataFrame([row])], ignore_index=True).to_csv(path, index=False)
+
+
+def prefill(path, n, rows):
+    reps = -(-n // len(rows))
+    df = pd.DataFrame(rows * reps).iloc[:n]
+    df.insert(0, "id", range(1, n + 1))
+    df["created_at"] = df["updated_at"] = "2024-01-01 00:00:00"
+    df[SCHEMA_COLUMNS].to_csv(path, index=False)
+
+
+def timings(k, fn):
+    out = []
+    for i in range(k):
+        t0 = time.perf_counter()
+        fn(i)
+        out.append((time.perf_counter() - t0) * 1000.0)
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="1000,10000,100000,1000000")
+    ap.add_argument("--inserts", type=int, default=50)
+    ap.add_argument("--legacy-max", type=int, default=100000,
+                    help="skip the legacy rewrite path above this size (it is O(n) per insert)")
+    args = ap.parse_args()
+    sizes = [int(s) for s in args.sizes.split(",")]
+    seed_rows = make_trade_rows(10000)
+    new_rows = make_trade_rows(args.inserts, seed=11)
+
+    print(f"{'rows':>10}{'append p50 ms':>15}{'append p99 ms':>15}{'legacy p50 ms':>15}")
+    for n in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            store = Storage("csv", data_dir=tmp)
+            prefill(store.csv_file, n, seed_rows)
+            store.insert_trade(new_rows[0])  # first insert rebuilds the id sidecar once
+            t = sorted(timings(args.inserts, lambda i: store.insert_trade(new_rows[i])))
+            legacy = "-"
+            if n <= args.legacy_max:
+                path = os.path.join(tmp, "legacy.csv")
+                prefill(path, n, seed_rows)
+                lt = timings(min(args.inserts, 10), lambda i: legacy_insert(path, new_rows[i]))
+                legacy = f"{statistics.median(lt):.2f}"
+            print(f"{n:>10,}{statistics.median(t):>15.3f}{t[int(len(t) * 0.99) - 1]:>15.3f}{legacy:>15}")
+
+
+if __name__ == "__main__":
+    main()
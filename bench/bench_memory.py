@@ -0,0 +1,59 @@
+# Memory and groupby/report speed of the typed trade frame (Storage.load_trades) vs the
+# frame query_trades infers, on one sqlite journal (default 1M trades). Loads every
+# column the reports read, plus notes for the "as inferred" frame like read_trades.
+# Usage: python -m bench.bench_memory [--rows 1000000] [--repeat 3]
+import argparse, statistics, tempfile, time
+
+import pandas as pd
+
+from bench.synthetic import make_trades_frame
+from utils.analytics import build_analytics
+from utils.reporting import build_report
+from utils.storage import TYPED_COLUMNS, ensure_settings, open_backend
+
+
+def timed(fn, repeat: int):
+    runs, out = [], None
+    for _ in range(repeat):
+        t = time.perf_counter()
+        out = fn()
+        runs.append((time.perf_counter() - t) * 1000)
+    return statistics.median(runs), out
+
+
+def by_sector(df: pd.DataFrame, pnl: pd.Series) -> pd.Series:
+    return pnl.groupby([df["sector"], df["trade_type"], df["currency"]], observed=True).sum()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        storage = open_backend("sqlite", data_dir)
+        t = time.perf_counter()
+        storage.replace_all_trades(make_trades_frame(args.rows, users=1), replace=True)
+        print(f"seeded {args.rows:,} trades in {time.perf_counter() - t:.1f}s (pandas {pd.__version__})")
+        settings = ensure_settings(storage)
+        loaders = {
+            "inferred": lambda: storage.query_trades(columns=TYPED_COLUMNS + ["notes"]),
+            "inferred-no-notes": lambda: storage.query_trades(columns=TYPED_COLUMNS),
+            "typed": lambda: storage.load_trades(),
+        }
+        print(f"{'frame':<20}{'MB':>9}{'load ms':>10}{'groupby ms':>12}{'report ms':>11}{'analytics ms':>14}")
+        for label, load in loaders.items():
+            load_ms, df = timed(load, args.repeat)
+            mb = df.memory_usage(deep=True).sum() / 1e6
+            pnl = pd.Series(build_report(df, settings, "AUD")["pnl_native"], index=df.index)
+            group_ms, _ = timed(lambda: by_sector(df, pnl), args.repeat)
+            report_ms, _ = timed(lambda: build_report(df, settings, "AUD"), args.repeat)
+            an_ms, _ = timed(lambda: build_analytics(df, settings), args.repeat)
+            print(f"{label:<20}{mb:>9.1f}{load_ms:>10.0f}{group_ms:>12.1f}{report_ms:>11.0f}{an_ms:>14.0f}")
+        types = storage.load_trades(columns=TYPED_COLUMNS).dtypes
+        print("typed dtypes:", ", ".join(f"{c}={t}" for c, t in types.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# Plan replay on a synthetic journal against fixture bars (offline): cold run, warm re-run
+# (nothing changed), and a re-run after editing the SL of 1% of trades. Trade prices are
+# rescaled onto the fixture closes so SL/target levels sit in the bars' range.
+# Usage: python -m bench.bench_replay [--trades 1000000] [--workers 4]
+import argparse, os, tempfile, time
+
+import numpy as np
+import pandas as pd
+
+from bench.synthetic import make_trades_frame, write_bar_fixtures
+from utils.bars import BarStore, FixtureBarSource
+from utils.prices import yahoo_tickers
+from utils.replay import Replayer, replay_summary
+from utils.storage import typed_trades
+
+TODAY = pd.Timestamp("2024-12-31")
+
+
+def aligned_trades(n: int, store: BarStore) -> pd.DataFrame:
+    trades = typed_trades(make_trades_frame(n, users=1))
+    tickers = yahoo_tickers(trades)
+    closes = store.load_many(tickers.unique(), "2018-12-01", TODAY).set_index(["ticker", "date"])["Close"]
+    at_entry = closes.reindex(list(zip(tickers, trades["entry_date"]))).to_numpy()
+    scale = np.where(np.isnan(at_entry), 1.0, at_entry / trades["entry_price"].to_numpy())
+    for c in ("entry_price", "exit_price", "sl", "target"):
+        trades[c] = trades[c].to_numpy() * scale
+    return trades
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--trades", type=int, default=1_000_000)
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tickers = yahoo_tickers(make_trades_frame(1000, users=1)).unique().tolist()
+        write_bar_fixtures(tmp, tickers)
+        store = BarStore(os.path.join(tmp, "bars.db"), source=FixtureBarSource(tmp))
+        store.ensure_many(tickers, "2018-12-01", TODAY)
+        trades = aligned_trades(args.trades, store)
+        print(f"{len(trades):,} trades on {len(tickers)} tickers, {os.cpu_count()} CPU(s)")
+        print(f"{'run':<28}{'replayed':>10}{'seconds':>9}")
+        for label, workers in [("cold, 1 process", 1), (f"cold, {args.workers} workers", args.workers)]:
+            if label.endswith("workers") and args.workers <= 1:
+                continue
+            path = os.path.join(tmp, f"replay-{workers}.db")
+            replayer = Replayer(path, store)
+            t = time.perf_counter()
+            res = replayer.run(trades, today=TODAY, workers=workers)
+            print(f"{label:<28}{replayer.last_run['replayed']:>10,}{time.perf_counter() - t:>9.2f}")
+        t = time.perf_counter()
+        replayer.run(trades, today=TODAY, workers=args.workers)
+        print(f"{'warm, nothing changed':<28}{replayer.last_run['replayed']:>10,}{time.perf_counter() - t:>9.2f}")
+        edited = trades.sample(frac=0.01, random_state=0).index
+        trades.loc[edited, "sl"] = trades.loc[edited, "sl"] * 0.99
+        t = time.perf_counter()
+        res = replayer.run(trades, today=TODAY, workers=args.workers)
+        print(f"{'1% of plans edited':<28}{replayer.last_run['replayed']:>10,}{time.perf_counter() - t:>9.2f}")
+        s = replay_summary(res)
+        print(f"SL first {s['sl'] + s['both']:,}, target first {s['target']:,}, neither {s['none']:,}; "
+              f"plan P&L {s['plan_pnl']:,.0f} vs actual {s['actual_pnl']:,.0f}; "
+              f"avg MAE {s['avg_mae_pct']:.1f}% / MFE {s['avg_mfe_pct']:.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# Report engine (build_report) vs the original per-metric reporting helpers, plus the
+# engine with as-of FX conversion over a daily rate history.
+# Usage: python -m bench.bench_reporting [--sizes 10000,100000,1000000] [--legacy-max 1000000]
+import argparse, time
+
+import numpy as np
+import pandas as pd
+
+from bench.synthetic import make_trades_frame
+from utils.reporting import build_report
+
+SETTINGS = {"base_currency": "AUD", "fx_to_base": {"AUD": 1.0, "USD": 1.55, "INR": 0.0185},
+            "goals": {"AUD": 500, "USD": 0, "INR": 0}}
+
+
+# ---- original implementations (row-wise apply, hard-coded currencies, re-parsing) ----
+def _is_closed(row):
+    return pd.notna(row.get("exit_date")) and pd.notna(row.get("exit_price"))
+
+def legacy_closed_pnl(df):
+    mask = df.apply(_is_closed, axis=1)
+    return float(((df.loc[mask, "exit_price"] - df.loc[mask, "entry_price"]) * df.loc[mask, "qty"]).sum())
+
+def legacy_currency_totals(df):
+    pnl_native = (df["exit_price"].fillna(df["entry_price"]) - df["entry_price"]) * df["qty"]
+    return {c: float(pnl_native.loc[df["currency"] == c].sum()) for c in ["INR", "USD", "AUD"]
+            if (df["currency"] == c).any()}
+
+def legacy_days_held(df):
+    ed = pd.to_datetime(df["entry_date"], errors="coerce")
+    xd = pd.to_datetime(df["exit_date"], errors="coerce")
+    return (xd.fillna(pd.Timestamp.today().normalize()) - ed).dt.days
+
+def legacy_roi(df):
+    invested = df["capital_invested"]
+    pnl = (df["exit_price"].fillna(df["entry_price"]) - df["entry_price"]) * df["qty"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return pd.Series(np.where(invested > 0, pnl / invested * 100.0, np.nan), index=df.index)
+
+def legacy_goal(df, ccy):
+    mdf = df.loc[df["currency"] == ccy].copy()
+    c = mdf["exit_price"].notna()
+    return float(((mdf.loc[c, "exit_price"] - mdf.loc[c, "entry_price"]) * mdf.loc[c, "qty"]).sum())
+
+def legacy_dashboard(df):
+    df = df.copy()
+    df["entry_date"] = pd.to_datetime(df["entry_date"], errors="coerce")
+    df["exit_date"] = pd.to_datetime(df["exit_date"], errors="coerce")
+    df["days_held"] = legacy_days_held(df)
+    df["roi_pct"] = legacy_roi(df)
+    roi = legacy_roi(df)  # best_trades recomputed ROI
+    return (legacy_closed_pnl(df), legacy_currency_totals(df), legacy_goal(df, "AUD"), np.nanmax(roi.values))
+
+
+def engine_dashboard(df):
+    df = df.assign(entry_date=pd.to_datetime(df["entry_date"], errors="coerce"),
+                   exit_date=pd.to_datetime(df["exit_date"], errors="coerce"))
+    r = build_report(df, SETTINGS, "AUD")
+    return (r["closed_pnl"], r["currency_totals"], r["goal"]["achieved"], r["best"]["best_roi_pct"])
+
+
+def make_fx_history(start="2018-01-01", end="2026-12-31", seed=0):
+    # daily USD-quoted random-walk rates for AUD and INR
+    days = pd.date_range(start, end)
+    rng = np.random.default_rng(seed)
+    return pd.concat([pd.DataFrame({"date": days.strftime("%Y-%m-%d"), "currency": c, "base": "USD",
+                                    "rate": v * np.exp(np.cumsum(rng.normal(0, 0.003, len(days))))})
+                      for c, v in [("AUD", 0.65), ("INR", 0.012)]], ignore_index=True)
+
+
+def fx_dashboard(df, fx):
+    df = df.assign(entry_date=pd.to_datetime(df["entry_date"], errors="coerce"),
+                   exit_date=pd.to_datetime(df["exit_date"], errors="coerce"))
+    r = build_report(df, SETTINGS, "AUD", fx_rates=fx)
+    return r["closed_pnl_base"], r["fx_missing"]
+
+
+def best_of(fn, df, repeat):
+    out, best = None, float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn(df)
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="10000,100000,1000000")
+    ap.add_argument("--legacy-max", type=int, default=1000000)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+    fx = make_fx_history()
+    print(f"{'trades':>10}{'legacy s':>12}{'engine s':>12}{'speedup':>10}{'engine+fx s':>13}")
+    for n in [int(s) for s in args.sizes.split(",")]:
+        df = make_trades_frame(n)
+        te, eng = best_of(engine_dashboard, df, args.repeat)
+        tf, _ = best_of(lambda d: fx_dashboard(d, fx), df, args.repeat)
+        if n <= args.legacy_max:
+            tl, leg = best_of(legacy_dashboard, df, 1)
+            assert np.isclose(leg[0], eng[0]) and np.isclose(leg[2], eng[2]), (leg, eng)
+            print(f"{n:>10,}{tl:>12.3f}{te:>12.3f}{tl / te:>9.1f}x{tf:>13.3f}")
+        else:
+            print(f"{n:>10,}{'-':>12}{te:>12.3f}{'-':>10}{tf:>13.3f}")
+
+
+if __name__ == "__main__":
+    main()
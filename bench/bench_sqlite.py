@@ -0,0 +1,65 @@
+# Compare the pooled sqlite path in utils.storage against the original connect-per-call path.
+# Usage: python -m bench.bench_sqlite [--rows 2000] [--reads 200]
+import argparse, os, sqlite3, tempfile, time
+
+from bench.synthetic import make_trade_rows
+from utils.sqlite_pool import close_all
+from utils.storage import Storage, CREATE_SQL, INSERT_COLUMNS, INSERT_SQL
+
+
+def legacy_insert(path, payload):
+    conn = sqlite3.connect(path, check_same_thread=False)
+    cur = conn.cursor()
+    cur.execute(CREATE_SQL)  # the old Storage() rebuilt the schema on every rerun
+    cur.execute(INSERT_SQL, [payload.get(c) for c in INSERT_COLUMNS])
+    conn.commit()
+    cur.close()
+    conn.close()
+
+
+def legacy_read(path):
+    import pandas as pd
+    conn = sqlite3.connect(path, check_same_thread=False)
+    df = pd.read_sql_query("SELECT * FROM trades", conn)
+    conn.close()
+    return df
+
+
+def rate(n, fn):
+    t0 = time.perf_counter()
+    for i in range(n):
+        fn(i)
+    return n / (time.perf_counter() - t0)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=2000)
+    ap.add_argument("--reads", type=int, default=200)
+    args = ap.parse_args()
+    rows = make_trade_rows(args.rows)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = os.path.join(tmp, "legacy.db")
+        ins_legacy = rate(len(rows), lambda i: legacy_insert(legacy_path, rows[i]))
+        read_legacy = rate(args.reads, lambda i: legacy_read(legacy_path))
+
+        store = Storage("sqlite", data_dir=os.path.join(tmp, "pooled"))
+        ins_pooled = rate(len(rows), lambda i: store.insert_trade(rows[i]))
+        read_pooled = rate(args.reads, lambda i: store.read_trades())
+
+        bulk = Storage("sqlite", data_dir=os.path.join(tmp, "bulk"))
+        t0 = time.perf_counter()
+        bulk.insert_trades(rows)
+        ins_bulk = len(rows) / (time.perf_counter() - t0)
+        close_all()
+
+    print(f"{'path':<28}{'inserts/sec':>14}{'reads/sec':>12}")
+    print(f"{'connect-per-call':<28}{ins_legacy:>14,.0f}{read_legacy:>12,.1f}")
+    print(f"{'pooled (WAL)':<28}{ins_pooled:>14,.0f}{read_pooled:>12,.1f}")
+    print(f"{'pooled insert_trades()':<28}{ins_bulk:>14,.0f}{'-':>12}")
+    print(f"(reads are full-table read_trades() over {len(rows):,} rows)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# Cold start to first paint per page: every sample is a fresh interpreter that runs app.py
+# once through streamlit's AppTest (signed in, ?page=<name>), like a new Streamlit Cloud
+# container serving its first request. Runs offline with an empty price fixture.
+# Usage: python -m bench.bench_startup [--pages Login,"Monthly Report"] [--repeat 3] [--trades 5000]
+import argparse, json, os, statistics, subprocess, sys, tempfile, time
+
+from bench.synthetic import make_trade_rows
+from utils.storage import open_user_storage
+from utils.ui import PAGES
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DRIVER = r"""
+import json, sys, time
+t0 = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+t1 = time.perf_counter()
+at = AppTest.from_file(sys.argv[1], default_timeout=300)
+at.secrets["auth"] = {"username": "demo", "password": "demo"}
+if sys.argv[2] != "Login":
+    at.session_state["auth_ok"] = True
+    at.session_state["user"] = "demo"
+    at.query_params["page"] = sys.argv[2]
+at.run()
+t2 = time.perf_counter()
+print(json.dumps({"harness_ms": (t1 - t0) * 1000, "paint_ms": (t2 - t1) * 1000,
+                  "exceptions": [str(e.value) for e in at.exception]}))
+"""
+
+
+def seed(workdir: str, trades: int):
+    os.makedirs(os.path.join(workdir, "data"), exist_ok=True)
+    rows = make_trade_rows(trades, users=1)
+    for r in rows:
+        r["user"] = "demo"
+    open_user_storage("demo", "sqlite", os.path.join(workdir, "data")).insert_trades(rows)
+    fixture = os.path.join(workdir, "prices.csv")
+    with open(fixture, "w") as f:
+        f.write("ticker,price\n")
+    return fixture
+
+
+def sample(page: str, workdir: str, fixture: str) -> dict:
+    profile = os.path.join(workdir, "profile.jsonl")
+    if os.path.exists(profile):
+        os.remove(profile)
+    env = dict(os.environ, PYTHONPATH=ROOT, JOURNAL_PROFILE="1", JOURNAL_PROFILE_FILE=profile,
+               JOURNAL_PRICE_FIXTURE=fixture, JOURNAL_BARS_FIXTURE_DIR=workdir, JOURNAL_BACKEND="sqlite")
+    t = time.perf_counter()
+    out = subprocess.run([sys.executable, "-c", DRIVER, os.path.join(ROOT, "app.py"), page],
+                         cwd=workdir, env=env, capture_output=True, text=True, check=True)
+    wall = (time.perf_counter() - t) * 1000
+    res = json.loads(out.stdout.strip().splitlines()[-1])
+    with open(profile) as f:
+        prof = json.loads(f.readline())  # this process's only run
+    res.update(wall_ms=wall, run_ms=prof["run_ms"], loaded=prof["loaded"],
+               phases={p["phase"]: p["ms"] for p in prof["phases"]})
+    return res
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pages", default=",".join(["Login"] + PAGES))
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--trades", type=int, default=5000)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        fixture = seed(workdir, args.trades)
+        print(f"{'page':<16}{'wall ms':>10}{'paint ms':>10}{'script ms':>11}  phases (ms) / heavy modules loaded")
+        for page in [p.strip() for p in args.pages.split(",") if p.strip()]:
+            runs = [sample(page, workdir, fixture) for _ in range(args.repeat)]
+            med = lambda k: statistics.median(r[k] for r in runs)
+            phases = {k: statistics.median(r["phases"].get(k, 0.0) for r in runs) for k in runs[0]["phases"]}
+            errs = sum(len(r["exceptions"]) for r in runs)
+            print(f"{page:<16}{med('wall_ms'):>10.0f}{med('paint_ms'):>10.0f}{med('run_ms'):>11.0f}  "
+                  f"{', '.join(f'{k}={v:.0f}' for k, v in phases.items()) or '-'} / "
+                  f"{', '.join(runs[0]['loaded']) or 'none'}" + (f"  [{errs} exception(s)]" if errs else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# Monthly statement generation on a synthetic journal: cold render of every month (1 process,
+# then a process pool), a re-run with nothing changed, a re-run after one backdated trade, and
+# serving one closed month from its statement vs computing it live.
+# Usage: python -m bench.bench_statements [--trades 100000] [--workers 4]
+import argparse, json, os, tempfile, time
+
+import pandas as pd
+import plotly.express as px
+
+from bench.synthetic import make_trades_frame
+from utils.reporting import build_report
+from utils.statements import available_formats, fresh_statement, generate_statements
+from utils.storage import ensure_settings, open_backend
+
+TODAY = pd.Timestamp("2025-01-15")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--trades", type=int, default=100_000)
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        storage = open_backend("sqlite", data_dir)
+        storage.replace_all_trades(make_trades_frame(args.trades, users=1), replace=True)
+        user = storage.users()[0]
+        months = storage.monthly_counts(user)["ym"].tolist()
+        print(f"{args.trades:,} trades over {len(months)} months, formats {available_formats()}, "
+              f"{os.cpu_count()} CPU(s)")
+        print(f"{'run':<30}{'rendered':>9}{'seconds':>9}")
+
+        def run(label, **kwargs):
+            t = time.perf_counter()
+            res = generate_statements(storage, user, today=TODAY, **kwargs)
+            print(f"{label:<30}{len(res['rendered']):>9}{time.perf_counter() - t:>9.2f}")
+
+        run("cold, 1 process", workers=1, force=True)
+        if args.workers > 1:
+            run(f"cold, {args.workers} workers", workers=args.workers, force=True)
+        run("nothing changed", workers=args.workers)
+        storage.insert_trade({"user": user, "market": "US", "symbol": "AAPL", "currency": "USD",
+                              "sector": "Tech", "trade_type": "Swing", "entry_date": f"{months[3]}-10",
+                              "exit_date": f"{months[3]}-20", "qty": 10, "entry_price": 100.0,
+                              "exit_price": 105.0})
+        run(f"one trade added to {months[3]}", workers=args.workers)
+
+        # what the Monthly Report does for one closed month: report + two plotly figures live,
+        # or fingerprint check + stored chart JSON from the statement
+        month, settings = months[-2], ensure_settings(storage)
+        base = settings["base_currency"]
+        t = time.perf_counter()
+        stmt = fresh_statement(storage, user, month, base, today=TODAY)
+        with open(stmt["paths"]["charts"]) as f:
+            json.load(f)
+        served = time.perf_counter() - t
+        t = time.perf_counter()
+        report = build_report(storage.load_trades(user=user, month=month), settings, "All (base)", today=TODAY,
+                              fx_rates=storage.fx_rates(), base=base)
+        totals = report["currency_totals_base"]
+        px.bar(pd.DataFrame({"currency": list(totals), "pnl": list(totals.values())}), x="currency", y="pnl",
+               text_auto=True).to_json()
+        px.line(storage.monthly_counts(user), x="ym", y="trades", markers=True).to_json()
+        live = time.perf_counter() - t
+        print(f"{month} on the dashboard: statement {served * 1000:.0f} ms vs live {live * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# Load test: N concurrent users opening the Monthly Report (month list, month rows +
+# build_report, first page of the trade browser), uncached, against one shared store vs
+# per-user partitions (data/users/<name>/). Threads, like Streamlit sessions in one server.
+# Usage: python -m bench.bench_tenancy [--users 20] [--trades-per-user 20000] [--requests 200]
+#        [--concurrency 20] [--backend sqlite] [--mode both|shared|partitioned]
+import argparse, random, tempfile, time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from bench.synthetic import make_trade_rows
+from utils.reporting import build_report
+from utils.storage import Storage, ensure_settings, open_backend, open_user_storage, split_users
+
+REPORT_COLUMNS = ["id", "market", "symbol", "currency", "sector", "trade_type", "entry_date", "exit_date",
+                  "qty", "entry_price", "exit_price", "capital_invested", "sl", "target", "notes"]
+
+
+def report_page(storage: Storage, user: str) -> int:
+    counts = storage.monthly_counts(user=user)
+    month = counts["ym"].iat[-1]
+    settings = ensure_settings(storage)
+    mdf = storage.query_trades(user=user, month=month, columns=REPORT_COLUMNS)
+    build_report(mdf, settings, "AUD", fx_rates=storage.fx_rates(), base=settings["base_currency"])
+    storage.browse_trades(user=user, month=month)
+    return len(mdf)
+
+
+def run(label: str, stores, users, requests: int, concurrency: int, seed: int = 0):
+    rnd = random.Random(seed)
+    picks = [rnd.choice(users) for _ in range(requests)]
+
+    def one(u):
+        t = time.perf_counter()
+        report_page(stores(u), u)
+        return (time.perf_counter() - t) * 1000
+
+    report_page(stores(users[0]), users[0])  # warm the pools
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as ex:
+        lat = np.array(list(ex.map(one, picks)))
+    wall = time.perf_counter() - t0
+    print(f"{label:<12}{requests:>9}{np.percentile(lat, 50):>9.1f}{np.percentile(lat, 95):>9.1f}"
+          f"{np.percentile(lat, 99):>9.1f}{requests / wall:>10.1f}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", type=int, default=20)
+    ap.add_argument("--trades-per-user", type=int, default=20000)
+    ap.add_argument("--requests", type=int, default=200)
+    ap.add_argument("--concurrency", type=int, default=20)
+    ap.add_argument("--backend", default="sqlite")
+    ap.add_argument("--mode", choices=["both", "shared", "partitioned"], default="both")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        t = time.perf_counter()
+        shared = open_backend(args.backend, data_dir)
+        shared.save_backend_choice(args.backend)
+        shared.insert_trades(make_trade_rows(args.users * args.trades_per_user, users=args.users))
+        users = sorted(shared.users())
+        print(f"{len(users)} users x ~{args.trades_per_user:,} trades ({args.backend}) "
+              f"seeded in {time.perf_counter() - t:.1f}s")
+        if args.mode != "shared":
+            t = time.perf_counter()
+            split_users(data_dir, args.backend)
+            print(f"split-users in {time.perf_counter() - t:.1f}s")
+        print(f"{'layout':<12}{'requests':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'req/s':>10}")
+        if args.mode != "partitioned":
+            run("shared", lambda u: shared, users, args.requests, args.concurrency)
+        if args.mode != "shared":
+            parts = {u: open_user_storage(u, args.backend, data_dir) for u in users}
+            run("partitioned", parts.__getitem__, users, args.requests, args.concurrency)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# Benchmark suite for the hot paths on seeded synthetic journals: insert, month query,
+# monthly counts, trade browser pages, build_report and build_analytics, per backend and
+# journal size. --save writes the medians as JSON; --baseline compares against a saved run
+# and exits 1 when a case got slower than --threshold (and by more than --min-ms).
+# Usage: python -m bench.suite [--sizes 1000,10000,100000,1000000] [--backends sqlite,parquet]
+#        [--repeat 5] [--save bench/baseline.json] [--baseline bench/baseline.json] [--threshold 0.2]
+import argparse, json, platform, statistics, sys, tempfile, time
+from datetime import datetime
+from typing import Callable, Dict
+
+from bench.synthetic import make_trade_rows
+from utils.analytics import build_analytics
+from utils.reporting import build_report
+from utils.storage import ensure_settings, open_backend
+
+REPORT_COLUMNS = ["id", "market", "symbol", "currency", "sector", "trade_type", "entry_date", "exit_date",
+                  "qty", "entry_price", "exit_price", "capital_invested", "sl", "target", "notes"]
+
+
+def median_ms(fn: Callable, repeat: int) -> float:
+    fn()  # warm-up (pools, page cache, lazy imports)
+    runs = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        runs.append((time.perf_counter() - t) * 1000)
+    return statistics.median(runs)
+
+
+def run_size(backend: str, n: int, repeat: int) -> Dict[str, float]:
+    rows = make_trade_rows(n, users=3)
+    out: Dict[str, float] = {}
+    with tempfile.TemporaryDirectory() as data_dir:
+        storage = open_backend(backend, data_dir)
+        t = time.perf_counter()
+        storage.insert_trades(rows)
+        out["insert"] = (time.perf_counter() - t) * 1000
+        settings = ensure_settings(storage)
+        fx = storage.fx_rates()
+        user = "user0"
+        month = storage.monthly_counts(user=user)["ym"].iat[-1]
+
+        def browse():
+            page, cursor = storage.browse_trades(user=user)
+            if cursor is not None:
+                storage.browse_trades(user=user, after=cursor)
+
+        out["query_month"] = median_ms(lambda: storage.query_trades(user=user, month=month,
+                                                                    columns=REPORT_COLUMNS), repeat)
+        out["monthly_counts"] = median_ms(lambda: storage.monthly_counts(user=user), repeat)
+        out["browse_2_pages"] = median_ms(browse, repeat)
+        out["search"] = median_ms(lambda: storage.browse_trades(user=user, search="earnings"), repeat)
+        udf = storage.query_trades(user=user, columns=REPORT_COLUMNS)
+        out["build_report"] = median_ms(lambda: build_report(udf, settings, "AUD", fx_rates=fx,
+                                                             base=settings["base_currency"]), repeat)
+        out["build_analytics"] = median_ms(lambda: build_analytics(udf, settings, fx_rates=fx), repeat)
+    return out
+
+
+def compare(results: Dict[str, float], baseline: Dict[str, float], threshold: float, min_ms: float) -> int:
+    print(f"\n{'case':<40}{'base ms':>10}{'now ms':>10}{'change':>9}")
+    regressions = 0
+    for key, now in results.items():
+        old = baseline.get(key)
+        if old is None:
+            print(f"{key:<40}{'-':>10}{now:>10.1f}{'new':>9}")
+            continue
+        change = (now - old) / old if old else 0.0
+        slow = change > threshold and now - old > min_ms
+        regressions += slow
+        print(f"{key:<40}{old:>10.1f}{now:>10.1f}{change:>+9.0%}" + ("  REGRESSION" if slow else ""))
+    return regressions
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="1000,10000,100000")
+    ap.add_argument("--backends", default="sqlite")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--save", default="")
+    ap.add_argument("--baseline", default="")
+    ap.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown, 0.2 = 20%%")
+    ap.add_argument("--min-ms", type=float, default=2.0, help="ignore slowdowns smaller than this")
+    args = ap.parse_args()
+
+    results: Dict[str, float] = {}
+    print(f"{'case':<40}{'ms':>10}")
+    for backend in [b.strip() for b in args.backends.split(",") if b.strip()]:
+        for n in [int(s) for s in args.sizes.split(",") if s.strip()]:
+            for case, ms in run_size(backend, n, args.repeat).items():
+                key = f"{backend}/{n}/{case}"
+                results[key] = ms
+                print(f"{key:<40}{ms:>10.1f}")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"created": datetime.now().isoformat(timespec="seconds"), "python": platform.python_version(),
+                       "machine": platform.machine(), "repeat": args.repeat, "results": results}, f, indent=2)
+        print(f"saved {len(results)} cases to {args.save}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold, args.min_ms)
+        if regressions:
+            print(f"{regressions} regression(s) over {args.threshold:.0%}")
+            sys.exit(1)
+        print("no regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import os, random
+from datetime import date, timedelta
+from typing import Dict, Any, List
+
+import numpy as np
+import pandas as pd
+
+MARKETS = [("India", "INR", ["INFY", "TCS", "RELIANCE", "HDFCBANK", "ITC"]),
+           ("US", "USD", ["AAPL", "MSFT", "NVDA", "AMZN", "XOM"]),
+           ("Australia", "AUD", ["BHP", "CBA", "CSL", "WES", "FMG"])]
+SECTORS = ["IT", "Banking/Financials", "Energy/Oil & Gas", "Consumer", "Metals/Mining", "Other"]
+TRADE_TYPES = ["Swing Long", "Swing Short", "Positional Long", "Event/Earnings"]
+
+
+def make_trade_rows(n: int, seed: int = 7, users: int = 3, start: date = date(2019, 1, 1),
+                    days: int = 5 * 365) -> List[Dict[str, Any]]:
+    # Synthetic journal rows shaped like the Record Trade payload (no id/created_at).
+    rnd = random.Random(seed)
+    rows = []
+    for _ in range(n):
+        market, ccy, symbols = rnd.choice(MARKETS)
+        entry = start + timedelta(days=rnd.randrange(days))
+        price = round(rnd.uniform(5, 500), 2)
+        qty = rnd.randrange(1, 500)
+        closed = rnd.random() < 0.8
+        exit_price = round(price * rnd.uniform(0.85, 1.2), 2) if closed else None
+        rows.append({
+            "user": f"user{rnd.randrange(users)}", "market": market, "symbol": rnd.choice(symbols),
+            "currency": ccy, "sector": rnd.choice(SECTORS), "trade_type": rnd.choice(TRADE_TYPES),
+            "entry_date": str(entry),
+            "exit_date": str(entry + timedelta(days=rnd.randrange(1, 60))) if closed else None,
+            "qty": qty, "entry_price": price, "exit_price": exit_price,
+            "capital_invested": round(qty * price, 2),
+            "sl": round(price * 0.95, 2), "target": round(price * 1.1, 2),
+            "notes": rnd.choice([None, "breakout", "earnings gap", "pullback to 20dma"]),
+        })
+    return rows
+
+
+def make_trades_frame(n: int, seed: int = 7, users: int = 3, start: str = "2019-01-01",
+                      days: int = 5 * 365) -> pd.DataFrame:
+    # Vectorized equivalent of make_trade_rows for large (1M+) journals, as read_trades returns it.
+    rng = np.random.default_rng(seed)
+    m = rng.integers(0, len(MARKETS), n)
+    sym_idx = rng.integers(0, 5, n)
+    entry = pd.Timestamp(start) + pd.to_timedelta(rng.integers(0, days, n), unit="D")
+    closed = rng.random(n) < 0.8
+    exit_ = entry + pd.to_timedelta(rng.integers(1, 60, n), unit="D")
+    price = np.round(rng.uniform(5, 500, n), 2)
+    qty = rng.integers(1, 500, n)
+    exit_price = np.where(closed, np.round(price * rng.uniform(0.85, 1.2, n), 2), np.nan)
+    symbols = np.array([s for _, _, syms in MARKETS for s in syms]).reshape(len(MARKETS), 5)
+    df = pd.DataFrame({
+        "id": np.arange(1, n + 1),
+        "user": np.array([f"user{i}" for i in range(users)])[rng.integers(0, users, n)],
+        "market": np.array([mk for mk, _, _ in MARKETS])[m],
+        "symbol": symbols[m, sym_idx],
+        "currency": np.array([c for _, c, _ in MARKETS])[m],
+        "sector": np.array(SECTORS)[rng.integers(0, len(SECTORS), n)],
+        "trade_type": np.array(TRADE_TYPES)[rng.integers(0, len(TRADE_TYPES), n)],
+        "entry_date": entry.strftime("%Y-%m-%d"),
+        "exit_date": np.where(closed, exit_.strftime("%Y-%m-%d"), None),
+        "qty": qty,
+        "entry_price": price,
+        "exit_price": exit_price,
+        "capital_invested": np.round(qty * price, 2),
+        "sl": np.round(price * 0.95, 2),
+        "target": np.round(price * 1.1, 2),
+        "notes": np.array([None, "breakout", "earnings gap", "pullback to 20dma"], dtype=object)[rng.integers(0, 4, n)],
+        "created_at": "2024-01-01 00:00:00",
+        "updated_at": "2024-01-01 00:00:00",
+    })
+    return df
+
+
+def write_bar_fixtures(directory: str, tickers: List[str], start: str = "2018-12-01", end: str = "2025-01-01",
+                       seed: int = 1):
+    # Random-walk daily bars as FixtureBarSource CSVs (<dir>/<TICKER>.csv), one per ticker.
+    rng = np.random.default_rng(seed)
+    days = pd.bdate_range(start, end)
+    for t in tickers:
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, len(days))))
+        open_ = close * np.exp(rng.normal(0, 0.01, len(days)))
+        high = np.maximum(open_, close) * (1 + rng.uniform(0, 0.02, len(days)))
+        low = np.minimum(open_, close) * (1 - rng.uniform(0, 0.02, len(days)))
+        pd.DataFrame({"Date": days, "Open": open_, "High": high, "Low": low, "Close": close,
+                      "Volume": rng.integers(10_000, 1_000_000, len(days))}).to_csv(
+            os.path.join(directory, f"{t}.csv"), index=False)
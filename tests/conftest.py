@@ -0,0 +1,4 @@
+import os, sys
+
+# run from anywhere: the app imports its modules as utils.*
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
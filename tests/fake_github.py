@@ -0,0 +1,76 @@
+import base64, hashlib, json, re, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Just enough of the GitHub REST contents API for SyncWorker (PyGithub with base_url):
+# GET a repo, GET/PUT /repos/<owner>/<repo>/contents/<path> with sha checks.
+
+
+def blob_sha(content: bytes) -> str:
+    return hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+
+
+class FakeGitHub:
+    def __init__(self):
+        self.files = {}      # path -> bytes
+        self.puts = []       # contents of every accepted PUT
+        self.fail = 0        # answer this many next PUTs with an error (PyGithub retries 5xx itself)
+        self.on_put = None   # called before a PUT is answered
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                m = re.match(r"^/repos/([^/]+)/([^/]+)(?:/contents/([^?]+))?", self.path)
+                if not m:
+                    return self._send(404, {"message": "Not Found"})
+                owner, name, path = m.groups()
+                if path is None:
+                    return self._send(200, {"name": name, "full_name": f"{owner}/{name}",
+                                            "owner": {"login": owner}, "url": f"{fake.url}/repos/{owner}/{name}"})
+                if path not in fake.files:
+                    return self._send(404, {"message": "Not Found"})
+                content = fake.files[path]
+                self._send(200, {"type": "file", "path": path, "name": path.rsplit("/", 1)[-1],
+                                 "sha": blob_sha(content), "encoding": "base64", "size": len(content),
+                                 "content": base64.b64encode(content).decode()})
+
+            def do_PUT(self):
+                path = re.match(r"^/repos/[^/]+/[^/]+/contents/([^?]+)", self.path).group(1)
+                req = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                if fake.on_put:
+                    fake.on_put()
+                if fake.fail:
+                    fake.fail -= 1
+                    return self._send(400, {"message": "Bad Request"})
+                current = fake.files.get(path)
+                if current is not None and req.get("sha") != blob_sha(current):
+                    return self._send(409, {"message": "sha does not match"})
+                if current is None and req.get("sha"):
+                    return self._send(404, {"message": "Not Found"})
+                content = base64.b64decode(req["content"])
+                fake.files[path] = content
+                fake.puts.append(content)
+                self._send(200 if current is not None else 201,
+                           {"content": {"path": path, "sha": blob_sha(content), "type": "file"},
+                            "commit": {"sha": blob_sha(content + b"commit"), "message": req["message"]}})
+
+        return Handler
@@ -0,0 +1,60 @@
+import asyncio, json
+
+import pytest
+
+from utils import api
+
+TRADE = {"user": "demo", "market": "US", "symbol": "AAPL", "entry_date": "2024-03-04", "qty": 10,
+         "entry_price": 100}
+
+
+@pytest.fixture
+def synced(monkeypatch):
+    calls = []
+    monkeypatch.setattr(api, "maybe_sync_csv_to_github", lambda store: calls.append(store.data_dir))
+    return calls
+
+
+def run(server, *requests):
+    # each request: (method, target, body, token); returns [(status, payload)]
+    async def main():
+        server.queue = asyncio.Queue()
+        writer = asyncio.create_task(server.write_loop())
+        out = []
+        for method, target, body, token in requests:
+            headers = {"authorization": f"Bearer {token}"} if token else {}
+            out.append(await server.route(method, target, headers, json.dumps(body).encode()))
+        writer.cancel()
+        return out
+    return asyncio.run(main())
+
+
+def test_token_is_required(tmp_path, synced):
+    server = api.IngestServer(data_dir=str(tmp_path), token="secret")
+    (no_auth, _), (wrong, _), (ok, res), (health, _) = run(
+        server, ("POST", "/trades", TRADE, None), ("POST", "/trades", TRADE, "nope"),
+        ("POST", "/trades", TRADE, "secret"), ("GET", "/health", None, None))
+    assert (no_auth, wrong, ok, health) == (401, 401, 201, 200)
+    assert res["ids"] == [1]
+
+
+def test_commits_queue_a_github_sync(tmp_path, synced):
+    server = api.IngestServer(data_dir=str(tmp_path))
+    run(server, ("POST", "/trades", [TRADE, dict(TRADE, user="other")], None),
+        ("POST", "/fills", {"user": "demo", "market": "US", "symbol": "AAPL", "side": "BUY",
+                            "date": "2024-03-04", "qty": 1, "price": 1}, None))
+    assert sorted(synced) == sorted(server.storage(u).data_dir for u in ("demo", "other"))
+
+
+def test_non_finite_numbers_are_rejected_per_row(tmp_path, synced):
+    server = api.IngestServer(data_dir=str(tmp_path))
+    [(status, res)] = run(server, ("POST", "/trades", [dict(TRADE, qty=1e400), dict(TRADE, qty="inf"), TRADE], None))
+    assert status == 201
+    assert res["ids"][2] is not None
+    assert [r["reason"] for r in res["rejected"]] == ["qty must be a finite number"] * 2
+
+
+def test_unknown_summary_base_is_a_bad_request(tmp_path, synced):
+    server = api.IngestServer(data_dir=str(tmp_path))
+    [(status, _)] = run(server, ("GET", "/summary?user=demo&base=zzz", None, None))
+    assert status == 400
@@ -0,0 +1,73 @@
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from utils.bars import BAR_COLUMNS, BarStore
+
+
+class CountingSource:
+    # weekday bars for `days`; a ticker in `down` raises like an offline fetch
+    def __init__(self, days, down=()):
+        self.days, self.down, self.calls = pd.DatetimeIndex(days), set(down), []
+
+    def fetch(self, ticker, start, end):
+        self.calls.append((ticker, start, end))
+        if ticker in self.down:
+            raise ConnectionError("offline")
+        idx = self.days[(self.days >= pd.Timestamp(start)) & (self.days <= pd.Timestamp(end))]
+        return pd.DataFrame(1.0, index=idx, columns=BAR_COLUMNS)
+
+    def fetch_many(self, tickers, start, end):
+        # like yf.download: failed tickers come back empty
+        return {t: (pd.DataFrame(columns=BAR_COLUMNS) if t in self.down else self.fetch(t, start, end))
+                for t in tickers}
+
+
+@pytest.fixture
+def source():
+    return CountingSource(pd.bdate_range("2024-01-01", "2024-03-29"))
+
+
+def test_range_ending_on_a_weekend_is_fetched_once(tmp_path, source):
+    bars = BarStore(str(tmp_path / "bars.db"), source=source)
+    bars.ensure("AAPL", "2024-03-01", "2024-03-08")  # Friday
+    for _ in range(3):
+        bars.ensure("AAPL", "2024-03-01", "2024-03-10")  # Sunday: the weekend tail comes back empty
+    assert len(source.calls) == 2
+    assert bars._coverage("AAPL")[:2] == ("2024-03-01", "2024-03-10")
+
+
+def test_empty_answer_is_covered(tmp_path, source):
+    bars = BarStore(str(tmp_path / "bars.db"), source=source)
+    bars.ensure("AAPL", "2024-03-09", "2024-03-10")  # a weekend: no bars, but answered
+    bars.ensure("AAPL", "2024-03-09", "2024-03-10")
+    assert len(source.calls) == 1
+
+
+def test_failed_fetch_leaves_range_uncovered(tmp_path, source):
+    source.down.add("AAPL")
+    bars = BarStore(str(tmp_path / "bars.db"), source=source)
+    bars.ensure("AAPL", "2024-03-01", "2024-03-08")
+    assert bars._coverage("AAPL") is None
+    source.down.clear()
+    bars.ensure("AAPL", "2024-03-01", "2024-03-08")
+    assert len(source.calls) == 2
+    assert bars._coverage("AAPL") is not None
+
+
+def test_only_the_missing_tail_is_fetched(tmp_path, source):
+    bars = BarStore(str(tmp_path / "bars.db"), source=source)
+    bars.ensure("AAPL", "2024-03-01", "2024-03-08")
+    bars.ensure("AAPL", "2024-03-01", "2024-03-15")
+    assert source.calls[1][1:] == (date(2024, 3, 9), date(2024, 3, 15))
+
+
+def test_ensure_many_retries_batch_failures_one_by_one(tmp_path, source):
+    source.down.add("BAD")
+    bars = BarStore(str(tmp_path / "bars.db"), source=source)
+    bars.ensure_many(["AAPL", "MSFT", "BAD"], "2024-03-01", "2024-03-08")
+    assert ("BAD", date(2024, 3, 1), date(2024, 3, 8)) in source.calls  # per-ticker retry
+    cov = bars.coverage_many(["AAPL", "MSFT", "BAD"])
+    assert set(cov) == {"AAPL", "MSFT"}
+    assert len(bars.load_many(["AAPL"], "2024-03-01", "2024-03-08")) == 6
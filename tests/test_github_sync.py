@@ -0,0 +1,108 @@
+import time
+
+import pytest
+
+pytest.importorskip("github")
+
+from fake_github import FakeGitHub
+from utils import github_sync
+from utils.github_sync import SyncWorker
+from utils.storage import open_backend
+
+PATH = "data/trades.csv"
+
+
+def trade(symbol):
+    return {"user": "u", "market": "US", "symbol": symbol, "currency": "USD", "entry_date": "2024-03-01",
+            "qty": 1, "entry_price": 1.0}
+
+
+@pytest.fixture
+def fake():
+    f = FakeGitHub()
+    yield f
+    f.close()
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return open_backend("csv", str(tmp_path))
+
+
+def worker(storage, fake, interval=0.05):
+    return SyncWorker(storage, {"token": "t", "repo": "o/r", "branch": "main", "path": PATH,
+                                "base_url": fake.url, "interval": interval})
+
+
+def csv_bytes(storage):
+    with open(storage.csv_file, "rb") as f:
+        return f.read()
+
+
+def test_save_landing_during_a_push_is_pushed(storage, fake):
+    w = worker(storage, fake)
+
+    def save_mid_push():
+        # the CSV was already read for this push
+        fake.on_put = None
+        storage.insert_trade(trade("MSFT"))
+        w.notify()
+
+    storage.insert_trade(trade("AAPL"))
+    fake.on_put = save_mid_push
+    w.notify()
+    assert w.flush(timeout=10)
+    assert len(fake.puts) == 2
+    assert fake.files[PATH] == csv_bytes(storage)
+    assert b"MSFT" in fake.files[PATH]
+
+
+def test_unchanged_content_is_not_pushed_again(storage, fake):
+    w = worker(storage, fake)
+    storage.insert_trade(trade("AAPL"))
+    w.notify()
+    assert w.flush(timeout=10)
+    w.notify()  # a save that changed nothing
+    assert w.flush(timeout=10)
+    assert len(fake.puts) == 1
+    assert w.status()["synced_hash"] is not None
+
+
+def test_saves_within_the_interval_share_one_push(storage, fake):
+    w = worker(storage, fake, interval=0.5)
+    for s in ("AAPL", "MSFT", "NVDA"):
+        storage.insert_trade(trade(s))
+        w.notify()
+    deadline = time.time() + 10
+    while w.status()["pending_since"] is not None and time.time() < deadline:
+        time.sleep(0.05)
+    assert len(fake.puts) == 1
+    assert fake.files[PATH] == csv_bytes(storage)
+
+
+def test_failed_push_backs_off_and_retries(storage, fake, monkeypatch):
+    monkeypatch.setattr(github_sync, "BACKOFF_BASE", 0.1)
+    w = worker(storage, fake)
+    fake.fail = 1
+    storage.insert_trade(trade("AAPL"))
+    w.notify()
+    deadline = time.time() + 10
+    while w.status()["attempts"] == 0 and time.time() < deadline:
+        time.sleep(0.02)
+    assert w.status()["last_error"]
+    deadline = time.time() + 10
+    while w.status()["pending_since"] is not None and time.time() < deadline:
+        time.sleep(0.05)
+    assert w.status()["attempts"] == 0 and w.status()["last_error"] is None
+    assert fake.files[PATH] == csv_bytes(storage)
+
+
+def test_pending_state_survives_a_restart(storage, fake):
+    w = worker(storage, fake, interval=60)
+    storage.insert_trade(trade("AAPL"))
+    w.notify()
+    assert w.status()["pending_since"] is not None
+    # a new process reads the persisted state and pushes
+    w2 = worker(storage, fake, interval=0.05)
+    assert w2.flush(timeout=10)
+    assert fake.files[PATH] == csv_bytes(storage)
@@ -0,0 +1,61 @@
+import io
+
+import pandas as pd
+import pytest
+
+from utils.importer import import_trades, load_mapping, normalize_chunk
+from utils.storage import open_backend
+
+HEADER = "Symbol,Exchange,Open Date,Quantity,Open Price,Close Date,Close Price\n"
+
+
+def _csv(*lines):
+    return io.StringIO(HEADER + "".join(l + "\n" for l in lines))
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return open_backend("sqlite", str(tmp_path))
+
+
+def test_quantity_rules():
+    raw = pd.read_csv(_csv("A,NYSE,2024-01-02,10,5", "B,NYSE,2024-01-02,0.3,5", "C,NYSE,2024-01-02,1.5,5",
+                           "D,NYSE,2024-01-02,-4,5", "E,NYSE,2024-01-02,0,5"), dtype=str)
+    norm = normalize_chunk(raw, load_mapping(), "u")
+    rows, rejected = norm["rows"], norm["rejected"]
+    assert rows[["symbol", "qty", "capital_invested"]].values.tolist() == [["A", 10, 50.0], ["D", 4, 20.0]]
+    assert dict(zip(rejected["Symbol"], rejected["reason"])) == {
+        "B": "quantity must be a whole number", "C": "quantity must be a whole number",
+        "E": "quantity must be > 0"}
+
+
+def test_rejection_reasons(storage):
+    res = import_trades(storage, _csv(",NYSE,2024-01-02,1,5", "A,NYSE,not a date,1,5", "A,NYSE,2024-01-02,1,0"), "u")
+    assert (res["inserted"], res["rejected"]) == (0, 3)
+    assert res["errors"] == ["row 2: missing symbol", "row 3: missing/invalid entry date",
+                             "row 4: entry price must be > 0"]
+    assert storage.query_trades().empty
+
+
+def test_duplicates_in_file_and_in_journal_are_skipped(storage):
+    lines = ["AAPL,NASDAQ,2024-01-02,10,100,2024-01-05,110", "MSFT,NASDAQ,2024-01-03,5,300,,"]
+    res = import_trades(storage, _csv(*lines, lines[0]), "u", chunk_rows=2)
+    assert (res["read"], res["inserted"], res["duplicates"]) == (3, 2, 1)
+    res = import_trades(storage, _csv(*lines, "AAPL,NASDAQ,2024-01-02,11,100,2024-01-05,110"), "u")
+    assert (res["inserted"], res["duplicates"]) == (1, 2)
+    assert len(storage.query_trades(user="u")) == 3
+    # another user's identical trade is not a duplicate
+    assert import_trades(storage, _csv(lines[0]), "v")["inserted"] == 1
+
+
+def test_dry_run_writes_nothing(storage):
+    res = import_trades(storage, _csv("AAPL,NASDAQ,2024-01-02,10,100,,"), "u", dry_run=True)
+    assert res["inserted"] == 1
+    assert storage.query_trades().empty
+
+
+def test_market_and_currency_mapping(storage):
+    import_trades(storage, _csv("RELIANCE.NS,,2024-01-02,1,2500,,", "BHP,ASX,2024-01-02,1,45,,"), "u")
+    df = storage.query_trades().sort_values("symbol")
+    assert df[["symbol", "market", "currency"]].values.tolist() == [["BHP", "Australia", "AUD"],
+                                                                   ["RELIANCE", "India", "INR"]]
@@ -0,0 +1,124 @@
+import pytest
+
+from utils.storage import open_backend
+
+
+def trade(**kw):
+    t = {"user": "u", "market": "US", "symbol": "AAPL", "currency": "USD", "sector": "Tech",
+         "trade_type": "Swing Long", "entry_date": "2024-03-01", "qty": 10, "entry_price": 100.0,
+         "capital_invested": 1000.0}
+    t.update(kw)
+    return t
+
+
+@pytest.fixture(params=["sqlite", "csv", "parquet"])
+def storage(request, tmp_path):
+    if request.param == "parquet":
+        pytest.importorskip("pyarrow")
+    return open_backend(request.param, str(tmp_path))
+
+
+def aggregates(storage):
+    df = storage.monthly_aggregates()
+    return {tuple(r[:5]): [round(float(v), 6) for v in r[5:]] for r in df.itertuples(index=False)}
+
+
+def assert_matches_rebuild(storage):
+    incremental = aggregates(storage)
+    storage.rebuild_aggregates()
+    assert incremental == aggregates(storage)
+    return incremental
+
+
+@pytest.mark.parametrize("torn", ["4,u,US,MSFT,USD,Tech,Swing Long,2024-0", "4,u,US,MSFT"])
+def test_csv_reads_skip_a_torn_trailing_row(tmp_path, torn):
+    storage = open_backend("csv", str(tmp_path))
+    storage.insert_trades([trade(), trade(symbol="MSFT")])
+    with open(storage.csv_file, "a") as f:
+        f.write(torn)  # a writer crashed mid-row
+    assert storage.read_trades()["id"].tolist() == [1, 2]
+    assert storage.query_trades(columns=["id", "symbol"])["symbol"].tolist() == ["AAPL", "MSFT"]
+    # the next append repairs the file and takes the next id
+    assert storage.insert_trade(trade(symbol="NVDA")) == 3
+    assert storage.query_trades(columns=["symbol"])["symbol"].tolist() == ["AAPL", "MSFT", "NVDA"]
+
+
+@pytest.mark.parametrize("backend", ["sqlite", "csv"])
+def test_users_are_sorted_on_every_backend(tmp_path, backend):
+    storage = open_backend(backend, str(tmp_path))
+    storage.insert_trades([trade(user=u) for u in ["carol", "alice", "bob", "alice"]])
+    assert storage.users() == ["alice", "bob", "carol"]
+
+
+def test_notes_search_follows_inserts_and_updates(tmp_path):
+    storage = open_backend("sqlite", str(tmp_path))
+    if not storage.fts:
+        pytest.skip("sqlite built without FTS5")
+    ids = storage.insert_trades([trade(notes="breakout retest"), trade(notes=""), trade(notes="earnings gap")])
+    storage.insert_trade(trade(notes="another breakout"))
+
+    def search(q):
+        return sorted(storage.browse_trades(user="u", search=q)[0]["id"].tolist())
+
+    assert search("breakout") == [ids[0], 4]
+    storage.update_trade(ids[0], {"notes": "failed pullback"})
+    storage.update_trade(ids[1], {"notes": "breakout late"})
+    assert search("breakout") == [ids[1], 4]
+    assert search("pullback") == [ids[0]]
+
+
+def test_aggregates_follow_inserts(storage):
+    storage.insert_trades([trade(), trade(symbol="MSFT", exit_date="2024-03-05", exit_price=110.0),
+                           trade(symbol="NVDA", exit_date="2024-03-06", exit_price=95.0)])
+    storage.insert_trade(trade(entry_date="2024-04-02", sector="Energy", capital_invested=None))
+    aggs = assert_matches_rebuild(storage)
+    # trades, closed_trades, closed_pnl, invested, wins, losses
+    assert aggs[("u", "2024-03", "USD", "Tech", "Swing Long")] == [3, 2, 50.0, 3000.0, 1, 1]
+    assert aggs[("u", "2024-04", "USD", "Energy", "Swing Long")] == [1, 0, 0.0, 0.0, 0, 0]
+    assert storage.monthly_counts("u").values.tolist() == [["2024-03", 3], ["2024-04", 1]]
+
+
+def test_aggregates_after_replacing_all_trades(storage):
+    storage.insert_trades([trade(), trade(symbol="MSFT")])
+    df = storage.read_trades().head(1)
+    storage.replace_all_trades(df, replace=True)
+    assert assert_matches_rebuild(storage)[("u", "2024-03", "USD", "Tech", "Swing Long")][0] == 1
+
+
+def test_update_trade_moves_aggregates(storage):
+    ids = storage.insert_trades([trade(), trade(symbol="MSFT")])
+    storage.update_trade(ids[0], {"exit_date": "2024-03-08", "exit_price": 90.0})
+    storage.update_trade(ids[1], {"entry_date": "2024-04-01", "sector": "Software"})
+    aggs = assert_matches_rebuild(storage)
+    assert aggs[("u", "2024-03", "USD", "Tech", "Swing Long")] == [1, 1, -100.0, 1000.0, 0, 1]
+    assert aggs[("u", "2024-04", "USD", "Software", "Swing Long")] == [1, 0, 0.0, 1000.0, 0, 0]
+    row = storage.query_trades().set_index("id").loc[ids[0]]
+    assert (row["exit_date"], float(row["exit_price"])) == ("2024-03-08", 90.0)
+    with pytest.raises(ValueError):
+        storage.update_trade(999, {"exit_price": 1.0})
+    with pytest.raises(ValueError):
+        storage.update_trade(ids[0], {"bogus": 1})
+
+
+def test_partial_then_full_close_writes_the_exit(storage):
+    tid, other = storage.insert_trades([trade(), trade(symbol="MSFT")])
+    storage.close_trade(tid, 4, 110.0, "2024-03-05", user="u")
+    assert sorted(storage.query_trades(open_only=True)["id"].tolist()) == [tid, other]
+    storage.close_trade(tid, 6, 120.0, "2024-03-09", user="u")
+    assert storage.query_trades(open_only=True)["id"].tolist() == [other]
+    row = storage.query_trades().set_index("id").loc[tid]
+    assert row["exit_date"] == "2024-03-09"
+    assert float(row["exit_price"]) == pytest.approx(116.0)  # (4 * 110 + 6 * 120) / 10
+    aggs = assert_matches_rebuild(storage)
+    assert aggs[("u", "2024-03", "USD", "Tech", "Swing Long")] == [2, 1, 160.0, 2000.0, 1, 0]
+    assert storage.realized_lots("u")["qty"].abs().sum() == 10
+    with pytest.raises(ValueError, match="already closed"):
+        storage.close_trade(tid, 1, 1.0, "2024-03-10", user="u")
+
+
+def test_close_qty_is_bounded_by_what_is_open(storage):
+    tid = storage.insert_trade(trade())
+    storage.close_trade(tid, 4, 110.0, "2024-03-05", user="u")
+    with pytest.raises(ValueError, match="Close qty"):
+        storage.close_trade(tid, 7, 110.0, "2024-03-06", user="u")
+    assert storage.query_trades(open_only=True)["id"].tolist() == [tid]
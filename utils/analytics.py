@@ -0,0 +1,168 @@
+from typing import Any, Dict, List, Optional
+import numpy as np
+import pandas as pd
+from utils.reporting import _num, _dates, fx_to_base
+from utils import perf
+
+GROUP_DIMS = ["sector", "trade_type", "market", "month"]
+ANALYTICS_COLUMNS = ["id", "market", "symbol", "currency", "sector", "trade_type", "entry_date", "exit_date",
+                     "qty", "entry_price", "exit_price", "capital_invested", "sl"]
+SHARPE_WINDOW = 63      # trading days (~3 months)
+TRADING_DAYS = 252
+# additive per-group sums; every ratio in group_stats() is derived from these
+_SUMS = ["trades", "wins", "losses", "gross_win", "gross_loss", "pnl", "r_sum", "r_trades"]
+
+
+def trade_outcomes(df: pd.DataFrame, settings: Dict[str, Any], fx_rates: Optional[pd.DataFrame] = None,
+                   base: Optional[str] = None) -> pd.DataFrame:
+    # One row per closed trade: P&L in base currency (as of exit), win flag, R-multiple
+    # (P&L over the planned risk qty * |entry - sl|, same sign convention as P&L) and exit month.
+    base = base or settings.get("base_currency")
+    entry, exitp, qty, sl = _num(df, "entry_price"), _num(df, "exit_price"), _num(df, "qty"), _num(df, "sl")
+    xd = _dates(df, "exit_date")
+    closed = ~np.isnan(exitp) & ~np.isnat(xd)
+    cur = df["currency"].to_numpy()[closed]
+    rate = fx_to_base(cur, xd[closed], base, fx_rates, settings)
+    pnl = (exitp - entry)[closed] * qty[closed] * rate
+    risk = np.abs(entry - sl)[closed] * qty[closed] * rate
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r_mult = np.where(risk > 0, pnl / risk, np.nan)
+    out = df.loc[closed, [c for c in ("id", "symbol", "sector", "trade_type", "market") if c in df.columns]]
+    out = out.reset_index(drop=True)
+    out["entry_date"] = _dates(df, "entry_date")[closed]
+    out["exit_date"] = xd[closed]
+    # label the distinct months only (strftime per row is the slow part at 1M rows)
+    codes, months = pd.factorize(xd[closed].astype("datetime64[M]"), sort=True)
+    out["month"] = pd.Categorical.from_codes(codes, categories=np.asarray(months).astype(str))
+    out["pnl"] = pnl
+    out["r_multiple"] = r_mult
+    out["capital"] = (_num(df, "capital_invested")[closed] if "capital_invested" in df.columns
+                      else (entry * qty)[closed]) * rate
+    return out
+
+
+def equity_curve(df: pd.DataFrame, outcomes: pd.DataFrame, settings: Dict[str, Any],
+                 fx_rates: Optional[pd.DataFrame] = None, base: Optional[str] = None,
+                 start_capital: float = 0.0, window: int = SHARPE_WINDOW,
+                 today: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+    # Daily curve by event sweep: each trade adds +capital at entry and -capital the day
+    # after exit (open trades stay in), realized P&L lands on the exit day; cumulative sums
+    # over the day axis give exposure, open positions and equity. O(trades + days).
+    base = base or settings.get("base_currency")
+    ed = _dates(df, "entry_date")
+    valid = ~np.isnat(ed)
+    if not valid.any():
+        return pd.DataFrame(columns=["date", "pnl", "equity", "peak", "drawdown", "drawdown_pct",
+                                     "exposure", "open_positions", "ret", "rolling_sharpe"])
+    today = np.datetime64((today or pd.Timestamp.today()).normalize().to_datetime64(), "D")
+    xd = _dates(df, "exit_date").astype("datetime64[D]")
+    ed = ed.astype("datetime64[D]")
+    first = ed[valid].min()
+    last = max(today, xd[~np.isnat(xd)].max()) if (~np.isnat(xd)).any() else today
+    days = int((last - first).astype(int)) + 1
+    ei = (ed[valid] - first).astype(int)
+    xi = np.where(np.isnat(xd[valid]), days, (xd[valid] - first).astype(int) + 1)  # exclusive end
+    xi = np.clip(xi, ei + 1, days)
+
+    cap = _num(df, "capital_invested")[valid]
+    cap = np.where(np.isnan(cap), (_num(df, "entry_price") * _num(df, "qty"))[valid], cap)
+    cap = cap * fx_to_base(df["currency"].to_numpy()[valid], ed[valid], base, fx_rates, settings)
+    cap = np.nan_to_num(cap)
+    exposure = np.cumsum(np.bincount(ei, weights=cap, minlength=days + 1)
+                         - np.bincount(xi, weights=cap, minlength=days + 1))[:days]
+    open_pos = np.cumsum(np.bincount(ei, minlength=days + 1) - np.bincount(xi, minlength=days + 1))[:days]
+
+    oi = (outcomes["exit_date"].to_numpy(dtype="datetime64[ns]").astype("datetime64[D]") - first).astype(int)
+    keep = (oi >= 0) & (oi < days)
+    pnl = np.bincount(oi[keep], weights=np.nan_to_num(outcomes["pnl"].to_numpy()[keep]), minlength=days)
+    equity = start_capital + np.cumsum(pnl)
+    peak = np.maximum.accumulate(np.maximum(equity, start_capital))
+    dd = equity - peak
+    with np.errstate(divide="ignore", invalid="ignore"):
+        dd_pct = np.where(peak > 0, dd / peak * 100.0, np.nan)
+        # daily return on capital at work (or on equity when a starting capital is given)
+        denom = np.concatenate([[start_capital], equity[:-1]]) if start_capital > 0 else exposure
+        ret = np.where(denom > 0, pnl / denom, 0.0)
+    r = pd.Series(ret)
+    roll = r.rolling(window, min_periods=window)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sharpe = (roll.mean() / roll.std() * np.sqrt(TRADING_DAYS)).replace([np.inf, -np.inf], np.nan)
+    return pd.DataFrame({
+        "date": first + np.arange(days).astype("timedelta64[D]"),
+        "pnl": pnl, "equity": equity, "peak": peak, "drawdown": dd, "drawdown_pct": dd_pct,
+        "exposure": exposure, "open_positions": open_pos, "ret": ret, "rolling_sharpe": sharpe.to_numpy(),
+    }).astype({"date": "datetime64[ns]"})
+
+
+def _sums(outcomes: pd.DataFrame) -> pd.DataFrame:
+    pnl = outcomes["pnl"].to_numpy()
+    r = outcomes["r_multiple"].to_numpy()
+    return pd.DataFrame({
+        "trades": 1, "wins": (pnl > 0).astype("int64"), "losses": (pnl < 0).astype("int64"),
+        "gross_win": np.where(pnl > 0, pnl, 0.0), "gross_loss": np.where(pnl < 0, -pnl, 0.0),
+        "pnl": pnl, "r_sum": np.nan_to_num(r), "r_trades": (~np.isnan(r)).astype("int64"),
+    }, index=outcomes.index)
+
+
+def _ratios(s: pd.DataFrame) -> pd.DataFrame:
+    out = s[["trades", "wins", "losses", "pnl"]].copy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out["win_rate"] = s["wins"] / s["trades"] * 100.0
+        out["profit_factor"] = np.where(s["gross_loss"] > 0, s["gross_win"] / s["gross_loss"],
+                                        np.where(s["gross_win"] > 0, np.inf, np.nan))
+        out["expectancy"] = s["pnl"] / s["trades"]
+        out["avg_win"] = np.where(s["wins"] > 0, s["gross_win"] / s["wins"], np.nan)
+        out["avg_loss"] = np.where(s["losses"] > 0, -s["gross_loss"] / s["losses"], np.nan)
+        out["avg_r"] = np.where(s["r_trades"] > 0, s["r_sum"] / s["r_trades"], np.nan)
+    return out
+
+
+def _label_key(s: pd.Series) -> pd.Series:
+    # missing labels group as ""; categoricals (Storage.load_trades) stay categorical
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        if not s.isna().any():
+            return s
+        if "" not in s.cat.categories:
+            s = s.cat.set_categories([""] + list(s.cat.categories))  # sorts first, like the strings
+    return s.fillna("")
+
+
+def group_stats(outcomes: pd.DataFrame, dims: List[str] = GROUP_DIMS) -> Dict[str, pd.DataFrame]:
+    # One groupby over the full (sector, trade_type, market, month) key for the additive
+    # sums; each per-dimension table is a roll-up of that small result, not another pass.
+    if outcomes.empty:
+        return {d: _ratios(pd.DataFrame(columns=_SUMS, dtype="float64")).rename_axis(d) for d in dims}
+    keys = [_label_key(outcomes[d]) for d in dims]
+    cube = _sums(outcomes).groupby(keys, sort=False, observed=True).sum()
+    return {d: _ratios(cube.groupby(level=i, sort=True, observed=True).sum()).rename_axis(d)
+            for i, d in enumerate(dims)}
+
+
+def summary_stats(outcomes: pd.DataFrame, curve: pd.DataFrame) -> Dict[str, Any]:
+    s = _ratios(_sums(outcomes).sum().to_frame().T).iloc[0] if len(outcomes) else None
+    out = {k: (float(s[k]) if s is not None else np.nan)
+           for k in ("trades", "pnl", "win_rate", "profit_factor", "expectancy", "avg_win", "avg_loss", "avg_r")}
+    out["trades"] = int(len(outcomes))
+    if len(curve):
+        i = int(np.argmin(curve["drawdown"].to_numpy()))
+        out["max_drawdown"] = float(curve["drawdown"].iat[i])
+        out["max_drawdown_pct"] = float(np.nanmin(curve["drawdown_pct"])) if curve["drawdown_pct"].notna().any() else np.nan
+        out["max_drawdown_date"] = curve["date"].iat[i]
+        sharpe = curve["rolling_sharpe"].dropna()
+        out["sharpe"] = float(sharpe.iat[-1]) if len(sharpe) else np.nan
+    else:
+        out.update(max_drawdown=0.0, max_drawdown_pct=np.nan, max_drawdown_date=None, sharpe=np.nan)
+    return out
+
+
+def build_analytics(df: pd.DataFrame, settings: Dict[str, Any], fx_rates: Optional[pd.DataFrame] = None,
+                    base: Optional[str] = None, start_capital: float = 0.0, window: int = SHARPE_WINDOW,
+                    today: Optional[pd.Timestamp] = None) -> Dict[str, Any]:
+    base = base or settings.get("base_currency")
+    outcomes = trade_outcomes(df, settings, fx_rates, base)
+    curve = equity_curve(df, outcomes, settings, fx_rates, base, start_capital, window, today)
+    return {"base_currency": base, "outcomes": outcomes, "curve": curve,
+            "summary": summary_stats(outcomes, curve), "groups": group_stats(outcomes)}
+
+
+perf.instrument_module(globals(), "analytics")
@@ -0,0 +1,404 @@
+import asyncio, json, math, os, signal, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+from utils.github_sync import get_sync_worker, maybe_sync_csv_to_github
+from utils.importer import MARKETS, MARKET_CURRENCY
+from utils.ledger import FILL_COLUMNS, SIDES
+from utils.reporting import monthly_summary
+from utils.storage import DATA_DIR, SCHEMA_COLUMNS, Storage, ensure_settings, open_user_storage
+from utils import perf
+
+# Headless ingestion API next to the Streamlit UI: python -m utils.api [--port 8765].
+# Stdlib asyncio HTTP/1.1 with keep-alive, JSON in and out:
+#   POST /trades   a trade object, a list of them, or {"trades": [...]} (SCHEMA_COLUMNS fields)
+#   POST /fills    ledger fills the same way (user, market, symbol, side, date, qty, price[, fees])
+#   GET  /trades   ?user=&month=&symbol=&currency=&open_only=1&after_id=&limit=
+#   GET  /summary  ?user=[&month=][&base=]: per entry month trades, win rate and P&L in base
+#   GET  /health   queue depth and commit counters; GET /metrics: utils.perf as Prometheus text
+# Valid rows are queued and one writer thread group-commits everything queued since its last
+# commit (one insert_trades / add_fills per user partition), so a busy API pays a transaction
+# per batch, not per request. A request is answered once its rows are committed (201, ids in
+# input order); invalid rows come back under "rejected" with the reason. With more than
+# MAX_PENDING_ROWS rows waiting, new writes get 503 + Retry-After until the writer catches up.
+# Every route but /health needs JOURNAL_API_TOKEN as "Authorization: Bearer <token>"; the CLI
+# refuses to start without one unless --insecure is passed. CSV-backed partitions are pushed
+# by the GitHub sync worker after each commit, as UI saves are.
+DEFAULT_PORT = 8765
+MAX_PENDING_ROWS = 50_000  # queued + committing rows before writes are refused
+BATCH_ROWS = 5_000         # most rows one commit takes off the queue
+MAX_BODY = 16 * 2**20
+MAX_READ_ROWS = 100_000
+TRADE_FIELDS = [c for c in SCHEMA_COLUMNS if c not in ("id", "created_at", "updated_at")]
+FILL_FIELDS = [c for c in FILL_COLUMNS if c not in ("id", "created_at")]
+SUMMARY_COLUMNS = ["symbol", "currency", "entry_date", "exit_date", "qty", "entry_price", "exit_price",
+                   "capital_invested"]  # what build_report reads
+REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found",
+           405: "Method Not Allowed", 411: "Length Required", 413: "Payload Too Large",
+           422: "Unprocessable Entity", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+def _text(p: Dict[str, Any], col: str, required: bool = False) -> Optional[str]:
+    v = p.get(col)
+    v = None if v is None else str(v).strip()
+    if required and not v:
+        raise ValueError(f"missing {col}")
+    return v or None
+
+
+def _number(p: Dict[str, Any], col: str, positive: bool = False) -> Optional[float]:
+    v = p.get(col)
+    if v is None or v == "":
+        if positive:
+            raise ValueError(f"missing {col}")
+        return None
+    try:
+        v = float(v)
+    except (TypeError, ValueError):
+        raise ValueError(f"{col} must be a number")
+    if not math.isfinite(v):  # nan, or inf (1e400), which would also overflow int(qty)
+        raise ValueError(f"{col} must be a finite number")
+    if positive and v <= 0:
+        raise ValueError(f"{col} must be > 0")
+    return v
+
+
+def _day(p: Dict[str, Any], col: str, required: bool = False) -> Optional[str]:
+    v = _text(p, col, required)
+    if v is None:
+        return None
+    try:
+        return date.fromisoformat(v[:10]).isoformat()
+    except ValueError:
+        raise ValueError(f"{col} must be YYYY-MM-DD")
+
+
+def _market(p: Dict[str, Any]) -> Tuple[str, str]:
+    market = _text(p, "market", required=True)
+    if market not in MARKETS:
+        raise ValueError(f"market must be one of {', '.join(MARKETS)}")
+    ccy = (_text(p, "currency") or MARKET_CURRENCY[market]).upper()
+    if ccy not in MARKET_CURRENCY.values():
+        raise ValueError(f"currency must be one of {', '.join(MARKET_CURRENCY.values())}")
+    return market, ccy
+
+
+def _check_fields(p, allowed: List[str], what: str):
+    if not isinstance(p, dict):
+        raise ValueError(f"{what} must be a JSON object")
+    unknown = sorted(set(p) - set(allowed))
+    if unknown:
+        raise ValueError(f"unknown field(s): {', '.join(unknown)}")
+
+
+def validate_trade(p: Dict[str, Any]) -> Dict[str, Any]:
+    # one submitted trade -> a Storage.insert_trades row; ValueError with the reason otherwise
+    _check_fields(p, TRADE_FIELDS, "trade")
+    market, ccy = _market(p)
+    qty = _number(p, "qty", positive=True)
+    if qty != int(qty):
+        raise ValueError("qty must be a whole number")
+    row = {"user": _text(p, "user", required=True), "market": market,
+           "symbol": _text(p, "symbol", required=True).upper(), "currency": ccy,
+           "sector": _text(p, "sector") or "Other", "trade_type": _text(p, "trade_type") or "Swing Long",
+           "entry_date": _day(p, "entry_date", required=True), "exit_date": _day(p, "exit_date"),
+           "qty": int(qty), "entry_price": _number(p, "entry_price", positive=True),
+           "exit_price": _number(p, "exit_price"), "capital_invested": _number(p, "capital_invested"),
+           "sl": _number(p, "sl"), "target": _number(p, "target"), "notes": _text(p, "notes")}
+    if row["exit_date"] and row["exit_date"] < row["entry_date"]:
+        raise ValueError("exit_date is before entry_date")
+    if row["capital_invested"] is None:
+        row["capital_invested"] = round(row["qty"] * row["entry_price"], 2)
+    return row
+
+
+def validate_fill(p: Dict[str, Any]) -> Dict[str, Any]:
+    # one submitted fill -> a Storage.add_fills row (checked here so one bad fill can't fail a batch)
+    _check_fields(p, FILL_FIELDS, "fill")
+    market, ccy = _market(p)
+    side = (_text(p, "side", required=True) or "").upper()
+    if side not in SIDES:
+        raise ValueError("side must be BUY or SELL")
+    fees = _number(p, "fees") or 0.0
+    if fees < 0:
+        raise ValueError("fees must be >= 0")
+    trade_id = _number(p, "trade_id")
+    return {"user": _text(p, "user", required=True), "market": market,
+            "symbol": _text(p, "symbol", required=True).upper(), "currency": ccy, "side": side,
+            "date": _day(p, "date", required=True), "qty": _number(p, "qty", positive=True),
+            "price": _number(p, "price", positive=True), "fees": fees,
+            "trade_id": None if trade_id is None else int(trade_id), "notes": _text(p, "notes")}
+
+
+VALIDATORS = {"trades": validate_trade, "fills": validate_fill}
+
+
+class IngestServer:
+    def __init__(self, backend: str = "sqlite", data_dir: str = DATA_DIR, token: Optional[str] = None,
+                 max_pending: int = MAX_PENDING_ROWS, batch_rows: int = BATCH_ROWS):
+        self.backend, self.data_dir, self.token = backend, data_dir, token
+        self.max_pending, self.batch_rows = max_pending, batch_rows
+        self.pending = 0
+        self.stats = {"committed": 0, "batches": 0, "rejected": 0, "busy": 0, "failed": 0}
+        self.queue: Optional[asyncio.Queue] = None
+        self._stores: Dict[str, Storage] = {}
+        self._stores_lock = threading.Lock()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="api-writer")  # commits in order
+        self._reader = ThreadPoolExecutor(max_workers=4, thread_name_prefix="api-reader")
+
+    def storage(self, user: str) -> Storage:
+        # the user's partition, as the UI writes it (open_user_storage)
+        with self._stores_lock:
+            s = self._stores.get(user)
+            if s is None:
+                s = self._stores[user] = open_user_storage(user, self.backend, self.data_dir)
+            return s
+
+    # ---- writes ----
+    async def submit(self, kind: str, payload) -> Tuple[int, Dict[str, Any]]:
+        items = payload.get(kind, payload) if isinstance(payload, dict) else payload
+        items = items if isinstance(items, list) else [items]
+        ids: List[Optional[int]] = [None] * len(items)
+        rejected, by_user = [], {}
+        for i, p in enumerate(items):
+            try:
+                row = VALIDATORS[kind](p)
+            except ValueError as e:
+                rejected.append({"index": i, "reason": str(e)})
+                continue
+            by_user.setdefault(row["user"], []).append((i, row))
+        self.stats["rejected"] += len(rejected)
+        n = len(items) - len(rejected)
+        if n == 0:
+            return 422, {"ids": ids, "rejected": rejected}
+        if n > self.max_pending:
+            return 413, {"error": f"at most {self.max_pending} rows per request"}
+        if self.pending + n > self.max_pending:
+            self.stats["busy"] += 1
+            return 503, {"error": "write queue full, retry shortly", "pending": self.pending}
+        self.pending += n
+        loop = asyncio.get_running_loop()
+        waits = []
+        for user, pairs in by_user.items():
+            fut = loop.create_future()
+            self.queue.put_nowait((kind, user, [r for _, r in pairs], fut))
+            waits.append((pairs, fut))
+        error = None
+        for pairs, fut in waits:
+            try:
+                for (i, _), new_id in zip(pairs, await fut):
+                    ids[i] = int(new_id)
+            except Exception as e:
+                error = str(e)
+        if error is not None:
+            return 500, {"error": f"commit failed: {error}", "ids": ids, "rejected": rejected}
+        return 201, {"ids": ids, "rejected": rejected}
+
+    def _commit(self, batch) -> List[Any]:
+        # writer thread: one insert per (kind, user) over every queued request, then split the
+        # ids back per request; a failing group fails only its own requests
+        out: List[Any] = [None] * len(batch)
+        groups: Dict[Tuple[str, str], List[int]] = {}
+        for i, (kind, user, _, _) in enumerate(batch):
+            groups.setdefault((kind, user), []).append(i)
+        for (kind, user), idx in groups.items():
+            rows = [r for i in idx for r in batch[i][2]]
+            try:
+                store = self.storage(user)
+                with perf.timer(f"api.commit.{kind}"):
+                    new_ids = store.insert_trades(rows) if kind == "trades" else store.add_fills(rows)
+                if kind == "trades":
+                    maybe_sync_csv_to_github(store)  # only the trades CSV is pushed
+            except Exception as e:
+                for i in idx:
+                    out[i] = e
+                continue
+            pos = 0
+            for i in idx:
+                out[i] = new_ids[pos:pos + len(batch[i][2])]
+                pos += len(batch[i][2])
+        return out
+
+    async def write_loop(self):
+        # group commit: take whatever queued up while the previous commit ran (up to batch_rows)
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            rows = len(batch[0][2])
+            while rows < self.batch_rows and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+                rows += len(batch[-1][2])
+            try:
+                results = await loop.run_in_executor(self._writer, self._commit, batch)
+            except Exception as e:
+                results = [e] * len(batch)
+            self.stats["batches"] += 1
+            perf.count("api.batch_rows", rows)
+            for (_, _, items, fut), res in zip(batch, results):
+                self.pending -= len(items)
+                if isinstance(res, Exception):
+                    self.stats["failed"] += len(items)
+                    if not fut.done():
+                        fut.set_exception(res)
+                else:
+                    self.stats["committed"] += len(items)
+                    if not fut.done():
+                        fut.set_result(res)
+
+    async def drain(self, timeout: float = 30.0):
+        end = time.monotonic() + timeout
+        while self.pending and time.monotonic() < end:
+            await asyncio.sleep(0.01)
+
+    # ---- reads ----
+    def read_trades(self, q: Dict[str, str]) -> bytes:
+        user = q.get("user")
+        if not user:
+            raise ValueError("user is required")
+        symbols = q["symbol"].upper().split(",") if q.get("symbol") else None
+        df = self.storage(user).query_trades(user=user, month=q.get("month"), symbols=symbols,
+                                             currency=q.get("currency"),
+                                             open_only=q.get("open_only", "").lower() in ("1", "true", "yes"))
+        if q.get("after_id"):
+            df = df[df["id"] > int(q["after_id"])]
+        limit = min(int(q.get("limit", 1000)), MAX_READ_ROWS)
+        return df.sort_values("id").head(limit).to_json(orient="records", date_format="iso").encode()
+
+    def read_summary(self, q: Dict[str, str]) -> bytes:
+        user = q.get("user")
+        if not user:
+            raise ValueError("user is required")
+        storage = self.storage(user)
+        settings = ensure_settings(storage)
+        base = (q.get("base") or settings["base_currency"]).upper()
+        if base not in MARKET_CURRENCY.values():
+            raise ValueError(f"base must be one of {', '.join(MARKET_CURRENCY.values())}")
+        df = storage.load_trades(user=user, month=q.get("month"), columns=SUMMARY_COLUMNS)
+        out = monthly_summary(df, settings, base, storage.fx_rates())
+        return json.dumps({"user": user, "base": base,
+                           "months": json.loads(out.to_json(orient="records"))}).encode()
+
+    # ---- HTTP ----
+    async def route(self, method: str, target: str, headers: Dict[str, str], body: bytes):
+        url = urlsplit(target)
+        q = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        path = url.path.rstrip("/") or "/"
+        if path == "/health":
+            return 200, {"pending": self.pending, "queued": self.queue.qsize(), **self.stats}
+        if self.token and headers.get("authorization") != f"Bearer {self.token}":
+            return 401, {"error": "missing or invalid bearer token"}
+        if path in ("/trades", "/fills") and method == "POST":
+            try:
+                payload = json.loads(body or b"null")
+            except ValueError:
+                return 400, {"error": "body is not valid JSON"}
+            return await self.submit(path[1:], payload)
+        reads = {"/trades": self.read_trades, "/summary": self.read_summary}
+        if path in reads and method == "GET":
+            try:
+                return 200, await asyncio.get_running_loop().run_in_executor(self._reader, reads[path], q)
+            except ValueError as e:
+                return 400, {"error": str(e)}
+        if path == "/metrics" and method == "GET":
+            return 200, perf.to_prometheus().encode()
+        if path in ("/trades", "/fills", "/summary", "/metrics"):
+            return 405, {"error": f"{method} not allowed on {path}"}
+        return 404, {"error": f"no route {path}"}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    method, target, version = line.decode("latin-1").split()
+                except ValueError:
+                    await self._respond(writer, 400, {"error": "bad request line"}, False)
+                    break
+                headers = {}
+                while True:
+                    h = await reader.readline()
+                    if h in (b"\r\n", b"\n", b""):
+                        break
+                    k, _, v = h.decode("latin-1").partition(":")
+                    headers[k.strip().lower()] = v.strip()
+                conn = headers.get("connection", "").lower()
+                keep = conn != "close" if version == "HTTP/1.1" else conn == "keep-alive"
+                if "chunked" in headers.get("transfer-encoding", "").lower():
+                    await self._respond(writer, 411, {"error": "send a Content-Length body"}, False)
+                    break
+                size = int(headers.get("content-length") or 0)
+                if size > MAX_BODY:
+                    await self._respond(writer, 413, {"error": f"body over {MAX_BODY} bytes"}, False)
+                    break
+                body = await reader.readexactly(size) if size else b""
+                t0 = time.perf_counter()
+                try:
+                    status, payload = await self.route(method.upper(), target, headers, body)
+                except Exception as e:
+                    status, payload = 500, {"error": str(e)}
+                name = urlsplit(target).path.rstrip("/")
+                perf.observe(f"api.{method.upper()} {name if status != 404 else '(unknown)'}",
+                             time.perf_counter() - t0, status >= 500)
+                await self._respond(writer, status, payload, keep)
+                if not keep:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer: asyncio.StreamWriter, status: int, payload, keep: bool):
+        if isinstance(payload, bytes):
+            body, ctype = payload, "application/json" if payload[:1] in (b"[", b"{") else "text/plain"
+        else:
+            body, ctype = json.dumps(payload, default=str).encode(), "application/json"
+        head = [f"HTTP/1.1 {status} {REASONS.get(status, '')}", f"Content-Type: {ctype}",
+                f"Content-Length: {len(body)}", f"Connection: {'keep-alive' if keep else 'close'}"]
+        if status == 503:
+            head.append("Retry-After: 1")
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + body)
+        await writer.drain()
+
+
+async def serve(host: str = "127.0.0.1", port: int = DEFAULT_PORT, **kwargs):
+    # run until SIGINT/SIGTERM, then stop accepting and commit what is queued
+    app = IngestServer(**kwargs)
+    app.queue = asyncio.Queue()
+    server = await asyncio.start_server(app.handle, host, port, backlog=1024)
+    writer_task = asyncio.create_task(app.write_loop())
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    print(f"listening on http://{host}:{server.sockets[0].getsockname()[1]}", flush=True)
+    async with server:
+        await stop.wait()
+        server.close()
+        await app.drain()
+    writer_task.cancel()
+    for store in app._stores.values():
+        worker = get_sync_worker(store)
+        if worker is not None:
+            worker.flush()  # push what the last commits left pending (else it is pushed on restart)
+    print(f"stopped; committed {app.stats['committed']} row(s) in {app.stats['batches']} batch(es)", flush=True)
+
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Async HTTP API for trade/fill ingestion and reads")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=DEFAULT_PORT, help="0 picks a free port")
+    ap.add_argument("--backend", default=os.environ.get("JOURNAL_BACKEND", "sqlite"))
+    ap.add_argument("--data-dir", default=DATA_DIR)
+    ap.add_argument("--max-pending", type=int, default=MAX_PENDING_ROWS)
+    ap.add_argument("--batch-rows", type=int, default=BATCH_ROWS)
+    ap.add_argument("--insecure", action="store_true", help="serve without JOURNAL_API_TOKEN (any client can write)")
+    args = ap.parse_args()
+    if not os.environ.get("JOURNAL_API_TOKEN") and not args.insecure:
+        ap.error("set JOURNAL_API_TOKEN, or pass --insecure to accept unauthenticated writes")
+    asyncio.run(serve(args.host, args.port, backend=args.backend, data_dir=args.data_dir,
+                      token=os.environ.get("JOURNAL_API_TOKEN") or None, max_pending=args.max_pending,
+                      batch_rows=args.batch_rows))
@@ -0,0 +1,259 @@
+import os, time, threading, warnings
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+import numpy as np
+import pandas as pd
+from utils.sqlite_pool import get_pool
+from utils import perf
+
+BARS_FILE = os.path.join("data", "bars.db")
+BAR_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+REFRESH_TTL = 6 * 3600  # seconds before the latest (possibly partial) bar is re-fetched
+
+BARS_SQL = """
+CREATE TABLE IF NOT EXISTS bars (
+  ticker TEXT NOT NULL,
+  date TEXT NOT NULL,
+  open REAL, high REAL, low REAL, close REAL, volume REAL,
+  PRIMARY KEY (ticker, date)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS bar_coverage (
+  ticker TEXT PRIMARY KEY,
+  start TEXT NOT NULL,
+  end TEXT NOT NULL,
+  fetched_at REAL NOT NULL
+);
+"""
+
+DateLike = Union[str, date, pd.Timestamp]
+
+
+def _day(d: DateLike) -> date:
+    return pd.Timestamp(d).date()
+
+
+class YahooBarSource:
+    @perf.timed("external.yfinance.bars_batch")
+    def fetch_many(self, tickers: List[str], start: date, end: date) -> Dict[str, pd.DataFrame]:
+        # one batched download for tickers that share a missing range
+        import yfinance as yf
+        data = yf.download(tickers, start=str(start), end=str(end + timedelta(days=1)), group_by="ticker",
+                           progress=False, threads=True, auto_adjust=True)
+        out = {}
+        for t in tickers:
+            if t not in data.columns.get_level_values(0):
+                continue
+            df = data[t].dropna(how="all")
+            idx = df.index.tz_localize(None) if df.index.tz is not None else df.index
+            out[t] = df[BAR_COLUMNS].set_axis(idx.normalize(), axis=0)
+        return out
+
+    @perf.timed("external.yfinance.bars")
+    def fetch(self, ticker: str, start: date, end: date) -> pd.DataFrame:
+        import yfinance as yf
+        from yfinance.exceptions import YFPricesMissingError
+        # raise_errors: offline / unknown tickers raise (range stays uncovered); a reachable ticker
+        # with no sessions in the range (weekend, holiday) is an empty answer and gets cached
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", DeprecationWarning)
+                df = yf.Ticker(ticker).history(start=str(start), end=str(end + timedelta(days=1)), raise_errors=True)
+        except YFPricesMissingError:
+            df = pd.DataFrame()
+        if df.empty:
+            return pd.DataFrame(columns=BAR_COLUMNS)
+        idx = df.index.tz_localize(None) if df.index.tz is not None else df.index
+        return df[BAR_COLUMNS].set_axis(idx.normalize(), axis=0)
+
+
+class FixtureBarSource:
+    # Offline source: <dir>/<TICKER>.csv with Date,Open,High,Low,Close,Volume columns.
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def fetch(self, ticker: str, start: date, end: date) -> pd.DataFrame:
+        path = os.path.join(self.directory, f"{ticker}.csv")
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)  # like an unknown ticker online: nothing gets cached
+        df = pd.read_csv(path, parse_dates=["Date"]).set_index("Date").sort_index()
+        return df.loc[str(start):str(end), BAR_COLUMNS]
+
+
+def default_bar_source():
+    fixture_dir = os.environ.get("JOURNAL_BARS_FIXTURE_DIR")
+    if fixture_dir:
+        return FixtureBarSource(fixture_dir)
+    return YahooBarSource()
+
+
+# Daily OHLCV cache keyed by Yahoo ticker. Bars are stored once; a request only goes to the
+# source for the part of [start, end] outside the ticker's recorded coverage.
+class BarStore:
+    def __init__(self, path: str = BARS_FILE, source=None, refresh_ttl: float = REFRESH_TTL):
+        self.path = path
+        self.source = source or default_bar_source()
+        self.refresh_ttl = refresh_ttl
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.pool = get_pool(path, init_sql=BARS_SQL)
+
+    def _coverage(self, ticker: str):
+        with self.pool.connection() as conn:
+            return conn.execute("SELECT start, end, fetched_at FROM bar_coverage WHERE ticker = ?",
+                                (ticker,)).fetchone()
+
+    def coverage_many(self, tickers: Iterable[str]) -> Dict[str, Tuple[str, str, float]]:
+        # ticker -> (start, end, fetched_at) for the cached tickers among `tickers`
+        tickers = list(dict.fromkeys(tickers))
+        out = {}
+        with self.pool.connection() as conn:
+            for i in range(0, len(tickers), 500):
+                chunk = tickers[i:i + 500]
+                out.update((t, (s, e, f)) for t, s, e, f in conn.execute(
+                    f"SELECT ticker, start, end, fetched_at FROM bar_coverage "
+                    f"WHERE ticker IN ({','.join('?' * len(chunk))})", chunk))
+        return out
+
+    def _missing_ranges(self, ticker: str, start: date, end: date):
+        cov = self._coverage(ticker)
+        if cov is None:
+            return [(start, end)]
+        cs, ce, fetched_at = _day(cov[0]), _day(cov[1]), cov[2]
+        ranges = []
+        if start < cs:
+            ranges.append((start, cs - timedelta(days=1)))
+        # a bar dated on/after the day it was fetched may have been partial (market still open)
+        partial = ce >= date.fromtimestamp(fetched_at)
+        stale = time.time() - fetched_at > self.refresh_ttl
+        if end > ce or (end == ce and partial and stale):
+            ranges.append((ce if partial else ce + timedelta(days=1), end))
+        return ranges
+
+    def _store(self, ticker: str, bars: pd.DataFrame, start: date, end: date):
+        rows = [(ticker, d.strftime("%Y-%m-%d"), *map(float, vals))
+                for d, vals in zip(pd.DatetimeIndex(bars.index), bars[BAR_COLUMNS].to_numpy(dtype="float64"))]
+        with self.pool.connection() as conn:
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO bars (ticker, date, open, high, low, close, volume) "
+                                 "VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+                conn.execute(
+                    "INSERT INTO bar_coverage (ticker, start, end, fetched_at) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(ticker) DO UPDATE SET start = min(start, excluded.start), "
+                    "end = max(end, excluded.end), fetched_at = excluded.fetched_at",
+                    (ticker, str(start), str(end), time.time()))
+
+    def ensure(self, ticker: str, start: DateLike, end: Optional[DateLike] = None):
+        # A range the source answered is covered even without bars (weekends, holidays); a
+        # fetch that raised leaves it uncovered, so the next call asks again.
+        start, end = _day(start), _day(end or date.today())
+        for lo, hi in self._missing_ranges(ticker, start, end):
+            try:
+                bars = self.source.fetch(ticker, lo, hi)
+            except Exception:
+                continue  # offline / unknown ticker: serve whatever is cached
+            self._store(ticker, bars, lo, hi)
+
+    def ensure_many(self, tickers: Iterable[str], start: DateLike, end: Optional[DateLike] = None,
+                    max_workers: int = 8):
+        # Group the tickers by missing range so a watchlist refresh is a few batched calls.
+        start, end = _day(start), _day(end or date.today())
+        todo: Dict[Tuple[date, date], List[str]] = {}
+        for t in dict.fromkeys(tickers):
+            for rng in self._missing_ranges(t, start, end):
+                todo.setdefault(rng, []).append(t)
+        for (lo, hi), group in todo.items():
+            fetched: Dict[str, pd.DataFrame] = {}
+            if hasattr(self.source, "fetch_many") and len(group) > 1:
+                try:
+                    fetched = self.source.fetch_many(group, lo, hi)
+                except Exception:
+                    fetched = {}
+            # a batch answers failed tickers with an empty frame: retry those one by one, and
+            # leave a ticker out (uncovered) when its own fetch raises
+            rest = [t for t in group if t not in fetched or fetched[t].empty]
+            if rest:
+                def one(t):
+                    try:
+                        return self.source.fetch(t, lo, hi)
+                    except Exception:
+                        return None
+                with ThreadPoolExecutor(max_workers=min(max_workers, len(rest))) as ex:
+                    for t, bars in zip(rest, ex.map(one, rest)):
+                        if bars is None:
+                            fetched.pop(t, None)
+                        else:
+                            fetched[t] = bars
+            for t, bars in fetched.items():
+                self._store(t, bars, lo, hi)
+
+    def load_many(self, tickers: Iterable[str], start: DateLike, end: Optional[DateLike] = None) -> pd.DataFrame:
+        # long frame (ticker, date, OHLCV) sorted by ticker then date; cached bars only
+        tickers = list(dict.fromkeys(tickers))
+        frames = []
+        with self.pool.connection() as conn:
+            for i in range(0, len(tickers), 500):  # stay under SQLite's host-parameter limit
+                chunk = tickers[i:i + 500]
+                frames.append(pd.read_sql_query(
+                    f"SELECT ticker, date, open, high, low, close, volume FROM bars "
+                    f"WHERE ticker IN ({','.join('?' * len(chunk))}) AND date >= ? AND date <= ? "
+                    f"ORDER BY ticker, date", conn,
+                    params=(*chunk, str(_day(start)), str(_day(end or date.today())))))
+        df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(
+            columns=["ticker", "date", "open", "high", "low", "close", "volume"])
+        df.columns = ["ticker", "date"] + BAR_COLUMNS
+        df["date"] = pd.to_datetime(df["date"])
+        return df
+
+    def get_many(self, tickers: Iterable[str], start: DateLike, end: Optional[DateLike] = None) -> pd.DataFrame:
+        tickers = list(tickers)
+        self.ensure_many(tickers, start, end)
+        return self.load_many(tickers, start, end)
+
+    def load(self, ticker: str, start: DateLike, end: Optional[DateLike] = None) -> pd.DataFrame:
+        # cached bars only, no source calls
+        with self.pool.connection() as conn:
+            df = pd.read_sql_query(
+                "SELECT date, open, high, low, close, volume FROM bars "
+                "WHERE ticker = ? AND date >= ? AND date <= ? ORDER BY date", conn,
+                params=(ticker, str(_day(start)), str(_day(end or date.today()))))
+        df.index = pd.to_datetime(df.pop("date"))
+        df.columns = BAR_COLUMNS
+        return df
+
+    def get_bars(self, ticker: str, start: DateLike, end: Optional[DateLike] = None) -> pd.DataFrame:
+        self.ensure(ticker, start, end)
+        return self.load(ticker, start, end)
+
+
+def indicators(bars: pd.DataFrame, window: int = 14) -> pd.DataFrame:
+    # Vectorized rolling indicators over a bar frame (one row per bar).
+    high, low, close = bars["High"], bars["Low"], bars["Close"]
+    prev_close = close.shift(1)
+    true_range = np.maximum(high - low, np.maximum((high - prev_close).abs(), (low - prev_close).abs()))
+    hl_range = (high - low).abs()
+    delta = close.diff()
+    gain = delta.clip(lower=0).rolling(window).mean()
+    loss = (-delta.clip(upper=0)).rolling(window).mean()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi = 100.0 - 100.0 / (1.0 + gain / loss)
+    return pd.DataFrame({
+        "hl_range": hl_range,
+        "atr_like": hl_range.rolling(window).mean(),   # simple high-low ATR proxy
+        "true_range": true_range,
+        "atr": true_range.rolling(window).mean(),
+        "sma20": close.rolling(20).mean(),
+        "sma50": close.rolling(50).mean(),
+        "rsi": rsi,
+    }, index=bars.index)
+
+
+_STORE: Optional[BarStore] = None
+_STORE_LOCK = threading.Lock()
+
+
+def get_bar_store() -> BarStore:
+    global _STORE
+    with _STORE_LOCK:
+        if _STORE is None:
+            _STORE = BarStore()
+        return _STORE
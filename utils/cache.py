@@ -0,0 +1,146 @@
+import json
+from typing import Any, Dict, List, Optional, Tuple
+import pandas as pd
+import streamlit as st
+from utils.storage import Storage, ensure_settings, open_user_storage, DATA_DIR
+from utils.reporting import build_report
+from utils.analytics import build_analytics, ANALYTICS_COLUMNS
+from utils import perf
+
+# Memoization for Storage reads and derived report frames, shared across sessions.
+# Every cached call is keyed on storage.data_version(), which writes bump, so stale
+# entries are simply never hit again and age out of the LRU.
+DERIVED_CACHE_ENTRIES = 64
+
+
+@st.cache_resource(show_spinner=False)
+def get_storage(backend: str, data_dir: str = DATA_DIR) -> Storage:
+    return Storage(backend=backend, data_dir=data_dir)
+
+
+@st.cache_resource(show_spinner=False)
+def get_user_storage(user: str, backend: str, data_dir: str = DATA_DIR) -> Storage:
+    # one partition per user; its data_dir is part of every cache key below, so each user
+    # has their own cache namespace and one user's writes never invalidate another's
+    return open_user_storage(user, backend, data_dir)
+
+
+@st.cache_resource(show_spinner=False)
+def get_replayer(data_dir: str):
+    # plan replay results for one journal, memoized in-process (see utils.replay)
+    from utils.replay import open_replayer
+    return open_replayer(data_dir)
+
+
+def _key(storage: Storage) -> Tuple[str, str, tuple]:
+    return storage.data_dir, storage.backend, storage.data_version()
+
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def _settings(_storage: Storage, key) -> Dict[str, Any]:
+    return ensure_settings(_storage)
+
+
+@st.cache_data(show_spinner=False, max_entries=DERIVED_CACHE_ENTRIES)
+def _query(_storage: Storage, key, **filters) -> pd.DataFrame:
+    return _storage.query_trades(**filters)
+
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def _load(_storage: Storage, key, **filters) -> pd.DataFrame:
+    return _storage.load_trades(**filters)
+
+
+@st.cache_data(show_spinner=False, max_entries=DERIVED_CACHE_ENTRIES)
+def _browse(_storage: Storage, key, **kwargs) -> Tuple[pd.DataFrame, Optional[tuple]]:
+    return _storage.browse_trades(**kwargs)
+
+
+@st.cache_data(show_spinner=False, max_entries=DERIVED_CACHE_ENTRIES)
+def _monthly_counts(_storage: Storage, key, user: Optional[str]) -> pd.DataFrame:
+    return _storage.monthly_counts(user=user)
+
+
+@st.cache_data(show_spinner=False, max_entries=DERIVED_CACHE_ENTRIES)
+def _month_report(_storage: Storage, key, user: Optional[str], month: str, columns: List[str],
+                  goal_ccy: str, settings: Dict[str, Any], base: Optional[str]) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    mdf = _storage.load_trades(user=user, month=month, columns=columns)
+    report = build_report(mdf, settings, goal_ccy, fx_rates=_storage.fx_rates(), base=base)
+    mdf["days_held"] = report["days_held"]
+    mdf["roi_pct"] = report["roi_pct"]
+    mdf["pnl_base"] = report["pnl_base"]
+    return mdf, report
+
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def _analytics(_storage: Storage, key, user: Optional[str], settings: Dict[str, Any], base: Optional[str],
+               start_capital: float, window: int, day: str) -> Dict[str, Any]:
+    df = _storage.load_trades(user=user, columns=ANALYTICS_COLUMNS)
+    return build_analytics(df, settings, fx_rates=_storage.fx_rates(), base=base,
+                           start_capital=start_capital, window=window, today=pd.Timestamp(day))
+
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def _statement(_storage: Storage, key, manifest_mtime: float, user: Optional[str], month: str, base: str,
+               day: str) -> Optional[Dict[str, Any]]:
+    from utils.statements import DERIVED_COLUMNS, fresh_statement
+    stmt = fresh_statement(_storage, user, month, base, today=pd.Timestamp(day))
+    if stmt is None or "csv" not in stmt["paths"]:
+        return None
+    with open(stmt["paths"]["charts"]) as f:
+        stmt["charts"] = json.load(f)
+    stmt["derived"] = pd.read_csv(stmt["paths"]["csv"], usecols=["id", *DERIVED_COLUMNS])
+    stmt["downloads"] = {}
+    for fmt, path in stmt["paths"].items():
+        if fmt != "charts":
+            with open(path, "rb") as f:
+                stmt["downloads"][fmt] = f.read()
+    return stmt
+
+
+def load_settings(storage: Storage) -> Dict[str, Any]:
+    return _settings(storage, _key(storage))
+
+
+def query_trades(storage: Storage, **filters) -> pd.DataFrame:
+    return _query(storage, _key(storage), **filters)
+
+
+def load_trades(storage: Storage, **filters) -> pd.DataFrame:
+    # typed frame (Storage.load_trades)
+    return _load(storage, _key(storage), **filters)
+
+
+def browse_trades(storage: Storage, **kwargs) -> Tuple[pd.DataFrame, Optional[tuple]]:
+    # one page of Storage.browse_trades(); a page is cached until the next write
+    return _browse(storage, _key(storage), **kwargs)
+
+
+def monthly_counts(storage: Storage, user: Optional[str] = None) -> pd.DataFrame:
+    return _monthly_counts(storage, _key(storage), user)
+
+
+def month_report(storage: Storage, user: Optional[str], month: str, columns: List[str],
+                 goal_ccy: str, settings: Dict[str, Any],
+                 base: Optional[str] = None) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    # Month rows with days_held/roi_pct/pnl_base attached, plus the build_report metrics.
+    return _month_report(storage, _key(storage), user, month, list(columns), goal_ccy, settings, base)
+
+
+def statement(storage: Storage, user: Optional[str], month: str, base: str) -> Optional[Dict[str, Any]]:
+    # A closed month's pre-rendered statement (utils.statements) with its charts, derived trade
+    # columns and file bytes, or None when it is missing or stale; keyed on the manifest too.
+    from utils.statements import manifest_mtime
+    return _statement(storage, _key(storage), manifest_mtime(storage), user, month, base,
+                      str(pd.Timestamp.today().date()))
+
+
+def analytics(storage: Storage, user: Optional[str], settings: Dict[str, Any], base: Optional[str] = None,
+              start_capital: float = 0.0, window: int = 63) -> Dict[str, Any]:
+    # Equity curve, drawdown and grouped trade stats for the whole journal (see utils.analytics).
+    # keyed on the day too: the curve runs up to today while positions are open
+    return _analytics(storage, _key(storage), user, settings, base, float(start_capital), int(window),
+                      str(pd.Timestamp.today().date()))
+
+
+perf.instrument_module(globals(), "cache")
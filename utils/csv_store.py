@@ -0,0 +1,228 @@
+import io, os, csv, threading
+from contextlib import contextmanager
+from typing import IO, Dict, Any, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to the in-process lock only
+    fcntl = None
+
+_THREAD_LOCKS: Dict[str, threading.RLock] = {}
+_THREAD_LOCKS_GUARD = threading.Lock()
+_HELD = threading.local()  # per-thread lock depth, so locked() can nest
+
+
+def _thread_lock(path: str) -> threading.RLock:
+    key = os.path.abspath(path)
+    with _THREAD_LOCKS_GUARD:
+        return _THREAD_LOCKS.setdefault(key, threading.RLock())
+
+
+@contextmanager
+def file_lock(path: str, lock_file: str):
+    # flock serialises Streamlit sessions across processes; the thread lock covers
+    # platforms without fcntl and sessions sharing one process. Re-entrant per thread.
+    key = os.path.abspath(path)
+    with _thread_lock(path):
+        depth = getattr(_HELD, key, 0)
+        setattr(_HELD, key, depth + 1)
+        try:
+            if depth:
+                yield
+                return
+            with open(lock_file, "a") as lf:
+                if fcntl is not None:
+                    fcntl.flock(lf.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lf.fileno(), fcntl.LOCK_UN)
+        finally:
+            setattr(_HELD, key, depth)
+
+
+def _cell(v):
+    return "" if v is None else v
+
+
+class _Head(io.RawIOBase):
+    # the first `size` bytes of an open file
+    def __init__(self, f, size: int):
+        self.f, self.left = f, size
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        n = self.f.readinto(memoryview(b)[:self.left]) if self.left > 0 else 0
+        self.left -= n
+        return n
+
+    def close(self):
+        self.f.close()
+        super().close()
+
+
+# Append-only CSV table with a sidecar id sequence and a cross-process file lock.
+# Inserts append rows instead of rewriting the file; whole-file rewrites only happen in
+# compact(), via a temp file + os.replace so readers never see a torn file.
+class CsvStore:
+    def __init__(self, path: str, columns: List[str]):
+        self.path = path
+        self.columns = columns
+        self.seq_file = path + ".seq"    # "<next_id> <file_size>" written after each append
+        self.lock_file = path + ".lock"
+
+    def locked(self):
+        return file_lock(self.path, self.lock_file)
+
+    def ensure(self):
+        if not os.path.exists(self.path):
+            with self.locked():
+                if not os.path.exists(self.path):
+                    self._write_atomic([])
+            return
+        with open(self.path, "r", newline="") as f:
+            header = next(csv.reader(f), [])
+        if header != self.columns:
+            with self.locked():
+                self.compact()
+
+    # ---- id sequence ----
+    def _read_seq(self) -> Optional[int]:
+        try:
+            with open(self.seq_file, "r") as f:
+                next_id, size = f.read().split()
+            # a size mismatch means the CSV was written by something other than append()
+            if int(size) == os.path.getsize(self.path):
+                return int(next_id)
+        except (OSError, ValueError):
+            pass
+        return None
+
+    def _write_seq(self, next_id: int):
+        tmp = self.seq_file + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(f"{next_id} {os.path.getsize(self.path)}")
+        os.replace(tmp, self.seq_file)
+
+    def _scan_next_id(self) -> int:
+        # Recovery path only (missing/stale sidecar): O(n) scan of the id column.
+        max_id = 0
+        with open(self.path, "r", newline="") as f:
+            reader = csv.reader(f)
+            header = next(reader, [])
+            if "id" not in header:
+                return 1
+            pos = header.index("id")
+            for row in reader:
+                try:
+                    max_id = max(max_id, int(float(row[pos])))
+                except (IndexError, ValueError):
+                    continue
+        return max_id + 1
+
+    def _tail_is_clean(self) -> bool:
+        size = os.path.getsize(self.path)
+        if size == 0:
+            return False
+        with open(self.path, "rb") as f:
+            f.seek(size - 1)
+            return f.read(1) == b"\n"
+
+    def _complete_size(self, f) -> int:
+        # bytes up to and including the last newline
+        pos = os.fstat(f.fileno()).st_size
+        while pos > 0:
+            step = min(pos, 1 << 16)
+            f.seek(pos - step)
+            cut = f.read(step).rfind(b"\n")
+            if cut >= 0:
+                return pos - step + cut + 1
+            pos -= step
+        return 0
+
+    def open_complete(self) -> Optional[IO[bytes]]:
+        # Unlocked readers: the file up to its last complete line, so a row an appender is
+        # writing (or a crashed one left behind) is never parsed. None if there is none.
+        f = open(self.path, "rb")
+        size = self._complete_size(f)
+        if size == 0:
+            f.close()
+            return None
+        f.seek(0)
+        return io.BufferedReader(_Head(f, size), 1 << 20)
+
+    # ---- writes ----
+    def append(self, rows: List[Dict[str, Any]]) -> List[int]:
+        with self.locked():
+            if not os.path.exists(self.path) or not self._tail_is_clean():
+                self.compact()
+            next_id = self._read_seq()
+            if next_id is None:
+                next_id = self._scan_next_id()
+            ids = list(range(next_id, next_id + len(rows)))
+            with open(self.path, "a", newline="") as f:
+                w = csv.writer(f, lineterminator="\n")
+                for new_id, r in zip(ids, rows):
+                    w.writerow([new_id if c == "id" else _cell(r.get(c)) for c in self.columns])
+                f.flush()
+                os.fsync(f.fileno())
+            self._write_seq(next_id + len(rows))
+        return ids
+
+    def compact(self, rows: Optional[List[List[Any]]] = None):
+        # Atomic rewrite; caller must hold locked(). Without `rows` the current file is
+        # re-read, dropping a torn trailing row and realigning columns to the schema.
+        if rows is None:
+            rows = self._read_aligned()
+        self._write_atomic(rows)
+        try:
+            os.remove(self.seq_file)
+        except OSError:
+            pass
+
+    def update(self, row_id: int, changes: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        # Rewrite one row by id (a full compact); caller must hold locked(). Returns the old
+        # row as read (text cells), or None when no row has that id.
+        rows = self._read_aligned()
+        pos = self.columns.index("id")
+        for i, row in enumerate(rows):
+            try:
+                hit = int(float(row[pos])) == row_id
+            except ValueError:
+                continue
+            if hit:
+                rows[i] = [_cell(changes[c]) if c in changes else v for c, v in zip(self.columns, row)]
+                self.compact(rows)
+                return dict(zip(self.columns, row))
+        return None
+
+    def _read_aligned(self) -> List[List[Any]]:
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, "rb") as f:
+            data = f.read()
+        cut = data.rfind(b"\n")
+        data = data[:cut + 1] if cut >= 0 else b""
+        lines = data.decode("utf-8").splitlines(keepends=True)
+        reader = csv.reader(lines)
+        header = next(reader, [])
+        pos = {c: i for i, c in enumerate(header)}
+        out = []
+        for row in reader:
+            if len(row) != len(header):
+                continue
+            out.append([row[pos[c]] if c in pos else "" for c in self.columns])
+        return out
+
+    def _write_atomic(self, rows: List[List[Any]]):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", newline="") as f:
+            w = csv.writer(f, lineterminator="\n")
+            w.writerow(self.columns)
+            w.writerows(rows)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
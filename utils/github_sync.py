@@ -1,30 +1,204 @@
-import os, io, time
+import os, json, time, hashlib, threading, posixpath
+from typing import Any, Dict, Optional
 import streamlit as st
-from github import Github
+from utils import perf
 
-def maybe_sync_csv_to_github(storage):
-    # Only sync if using CSV backend
-    if getattr(storage, "backend", "sqlite") != "csv":
-        return
-    token = st.secrets.get("github", {}).get("token", "")
-    repo_name = st.secrets.get("github", {}).get("repo", "")
-    branch = st.secrets.get("github", {}).get("branch", "main")
-    if not token or not repo_name:
-        return  # not configured
+SYNC_INTERVAL = 30.0     # seconds saves are coalesced before one commit
+BACKOFF_BASE = 5.0       # first retry delay; doubles per failed attempt
+BACKOFF_MAX = 600.0
+STATE_FILE = "github_sync.json"
+REMOTE_PATH = "data/trades.csv"
+
+
+def _blob_sha(content: bytes) -> str:
+    # git blob id, which is what the contents API reports as `sha`
+    return hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+
+
+def sync_config() -> Dict[str, Any]:
     try:
-        g = Github(token)
-        repo = g.get_repo(repo_name)
-        path = "data/trades.csv"
-        # Read the local CSV
-        with open("data/trades.csv", "rb") as f:
-            content = f.read()
+        cfg = st.secrets.get("github", {})
+    except FileNotFoundError:  # no secrets.toml (e.g. the headless API): sync stays off
+        cfg = {}
+    return {
+        "token": cfg.get("token", ""),
+        "repo": cfg.get("repo", ""),
+        "branch": cfg.get("branch", "main"),
+        "path": cfg.get("path", REMOTE_PATH),
+        # a GitHub Enterprise or local fake of the contents API
+        "base_url": cfg.get("base_url", os.environ.get("GITHUB_API_URL", "")),
+        "interval": float(cfg.get("interval", SYNC_INTERVAL)),
+    }
+
+
+# Background CSV -> GitHub sync. Saves only mark the file dirty (persisted in a small JSON
+# state file, so a restart still pushes); a daemon thread pushes at most once per interval,
+# skips unchanged content, and backs off on errors.
+class SyncWorker:
+    def __init__(self, storage, config: Dict[str, Any], state_file: Optional[str] = None):
+        self.storage = storage
+        self.config = dict(config)
+        self.state_file = state_file or os.path.join(storage.data_dir, STATE_FILE)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._repo = None
+        self.state: Dict[str, Any] = {"pending_since": None, "synced_hash": None, "synced_at": None,
+                                      "remote_sha": None, "attempts": 0, "next_attempt": 0.0,
+                                      "last_error": None, "pushes": 0, "changes": 0}
+        self.state.update(self._load_state())
+        self._thread = threading.Thread(target=self._run, name="github-sync", daemon=True)
+        self._thread.start()
+
+    # ---- state ----
+    def _load_state(self) -> Dict[str, Any]:
+        try:
+            with open(self.state_file, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self):
+        tmp = self.state_file + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self.state_file)
+
+    def notify(self):
+        # called after each save; cheap and non-blocking
+        with self._lock:
+            self.state["changes"] += 1  # every save, so a push can tell if one landed meanwhile
+            if self.state["pending_since"] is None:
+                self.state["pending_since"] = time.time()
+                self._save_state()
+        self._wake.set()
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            s = dict(self.state)
+        s["lag"] = time.time() - s["pending_since"] if s["pending_since"] else 0.0
+        return s
+
+    def flush(self, timeout: float = 30.0) -> bool:
+        # push now, ignoring the coalescing window; True once nothing is pending
+        with self._lock:
+            if self.state["pending_since"] is not None:
+                self.state["pending_since"] = min(self.state["pending_since"], time.time() - self.config["interval"])
+                self.state["next_attempt"] = 0.0
+        self._wake.set()
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.status()["pending_since"] is None:
+                return True
+            time.sleep(0.05)
+        return False
+
+    # ---- worker ----
+    def _due_in(self) -> Optional[float]:
+        with self._lock:
+            since = self.state["pending_since"]
+            if since is None:
+                return None
+            return max(since + self.config["interval"], self.state["next_attempt"]) - time.time()
+
+    def _run(self):
+        while True:
+            due = self._due_in()
+            if due is None or due > 0:
+                self._wake.wait(timeout=due)
+                self._wake.clear()
+                continue
+            self._push()
+
+    def _client_repo(self):
+        if self._repo is None:
+            from github import Github, Auth
+            kwargs = {"base_url": self.config["base_url"]} if self.config.get("base_url") else {}
+            self._repo = Github(auth=Auth.Token(self.config["token"]), **kwargs).get_repo(self.config["repo"])
+        return self._repo
+
+    def _push(self):
+        with self._lock:
+            seen = self.state["changes"]
+        try:
+            with self.storage.csv_store.locked():
+                with open(self.storage.csv_file, "rb") as f:
+                    content = f.read()
+            digest = hashlib.sha256(content).hexdigest()
+            if digest != self.state["synced_hash"]:
+                self._put(content)
+            with self._lock:
+                # saves that landed during the push stay pending
+                if self.state["changes"] == seen:
+                    self.state["pending_since"] = None
+                self.state.update(synced_hash=digest, synced_at=time.time(), attempts=0,
+                                  next_attempt=0.0, last_error=None)
+                self._save_state()
+        except Exception as e:
+            with self._lock:
+                self.state["attempts"] += 1
+                delay = min(BACKOFF_BASE * 2 ** (self.state["attempts"] - 1), BACKOFF_MAX)
+                self.state.update(next_attempt=time.time() + delay, last_error=f"{type(e).__name__}: {e}")
+                self._save_state()
+
+    @perf.timed("external.github")
+    def _put(self, content: bytes):
+        from github import GithubException
+        repo, path, branch = self._client_repo(), self.config["path"], self.config["branch"]
+        if _blob_sha(content) == self.state["remote_sha"]:
+            return  # remote already has these bytes
         message = f"Update trades.csv at {time.strftime('%Y-%m-%d %H:%M:%S')}"
+        sha = self.state["remote_sha"]
         try:
-            file = repo.get_contents(path, ref=branch)
-            repo.update_file(path, message, content.decode("utf-8"), file.sha, branch=branch)
-        except Exception:
-            # create if not exists
-            repo.create_file(path, message, content.decode("utf-8"), branch=branch)
-        st.info("CSV synced to GitHub repo.")
-    except Exception as e:
-        st.warning(f"GitHub sync skipped: {e}")
+            if sha is None:
+                raise GithubException(404, "unknown remote sha", None)
+            res = repo.update_file(path, message, content, sha, branch=branch)
+        except GithubException as e:
+            if e.status not in (404, 409, 422):
+                raise
+            # remote sha unknown or stale: look it up once, then write
+            try:
+                sha = repo.get_contents(path, ref=branch).sha
+            except GithubException as e2:
+                if e2.status != 404:
+                    raise
+                sha = None
+            if sha == _blob_sha(content):
+                res = None
+            elif sha is None:
+                res = repo.create_file(path, message, content, branch=branch)
+            else:
+                res = repo.update_file(path, message, content, sha, branch=branch)
+        with self._lock:
+            self.state["remote_sha"] = res["content"].sha if res else _blob_sha(content)
+            self.state["pushes"] += 1 if res else 0
+
+
+_WORKERS: Dict[str, SyncWorker] = {}
+_WORKERS_LOCK = threading.Lock()
+
+
+def get_sync_worker(storage) -> Optional[SyncWorker]:
+    # One worker per CSV file for the whole process; None unless CSV backend + secrets.
+    if getattr(storage, "backend", "sqlite") != "csv":
+        return None
+    cfg = sync_config()
+    if not cfg["token"] or not cfg["repo"]:
+        return None  # not configured
+    parent, slug = os.path.split(os.path.abspath(storage.data_dir))
+    if os.path.basename(parent) == "users":
+        # a per-user partition pushes to its own file next to the configured path
+        cfg["path"] = posixpath.join(posixpath.dirname(cfg["path"]), "users", slug, posixpath.basename(cfg["path"]))
+    key = os.path.abspath(storage.csv_file)
+    with _WORKERS_LOCK:
+        worker = _WORKERS.get(key)
+        if worker is None:
+            worker = _WORKERS[key] = SyncWorker(storage, cfg)
+        return worker
+
+
+def maybe_sync_csv_to_github(storage):
+    # Queue a sync after a save; the push happens in the background.
+    worker = get_sync_worker(storage)
+    if worker is not None:
+        worker.notify()
+    return worker
@@ -0,0 +1,198 @@
+import os, json, time
+from typing import Any, Dict, IO, Optional, Set, Union
+import pandas as pd
+from utils.storage import Storage, SCHEMA_COLUMNS, DATA_DIR, open_user_storage
+
+# Generic broker CSV -> journal mapping. Override any part with a YAML/JSON file
+# (see import_mapping.example.yaml); unknown keys are ignored.
+DEFAULT_MAPPING: Dict[str, Any] = {
+    # journal column -> broker CSV header
+    "columns": {
+        "symbol": "Symbol", "market": "Exchange", "currency": "Currency",
+        "sector": "Sector", "trade_type": "Side",
+        "entry_date": "Open Date", "exit_date": "Close Date",
+        "qty": "Quantity", "entry_price": "Open Price", "exit_price": "Close Price",
+        "capital_invested": "Cost", "sl": "Stop", "target": "Target", "notes": "Comment",
+    },
+    # broker value -> journal value (matched case-insensitively)
+    "markets": {"NSE": "India", "BSE": "India", "NASDAQ": "US", "NYSE": "US", "ARCA": "US",
+                "AMEX": "US", "ASX": "Australia"},
+    "currencies": {},
+    "trade_types": {"BUY": "Swing Long", "LONG": "Swing Long", "SELL": "Swing Short", "SHORT": "Swing Short"},
+    "date_format": None,   # e.g. "%d/%m/%Y"; None lets pandas infer
+    "dayfirst": False,
+    "defaults": {"market": "US", "sector": "Other", "trade_type": "Swing Long"},
+}
+
+MARKETS = ["India", "US", "Australia"]
+MARKET_CURRENCY = {"India": "INR", "US": "USD", "Australia": "AUD"}
+SUFFIX_MARKET = {".NS": "India", ".BO": "India", ".AX": "Australia"}
+# natural key used to skip trades that are already in the journal (or repeated in the file)
+NATURAL_KEY = ["user", "market", "symbol", "entry_date", "qty", "entry_price", "exit_date", "exit_price"]
+CHUNK_ROWS = 5000
+
+
+def load_mapping(path: Optional[str] = None, text: Optional[str] = None) -> Dict[str, Any]:
+    raw: Dict[str, Any] = {}
+    if path:
+        with open(path, "r") as f:
+            text = f.read()
+        if path.endswith(".json"):
+            raw = json.loads(text)
+            text = None
+    if text:
+        import yaml
+        raw = yaml.safe_load(text) or {}
+    mapping = {k: (dict(v) if isinstance(v, dict) else v) for k, v in DEFAULT_MAPPING.items()}
+    for k, v in raw.items():
+        if isinstance(v, dict) and isinstance(mapping.get(k), dict):
+            mapping[k].update(v)
+        else:
+            mapping[k] = v
+    return mapping
+
+
+def default_mapping_yaml() -> str:
+    import yaml
+    return yaml.safe_dump(DEFAULT_MAPPING, sort_keys=False)
+
+
+def _lookup(s: pd.Series, table: Dict[str, str]) -> pd.Series:
+    upper = {str(k).upper(): v for k, v in table.items()}
+    return s.astype("string").str.strip().str.upper().map(upper)
+
+
+def _dates(s: pd.Series, mapping: Dict[str, Any]) -> pd.Series:
+    d = pd.to_datetime(s, format=mapping.get("date_format"), dayfirst=bool(mapping.get("dayfirst")),
+                       errors="coerce")
+    return d.dt.strftime("%Y-%m-%d").astype(object).where(d.notna(), None)
+
+
+def normalize_chunk(raw: pd.DataFrame, mapping: Dict[str, Any], user: str) -> Dict[str, pd.DataFrame]:
+    # Broker rows -> journal rows (SCHEMA_COLUMNS minus id/timestamps), plus rejected rows
+    # with a reason. Vectorized over the chunk.
+    cols = mapping["columns"]
+    defaults = mapping.get("defaults", {})
+    n = len(raw)
+    def src(col):
+        header = cols.get(col)
+        if header and header in raw.columns:
+            return raw[header]
+        return pd.Series([defaults.get(col)] * n, index=raw.index, dtype=object)
+
+    out = pd.DataFrame(index=raw.index)
+    out["user"] = user
+    symbol = src("symbol").astype("string").str.strip().str.upper()
+    suffix = symbol.str.extract(r"(\.[A-Z]{2})$", expand=False)
+    out["symbol"] = symbol.str.replace(r"\.[A-Z]{2}$", "", regex=True)
+
+    market = src("market")
+    mapped = _lookup(market, mapping.get("markets", {}))
+    as_is = market.astype("string").str.strip().where(market.astype("string").str.strip().isin(MARKETS))
+    market = mapped.fillna(as_is).fillna(suffix.map(SUFFIX_MARKET)).fillna(defaults.get("market", "US"))
+    out["market"] = market
+
+    ccy = src("currency")
+    ccy = _lookup(ccy, mapping.get("currencies", {})).fillna(ccy.astype("string").str.strip().str.upper())
+    out["currency"] = ccy.where(ccy.isin(list(MARKET_CURRENCY.values())), market.map(MARKET_CURRENCY))
+
+    out["sector"] = src("sector").astype("string").fillna(defaults.get("sector", "Other"))
+    tt = src("trade_type")
+    out["trade_type"] = _lookup(tt, mapping.get("trade_types", {})).fillna(tt.astype("string")).fillna(
+        defaults.get("trade_type", "Swing Long"))
+
+    out["entry_date"] = _dates(src("entry_date"), mapping)
+    out["exit_date"] = _dates(src("exit_date"), mapping)
+    qty = pd.to_numeric(src("qty"), errors="coerce").abs()
+    for c in ("entry_price", "exit_price", "capital_invested", "sl", "target"):
+        out[c] = pd.to_numeric(src(c), errors="coerce")
+    whole = qty.round()
+    out["qty"] = whole.astype("Int64")
+    out["capital_invested"] = out["capital_invested"].fillna(whole * out["entry_price"])
+    out["notes"] = src("notes").astype("string")
+
+    reason = pd.Series(None, index=raw.index, dtype=object)
+    reason = reason.mask(out["symbol"].isna() | (out["symbol"] == ""), "missing symbol")
+    reason = reason.mask(reason.isna() & out["entry_date"].isna(), "missing/invalid entry date")
+    reason = reason.mask(reason.isna() & ~(qty > 0), "quantity must be > 0")
+    reason = reason.mask(reason.isna() & ((qty - whole).abs() > 1e-9), "quantity must be a whole number")
+    reason = reason.mask(reason.isna() & ~(out["entry_price"] > 0), "entry price must be > 0")
+    bad = reason.notna().to_numpy()
+    rejected = raw.loc[bad].assign(reason=reason[bad])
+    cols_out = [c for c in SCHEMA_COLUMNS if c not in ("id", "created_at", "updated_at")]
+    good = out.loc[~bad, cols_out]
+    return {"rows": good.astype(object).where(good.notna(), None), "rejected": rejected}
+
+
+def _keys(df: pd.DataFrame) -> pd.Series:
+    parts = []
+    for c in NATURAL_KEY:
+        s = df[c]
+        if c in ("qty", "entry_price", "exit_price"):
+            s = pd.to_numeric(s, errors="coerce").astype("float64").round(6)
+        parts.append(s.astype("string").fillna(""))
+    key = parts[0]
+    for p in parts[1:]:
+        key = key + "|" + p
+    return key
+
+
+def existing_keys(storage: Storage, user: str) -> Set[str]:
+    df = storage.query_trades(user=user, columns=NATURAL_KEY)
+    return set(_keys(df)) if len(df) else set()
+
+
+def import_trades(storage: Storage, source: Union[str, IO], user: str,
+                  mapping: Optional[Dict[str, Any]] = None, chunk_rows: int = CHUNK_ROWS,
+                  dry_run: bool = False, progress=None) -> Dict[str, Any]:
+    # Stream a broker CSV in chunks: normalize, validate, dedupe, then one batched
+    # insert (one transaction) per chunk. `progress(stats)` is called after each chunk.
+    mapping = mapping or load_mapping()
+    seen = existing_keys(storage, user)
+    stats: Dict[str, Any] = {"read": 0, "inserted": 0, "duplicates": 0, "rejected": 0, "errors": []}
+    t0 = time.perf_counter()
+    for raw in pd.read_csv(source, chunksize=chunk_rows, dtype=str, skipinitialspace=True):
+        stats["read"] += len(raw)
+        norm = normalize_chunk(raw, mapping, user)
+        rows, rejected = norm["rows"], norm["rejected"]
+        stats["rejected"] += len(rejected)
+        for idx, r in rejected["reason"].head(20 - len(stats["errors"])).items():
+            stats["errors"].append(f"row {int(idx) + 2}: {r}")  # +2: header line, 1-based
+        if len(rows):
+            keys = _keys(rows)
+            dup = keys.isin(seen).to_numpy() | keys.duplicated().to_numpy()
+            stats["duplicates"] += int(dup.sum())
+            rows, keys = rows.loc[~dup], keys[~dup]
+            if len(rows) and not dry_run:
+                storage.insert_trades(rows.to_dict("records"))
+            seen.update(keys)
+            stats["inserted"] += len(rows)
+        stats["seconds"] = time.perf_counter() - t0
+        stats["rows_per_sec"] = stats["read"] / stats["seconds"] if stats["seconds"] > 0 else 0.0
+        if progress:
+            progress(stats)
+    stats.setdefault("seconds", time.perf_counter() - t0)
+    stats.setdefault("rows_per_sec", 0.0)
+    return stats
+
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Import a broker CSV export into the journal")
+    ap.add_argument("csv")
+    ap.add_argument("--user", required=True, help="journal user the trades belong to")
+    ap.add_argument("--mapping", help="YAML/JSON column/market/currency mapping")
+    ap.add_argument("--backend", default=os.environ.get("JOURNAL_BACKEND", "sqlite"))
+    ap.add_argument("--data-dir", default=DATA_DIR)
+    ap.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    ap.add_argument("--dry-run", action="store_true", help="validate and count without writing")
+    args = ap.parse_args()
+    store = open_user_storage(args.user, args.backend, args.data_dir)  # the partition the app reads
+    res = import_trades(store, args.csv, args.user, load_mapping(args.mapping), args.chunk_rows,
+                        dry_run=args.dry_run,
+                        progress=lambda s: print(f"  {s['read']:,} rows read, {s['rows_per_sec']:,.0f} rows/sec"))
+    for e in res["errors"]:
+        print(f"  rejected {e}")
+    print(f"Read {res['read']:,} | inserted {res['inserted']:,} | duplicates {res['duplicates']:,} | "
+          f"rejected {res['rejected']:,} | {res['rows_per_sec']:,.0f} rows/sec"
+          + (" (dry run)" if args.dry_run else ""))
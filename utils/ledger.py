@@ -0,0 +1,237 @@
+import time
+from collections import deque
+from typing import Any, Dict, Iterable, List, Tuple
+import pandas as pd
+from utils.sqlite_pool import get_pool
+
+# Fills (executions) and the lots matched from them. Realized lots and open lots use the
+# trade column names (entry_date/exit_date/entry_price/exit_price, qty signed: < 0 is short),
+# so reporting.compute_closed_pnl / compute_open_pnl read them like one-row trades.
+METHODS = ["fifo", "average"]
+SIDES = {"BUY": 1, "SELL": -1}
+POSITION_KEY = ["user", "market", "symbol"]
+FILL_COLUMNS = ["id", "user", "market", "symbol", "currency", "side", "date", "qty", "price", "fees",
+                "trade_id", "notes", "created_at"]
+LOT_COLUMNS = ["user", "market", "symbol", "currency", "open_fill_id", "close_fill_id", "entry_date",
+               "exit_date", "qty", "entry_price", "exit_price", "fees", "pnl"]
+OPEN_COLUMNS = ["user", "market", "symbol", "currency", "open_fill_id", "entry_date", "qty", "entry_price",
+                "fees"]
+
+LEDGER_SQL = """
+CREATE TABLE IF NOT EXISTS fills (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  user TEXT NOT NULL,
+  market TEXT NOT NULL,
+  symbol TEXT NOT NULL,
+  currency TEXT,
+  side TEXT NOT NULL,
+  date TEXT NOT NULL,
+  qty REAL NOT NULL,
+  price REAL NOT NULL,
+  fees REAL NOT NULL DEFAULT 0,
+  trade_id INTEGER,
+  notes TEXT,
+  created_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_fills_position ON fills(user, market, symbol, date, id);
+CREATE INDEX IF NOT EXISTS idx_fills_trade ON fills(trade_id);
+CREATE TABLE IF NOT EXISTS ledger_lots (
+  user TEXT NOT NULL,
+  market TEXT NOT NULL,
+  symbol TEXT NOT NULL,
+  currency TEXT,
+  open_fill_id INTEGER,
+  close_fill_id INTEGER NOT NULL,
+  entry_date TEXT,
+  exit_date TEXT NOT NULL,
+  qty REAL NOT NULL,
+  entry_price REAL NOT NULL,
+  exit_price REAL NOT NULL,
+  fees REAL NOT NULL,
+  pnl REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_lots_position ON ledger_lots(user, market, symbol);
+CREATE INDEX IF NOT EXISTS idx_lots_exit ON ledger_lots(user, exit_date);
+CREATE TABLE IF NOT EXISTS ledger_open (
+  user TEXT NOT NULL,
+  market TEXT NOT NULL,
+  symbol TEXT NOT NULL,
+  currency TEXT,
+  open_fill_id INTEGER,
+  entry_date TEXT,
+  qty REAL NOT NULL,
+  entry_price REAL NOT NULL,
+  fees REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_open_position ON ledger_open(user, market, symbol);
+CREATE TABLE IF NOT EXISTS ledger_meta (
+  key TEXT PRIMARY KEY,
+  value TEXT
+);
+"""
+
+
+def match_position(fills: Iterable[Dict[str, Any]], method: str = "fifo") -> Tuple[List[Dict], List[Dict]]:
+    # Match one position's fills (sorted by date, id) into realized lots and open lots.
+    # fifo: a closing fill consumes the oldest open lots first. average: one pooled lot at
+    # the running average cost. Crossing through zero opens a lot on the other side.
+    if method not in METHODS:
+        raise ValueError(f"Unknown matching method {method!r}; expected one of {METHODS}")
+    realized: List[Dict] = []
+    book: deque = deque()  # [signed qty, price, date, fill_id, fee per unit]
+    for f in fills:
+        sign = SIDES[str(f["side"]).upper()]
+        q, px = float(f["qty"]), float(f["price"])
+        fee_u = float(f.get("fees") or 0.0) / q if q else 0.0
+        while q > 1e-12 and book and (book[0][0] > 0) != (sign > 0):
+            lot = book[0]
+            units = min(q, abs(lot[0]))
+            lot_sign = 1.0 if lot[0] > 0 else -1.0
+            fees = units * (lot[4] + fee_u)
+            realized.append({"open_fill_id": lot[3], "close_fill_id": f["id"], "entry_date": lot[2],
+                             "exit_date": f["date"], "qty": lot_sign * units, "entry_price": lot[1],
+                             "exit_price": px, "fees": fees,
+                             "pnl": (px - lot[1]) * lot_sign * units - fees})
+            lot[0] -= lot_sign * units
+            q -= units
+            if abs(lot[0]) <= 1e-12:
+                book.popleft()
+        if q > 1e-12:
+            if method == "average" and book:
+                lot = book[0]  # same side: fold into the running average
+                total = abs(lot[0]) + q
+                lot[1] = (lot[1] * abs(lot[0]) + px * q) / total
+                lot[4] = (lot[4] * abs(lot[0]) + fee_u * q) / total
+                lot[0] += sign * q
+            else:
+                book.append([sign * q, px, f["date"], f["id"], fee_u])
+    open_lots = [{"open_fill_id": lot[3], "entry_date": lot[2], "qty": lot[0], "entry_price": lot[1],
+                  "fees": abs(lot[0]) * lot[4]} for lot in book]
+    return realized, open_lots
+
+
+class Ledger:
+    def __init__(self, path: str):
+        self.path = path
+        self.pool = get_pool(path, init_sql=LEDGER_SQL)
+
+    @property
+    def method(self) -> str:
+        with self.pool.connection() as conn:
+            row = conn.execute("SELECT value FROM ledger_meta WHERE key = 'method'").fetchone()
+        return row[0] if row else "fifo"
+
+    def set_method(self, method: str):
+        if method not in METHODS:
+            raise ValueError(f"Unknown matching method {method!r}; expected one of {METHODS}")
+        with self.pool.connection() as conn:
+            with conn:
+                conn.execute("INSERT OR REPLACE INTO ledger_meta (key, value) VALUES ('method', ?)", (method,))
+                keys = conn.execute("SELECT DISTINCT user, market, symbol FROM fills").fetchall()
+                self._rematch(conn, keys, method)
+
+    def add_fills(self, fills: List[Dict[str, Any]]) -> List[int]:
+        # Insert fills, then re-match only the positions they touch (one transaction).
+        if not fills:
+            return []
+        now = time.strftime("%Y-%m-%d %H:%M:%S")
+        cols = [c for c in FILL_COLUMNS if c != "id"]
+        fills = [{**f, "side": str(f.get("side", "")).upper(), "market": f.get("market") or "",
+                  "fees": f.get("fees") or 0.0, "created_at": now} for f in fills]
+        for f in fills:
+            if f["side"] not in SIDES:
+                raise ValueError(f"Fill side must be BUY or SELL, got {f['side']!r}")
+            if not f.get("qty") or float(f["qty"]) <= 0 or f.get("price") is None or float(f["price"]) <= 0:
+                raise ValueError("Fill qty and price must be > 0")
+            if f.get("user") is None or not f.get("symbol") or not f.get("date"):
+                raise ValueError("Fill needs a user, a symbol and a date")
+        rows = [[f.get(c) for c in cols] for f in fills]
+        method = self.method
+        with self.pool.connection() as conn:
+            with conn:
+                conn.executemany(f"INSERT INTO fills ({','.join(cols)}) VALUES ({','.join('?' * len(cols))})", rows)
+                last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+                keys = list(dict.fromkeys((f["user"], f["market"], f["symbol"]) for f in fills))
+                self._rematch(conn, keys, method)
+        return list(range(last_id - len(rows) + 1, last_id + 1))
+
+    def _rematch(self, conn, keys, method: str):
+        where = "user = ? AND market = ? AND symbol = ?"
+        for key in keys:
+            cur = conn.execute(f"SELECT id, side, date, qty, price, fees, currency FROM fills WHERE {where} "
+                               f"ORDER BY date, id", key)
+            fills = [dict(zip(["id", "side", "date", "qty", "price", "fees", "currency"], r)) for r in cur]
+            realized, open_lots = match_position(fills, method)
+            ccy = next((f["currency"] for f in reversed(fills) if f["currency"]), None)
+            conn.execute(f"DELETE FROM ledger_lots WHERE {where}", key)
+            conn.execute(f"DELETE FROM ledger_open WHERE {where}", key)
+            conn.executemany(
+                f"INSERT INTO ledger_lots ({','.join(LOT_COLUMNS)}) VALUES ({','.join('?' * len(LOT_COLUMNS))})",
+                [(*key, ccy, *(r[c] for c in LOT_COLUMNS[4:])) for r in realized])
+            conn.executemany(
+                f"INSERT INTO ledger_open ({','.join(OPEN_COLUMNS)}) VALUES ({','.join('?' * len(OPEN_COLUMNS))})",
+                [(*key, ccy, *(r[c] for c in OPEN_COLUMNS[4:])) for r in open_lots])
+
+    # ---- reads ----
+    def _select(self, table: str, columns: List[str], user=None, symbols=None, date_col=None, lo=None, hi=None,
+                order: str = "") -> pd.DataFrame:
+        where, params = [], []
+        if user is not None:
+            where.append("user = ?"); params.append(user)
+        if symbols is not None:
+            where.append(f"symbol IN ({','.join(['?'] * len(symbols))})"); params += list(symbols)
+        if date_col and lo is not None:
+            where.append(f"{date_col} >= ?"); params.append(lo)
+        if date_col and hi is not None:
+            where.append(f"{date_col} < ?"); params.append(hi)
+        sql = f"SELECT {','.join(columns)} FROM {table}"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        with self.pool.connection() as conn:
+            return pd.read_sql_query(sql + (f" ORDER BY {order}" if order else ""), conn, params=params)
+
+    def fills(self, user=None, symbols=None) -> pd.DataFrame:
+        return self._select("fills", FILL_COLUMNS, user, symbols, order="date, id")
+
+    def fills_for_trade(self, trade_id: int) -> pd.DataFrame:
+        with self.pool.connection() as conn:
+            return pd.read_sql_query(f"SELECT {','.join(FILL_COLUMNS)} FROM fills WHERE trade_id = ? ORDER BY date, id",
+                                     conn, params=[int(trade_id)])
+
+    def realized_lots(self, user=None, symbols=None, lo=None, hi=None) -> pd.DataFrame:
+        # lo/hi: half-open ISO bounds on exit_date
+        return self._select("ledger_lots", LOT_COLUMNS, user, symbols, "exit_date", lo, hi, "exit_date")
+
+    def open_lots(self, user=None, symbols=None) -> pd.DataFrame:
+        return self._select("ledger_open", OPEN_COLUMNS, user, symbols, order="user, market, symbol, entry_date")
+
+    def open_positions(self, user=None, symbols=None) -> pd.DataFrame:
+        # one row per position: net signed qty at the weighted average entry price
+        lots = self.open_lots(user, symbols)
+        if lots.empty:
+            return lots.drop(columns=["open_fill_id"])
+        lots["cost"] = lots["qty"] * lots["entry_price"]
+        g = lots.groupby(POSITION_KEY, sort=True)
+        pos = g.agg(currency=("currency", "last"), entry_date=("entry_date", "min"), qty=("qty", "sum"),
+                    cost=("cost", "sum"), fees=("fees", "sum")).reset_index()
+        pos["entry_price"] = pos["cost"] / pos["qty"]
+        pos["exit_price"] = float("nan")
+        return pos[POSITION_KEY + ["currency", "entry_date", "qty", "entry_price", "exit_price", "fees"]]
+
+
+def fills_from_trades(trades: pd.DataFrame) -> List[Dict[str, Any]]:
+    # One-row trades -> an opening fill plus, when exited, a closing fill (same trade_id).
+    # "Short" trade types open with a SELL.
+    out = []
+    for t in trades.itertuples(index=False):
+        if pd.isna(t.entry_date) or pd.isna(t.qty) or pd.isna(t.entry_price) or not t.qty or not t.entry_price:
+            continue
+        short = "short" in str(t.trade_type).lower()
+        base = {"user": t.user, "market": t.market, "symbol": t.symbol, "currency": t.currency,
+                "qty": float(t.qty), "trade_id": int(t.id)}
+        out.append({**base, "side": "SELL" if short else "BUY", "date": str(t.entry_date)[:10],
+                    "price": float(t.entry_price)})
+        if pd.notna(t.exit_price) and pd.notna(t.exit_date) and t.exit_price:
+            out.append({**base, "side": "BUY" if short else "SELL", "date": str(t.exit_date)[:10],
+                        "price": float(t.exit_price)})
+    return out
@@ -1,36 +1,49 @@
-import os, textwrap
-import yfinance as yf
-
-def _atr_like(symbol: str, market: str) -> float:
-    t = symbol
-    if market == "India":
-        t = f"{symbol}.NS"
-    elif market == "Australia":
-        t = f"{symbol}.AX"
+import os, textwrap, time, threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from utils.bars import get_bar_store, indicators
+from utils.prices import yahoo_ticker
+from utils import perf
+
+ATR_LOOKBACK_DAYS = 92  # ~3 months of daily bars
+LLM_MODEL = "gpt-4o-mini"
+LLM_TIMEOUT = 20.0      # seconds before the heuristic answer is kept
+INSIGHT_TTL = 15 * 60   # seconds an LLM answer is reused for the same plan
+SYSTEM_PROMPT = "You output concise, practical risk-first trading suggestions."
+
+def _atr_like(symbol: str, market: str, fetch: bool = True) -> float:
+    # fetch=False only reads bars already cached (never blocks on the network)
     try:
-        df = yf.Ticker(t).history(period="3mo")
-        if df.shape[0] < 15:
+        store = get_bar_store()
+        ticker, start = yahoo_ticker(symbol, market), date.today() - timedelta(days=ATR_LOOKBACK_DAYS)
+        bars = store.get_bars(ticker, start) if fetch else store.load(ticker, start)
+        if bars.shape[0] < 15:
             return None
         # simple ATR proxy
-        tr = (df["High"] - df["Low"]).abs()
-        return float(tr.rolling(14).mean().iloc[-1])
+        return float(indicators(bars)["atr_like"].iloc[-1])
     except Exception:
         return None
 
-def _heuristic(market: str, symbol: str, entry: float, bias: str, baseline_risk_pct: float = 1.0) -> str:
-    atr = _atr_like(symbol, market)
+def risk_levels(entry, atr, baseline_risk_pct, long):
+    # The heuristic's rules; scalars or numpy arrays (the batch planner passes whole columns).
+    entry = np.asarray(entry, dtype="float64")
+    atr = np.asarray(atr, dtype="float64")
     # Fallback to % risk on price if ATR unavailable
-    risk_per_share = (baseline_risk_pct/100.0) * entry
-    if atr is not None and atr > 0:
-        risk_per_share = max(risk_per_share, 0.8 * atr)
-    if bias.startswith("Swing Long"):
-        sl = round(entry - risk_per_share, 2)
-        t1 = round(entry + 1.5 * risk_per_share, 2)
-        t2 = round(entry + 2.5 * risk_per_share, 2)
-    else:
-        sl = round(entry + risk_per_share, 2)
-        t1 = round(entry - 1.5 * risk_per_share, 2)
-        t2 = round(entry - 2.5 * risk_per_share, 2)
+    risk_per_share = (np.asarray(baseline_risk_pct, dtype="float64") / 100.0) * entry
+    risk_per_share = np.where(atr > 0, np.fmax(risk_per_share, 0.8 * atr), risk_per_share)
+    side = np.where(long, 1.0, -1.0)
+    sl = np.round(entry - side * risk_per_share, 2)
+    t1 = np.round(entry + side * 1.5 * risk_per_share, 2)
+    t2 = np.round(entry + side * 2.5 * risk_per_share, 2)
+    return risk_per_share, sl, t1, t2
+
+def _heuristic(market: str, symbol: str, entry: float, bias: str, baseline_risk_pct: float = 1.0,
+               fetch: bool = True) -> str:
+    atr = _atr_like(symbol, market, fetch=fetch)
+    _, sl, t1, t2 = (float(v) for v in risk_levels(entry, np.nan if atr is None else atr, baseline_risk_pct,
+                                                  bias.startswith("Swing Long")))
     text = f"""**Heuristic Suggestion**
 - Market: {market} | Symbol: **{symbol}** | Bias: **{bias}**
 - Planned entry: **{entry}**
@@ -40,26 +53,154 @@ def _heuristic(market: str, symbol: str, entry: float, bias: str, baseline_risk_
 """
     return text
 
-def get_trade_insights(market: str, symbol: str, planned_entry: float, bias: str, baseline_risk_pct: float = 1.0) -> str:
-    api_key = os.getenv("OPENAI_API_KEY", None)
-    if not api_key:
-        return _heuristic(market, symbol, planned_entry, bias, baseline_risk_pct)
-    try:
-        # Lazy import to avoid hard dependency if not used
-        from openai import OpenAI
-        client = OpenAI(api_key=api_key)
-        prompt = f"""
+def _prompt(market: str, symbol: str, planned_entry: float, bias: str) -> str:
+    return f"""
 You are a cautious swing-trading assistant.
 Market: {market}; Symbol: {symbol}; Planned entry: {planned_entry}; Bias: {bias}.
 Return JSON with fields: sl, t1, t2, rationale (50 words), risk_per_share.
 """
-        resp = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role":"system","content":"You output concise, practical risk-first trading suggestions."},
-                      {"role":"user","content":prompt}],
-            temperature=0.3,
-        )
-        content = resp.choices[0].message.content
-        return f"**LLM Suggestion**\n\n{content}"
-    except Exception as e:
+
+_CLIENT = None
+_CLIENT_LOCK = threading.Lock()
+
+def _client():
+    # One client (and HTTP connection pool) per process. OPENAI_BASE_URL points it at a
+    # proxy or a local mock server.
+    global _CLIENT
+    api_key = os.getenv("OPENAI_API_KEY", None)
+    if not api_key:
+        return None
+    with _CLIENT_LOCK:
+        if _CLIENT is None or _CLIENT.api_key != api_key:
+            # Lazy import to avoid hard dependency if not used
+            from openai import OpenAI
+            _CLIENT = OpenAI(api_key=api_key, base_url=os.getenv("OPENAI_BASE_URL") or None,
+                             timeout=LLM_TIMEOUT, max_retries=1)
+        return _CLIENT
+
+
+class InsightJob:
+    # One in-flight (or finished) suggestion. `heuristic` is ready immediately; the LLM
+    # text accumulates in the background as the completion streams in.
+    def __init__(self, key: Tuple, heuristic: str, timeout: float):
+        self.key = key
+        self.heuristic = heuristic
+        self.deadline = time.time() + timeout
+        self.chunks: List[str] = []
+        self.error: Optional[str] = None
+        self.cached = False
+        self.future: Optional[Future] = None
+
+    @property
+    def done(self) -> bool:
+        return self.future is None or self.future.done() or self.timed_out
+
+    @property
+    def timed_out(self) -> bool:
+        return self.future is not None and not self.future.done() and time.time() > self.deadline
+
+    @property
+    def llm_text(self) -> str:
+        return "".join(self.chunks)
+
+    def text(self) -> str:
+        # best answer so far
+        if self.llm_text and not self.error and not self.timed_out:
+            return f"**LLM Suggestion**\n\n{self.llm_text}"
+        return self.heuristic
+
+    def wait(self, timeout: Optional[float] = None) -> str:
+        if self.future is not None:
+            remaining = self.deadline - time.time() if timeout is None else timeout
+            try:
+                self.future.result(timeout=max(remaining, 0))
+            except Exception:
+                pass
+        return self.text()
+
+
+class InsightService:
+    def __init__(self, max_workers: int = 4, ttl: float = INSIGHT_TTL, timeout: float = LLM_TIMEOUT):
+        self.ttl = ttl
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="insights")
+        self._lock = threading.Lock()
+        self._cache: Dict[Tuple, Tuple[str, float]] = {}  # key -> (llm text, created_at)
+        self._jobs: Dict[Tuple, InsightJob] = {}
+
+    @staticmethod
+    def key(market: str, symbol: str, entry: float, bias: str, baseline_risk_pct: float) -> Tuple:
+        return (market, symbol.strip().upper(), round(float(entry), 2), bias, round(float(baseline_risk_pct), 1))
+
+    def request(self, market: str, symbol: str, planned_entry: float, bias: str,
+                baseline_risk_pct: float = 1.0) -> InsightJob:
+        key = self.key(market, symbol, planned_entry, bias, baseline_risk_pct)
+        now = time.time()
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and not job.done:
+                return job  # same plan already in flight
+            hit = self._cache.get(key)
+        # cached bars only, so this never waits on Yahoo
+        job = InsightJob(key, _heuristic(market, symbol, planned_entry, bias, baseline_risk_pct, fetch=False),
+                         self.timeout)
+        if hit and now - hit[1] < self.ttl:
+            job.chunks, job.cached = [hit[0]], True
+            return job
+        if os.getenv("OPENAI_API_KEY", None):
+            job.future = self._executor.submit(self._complete, job, market, symbol, planned_entry, bias)
+        else:
+            # no key: warm the bar cache in the background so the heuristic gets its ATR
+            job.future = self._executor.submit(self._refresh_heuristic, job, market, symbol, planned_entry,
+                                               bias, baseline_risk_pct)
+        with self._lock:
+            self._jobs[key] = job
+        return job
+
+    def _refresh_heuristic(self, job: InsightJob, market, symbol, entry, bias, risk):
+        job.heuristic = _heuristic(market, symbol, entry, bias, risk)
+
+    def _complete(self, job: InsightJob, market, symbol, planned_entry, bias):
+        try:
+            with perf.timer("external.openai"):
+                stream = _client().chat.completions.create(
+                    model=LLM_MODEL,
+                    messages=[{"role": "system", "content": SYSTEM_PROMPT},
+                              {"role": "user", "content": _prompt(market, symbol, planned_entry, bias)}],
+                    temperature=0.3,
+                    stream=True,
+                )
+                for chunk in stream:
+                    if time.time() > job.deadline:
+                        stream.close()
+                        raise TimeoutError("LLM request timed out")
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        job.chunks.append(chunk.choices[0].delta.content)
+            if not job.llm_text:
+                raise ValueError("empty completion")
+            with self._lock:
+                self._cache[job.key] = (job.llm_text, time.time())
+        except Exception as e:
+            job.error = str(e) or type(e).__name__
+        finally:
+            with self._lock:
+                if self._jobs.get(job.key) is job:
+                    del self._jobs[job.key]
+
+
+_SERVICE: Optional[InsightService] = None
+_SERVICE_LOCK = threading.Lock()
+
+def get_insight_service() -> InsightService:
+    # Process-wide so every Streamlit session shares the client, executor and cache.
+    global _SERVICE
+    with _SERVICE_LOCK:
+        if _SERVICE is None:
+            _SERVICE = InsightService()
+        return _SERVICE
+
+def get_trade_insights(market: str, symbol: str, planned_entry: float, bias: str, baseline_risk_pct: float = 1.0) -> str:
+    # Blocking variant: waits up to LLM_TIMEOUT for the LLM, else returns the heuristic.
+    if not os.getenv("OPENAI_API_KEY", None):
         return _heuristic(market, symbol, planned_entry, bias, baseline_risk_pct)
+    return get_insight_service().request(market, symbol, planned_entry, bias, baseline_risk_pct).wait()
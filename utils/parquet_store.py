@@ -0,0 +1,260 @@
+import os, glob, json
+from typing import Any, Dict, List, Optional, Set
+import pandas as pd
+from utils.csv_store import file_lock
+
+NULL_MONTH = "__none__"      # partition for rows without an entry_date
+DELTA_FILE = "_delta.jsonl"  # small append-only log, folded into partitions by compact()
+COMPACT_PREFIX = "_compact-"
+DELTA_LIMIT = 2000
+
+INT_COLUMNS = {"id", "qty"}
+FLOAT_COLUMNS = {"entry_price", "exit_price", "capital_invested", "sl", "target"}
+
+
+def _pa():
+    try:
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError("The parquet backend needs pyarrow (pip install pyarrow)") from e
+    return pa, ds, pq
+
+
+def arrow_schema(columns: List[str]):
+    # Fixed schema (no dtype inference on read). Dates stay ISO strings like the other
+    # backends, so range filters are plain string comparisons.
+    pa, _, _ = _pa()
+    def typ(c):
+        if c in INT_COLUMNS:
+            return pa.int64()
+        if c in FLOAT_COLUMNS:
+            return pa.float64()
+        return pa.string()
+    return pa.schema([(c, typ(c)) for c in columns])
+
+
+def _month(entry_date) -> str:
+    if pd.isna(entry_date) or entry_date == "":
+        return NULL_MONTH
+    return str(entry_date)[:7]
+
+
+# Month-partitioned Parquet table: <root>/month=YYYY-MM/part-<n>.parquet plus a JSONL delta.
+# Appends only touch the delta; compact() folds it into one new part per month. A compaction
+# first renames the delta to _compact-<n>.jsonl, so readers (and crash recovery) can tell
+# which part-<n> files are not final yet.
+class ParquetStore:
+    def __init__(self, root: str, columns: List[str], delta_limit: int = DELTA_LIMIT):
+        self.root = root
+        self.columns = columns
+        self.delta_limit = delta_limit
+        self.delta_file = os.path.join(root, DELTA_FILE)
+        self.seq_file = os.path.join(root, "_seq")
+        self.lock_file = os.path.join(root, "_lock")
+
+    def locked(self):
+        return file_lock(self.root, self.lock_file)
+
+    def ensure(self):
+        os.makedirs(self.root, exist_ok=True)
+        if glob.glob(os.path.join(self.root, COMPACT_PREFIX + "*.jsonl")):
+            with self.locked():
+                self._recover()
+
+    def signature(self) -> str:
+        # changes on every append/compaction; used to detect stale sidecar aggregates
+        try:
+            with open(self.seq_file, "r") as f:
+                return f.read().strip()
+        except OSError:
+            return "0"
+
+    # ---- ids ----
+    def _next_id(self) -> int:
+        try:
+            with open(self.seq_file, "r") as f:
+                return int(f.read().strip())
+        except (OSError, ValueError):
+            ids = self.query(["id"])["id"]
+            return int(ids.max()) + 1 if len(ids) else 1
+
+    def _write_seq(self, next_id: int):
+        tmp = self.seq_file + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(str(next_id))
+        os.replace(tmp, self.seq_file)
+
+    # ---- writes ----
+    def append(self, rows: List[Dict[str, Any]]) -> List[int]:
+        with self.locked():
+            next_id = self._next_id()
+            ids = list(range(next_id, next_id + len(rows)))
+            with open(self.delta_file, "a") as f:
+                for new_id, r in zip(ids, rows):
+                    rec = {c: r.get(c) for c in self.columns}
+                    rec["id"] = new_id
+                    f.write(json.dumps(rec, default=str) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._write_seq(next_id + len(rows))
+            if self._delta_rows() >= self.delta_limit:
+                self.compact()
+        return ids
+
+    def _delta_rows(self) -> int:
+        try:
+            with open(self.delta_file, "rb") as f:
+                return sum(1 for _ in f)
+        except OSError:
+            return 0
+
+    def compact(self):
+        # Fold the delta into the month partitions. Caller must hold locked().
+        if not os.path.exists(self.delta_file) or os.path.getsize(self.delta_file) == 0:
+            return
+        cid = self._next_id()
+        pending = os.path.join(self.root, f"{COMPACT_PREFIX}{cid}.jsonl")
+        os.replace(self.delta_file, pending)
+        self._write_parts(self._read_jsonl(pending), f"part-{cid}.parquet")
+        os.remove(pending)
+
+    def _recover(self):
+        # A compaction crashed midway: drop its half-written parts and redo it.
+        for pending in glob.glob(os.path.join(self.root, COMPACT_PREFIX + "*.jsonl")):
+            cid = os.path.basename(pending)[len(COMPACT_PREFIX):-len(".jsonl")]
+            name = f"part-{cid}.parquet"
+            for part in glob.glob(os.path.join(self.root, "month=*", name)):
+                os.remove(part)
+            self._write_parts(self._read_jsonl(pending), name)
+            os.remove(pending)
+
+    def write_all(self, df: pd.DataFrame):
+        # Replace the whole table (migrations). Caller must hold locked().
+        for part in glob.glob(os.path.join(self.root, "month=*", "*.parquet")):
+            os.remove(part)
+        for f in [self.delta_file] + glob.glob(os.path.join(self.root, COMPACT_PREFIX + "*")):
+            if os.path.exists(f):
+                os.remove(f)
+        self._write_parts(df, "part-0.parquet")
+        self._write_seq(int(df["id"].max()) + 1 if len(df) else 1)
+
+    def update(self, row_id: int, changes: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        # Rewrite the table with one row changed (write_all); caller must hold locked().
+        # Returns the old row, or None when no row has that id.
+        df = self.query(list(self.columns))
+        hit = df.index[df["id"] == row_id]
+        if not len(hit):
+            return None
+        old = df.loc[hit[0]]
+        old = old.astype(object).where(old.notna(), None).to_dict()
+        for c, v in changes.items():
+            df.loc[hit[0], c] = v
+        self.write_all(df)
+        return old
+
+    def _write_parts(self, df: pd.DataFrame, name: str):
+        pa, _, pq = _pa()
+        if df.empty:
+            return
+        df = self._conform(df)
+        schema = arrow_schema(self.columns)
+        for month, part in df.groupby(df["entry_date"].map(_month), sort=False):
+            d = os.path.join(self.root, f"month={month}")
+            os.makedirs(d, exist_ok=True)
+            table = pa.Table.from_pandas(part, schema=schema, preserve_index=False)
+            tmp = os.path.join(d, name + ".tmp")
+            pq.write_table(table, tmp, compression="zstd")
+            os.replace(tmp, os.path.join(d, name))
+
+    def _conform(self, df: pd.DataFrame) -> pd.DataFrame:
+        out = pd.DataFrame(index=df.index)
+        for c in self.columns:
+            col = df[c] if c in df.columns else pd.Series(None, index=df.index, dtype=object)
+            if c in INT_COLUMNS:
+                out[c] = pd.to_numeric(col, errors="coerce").astype("Int64")
+            elif c in FLOAT_COLUMNS:
+                out[c] = pd.to_numeric(col, errors="coerce").astype("float64")
+            else:
+                out[c] = col.astype("string")
+        return out
+
+    def _read_jsonl(self, path: str) -> pd.DataFrame:
+        # queries read the delta without the lock: drop a last line an appender is still writing
+        with open(path, "rb") as f:
+            data = f.read()
+        data = data[:data.rfind(b"\n") + 1]
+        recs = [json.loads(line) for line in data.decode("utf-8").splitlines() if line.strip()]
+        return self._conform(pd.DataFrame(recs, columns=self.columns))
+
+    # ---- reads ----
+    def _part_files(self, lo: Optional[str], hi: Optional[str], pending: Set[str]) -> List[str]:
+        # partition pruning on the directory name (entry month); parts of a pending compaction
+        # (ids in `pending`) are skipped, its log has the same rows
+        lo_m = lo[:7] if lo else None
+        hi_m = hi[:7] if hi else None   # hi is exclusive on dates, inclusive on its month
+        files = []
+        for d in glob.glob(os.path.join(self.root, "month=*")):
+            month = os.path.basename(d)[len("month="):]
+            if (lo_m or hi_m) and month == NULL_MONTH:
+                continue
+            if (lo_m and month < lo_m) or (hi_m and month > hi_m):
+                continue
+            for f in glob.glob(os.path.join(d, "part-*.parquet")):
+                if os.path.basename(f)[len("part-"):-len(".parquet")] not in pending:
+                    files.append(f)
+        return sorted(files)
+
+    def query(self, columns: List[str], user=None, lo=None, hi=None, symbols=None,
+              currency=None, open_only: bool = False, row_filter=None) -> pd.DataFrame:
+        for attempt in range(3):
+            try:
+                return self._query(columns, user, lo, hi, symbols, currency, open_only, row_filter)
+            except FileNotFoundError:
+                # a compaction finished while we were listing files; list again
+                if attempt == 2:
+                    raise
+
+    def _query(self, columns, user, lo, hi, symbols, currency, open_only, row_filter):
+        pa, ds, _ = _pa()
+        schema = arrow_schema(self.columns)
+        # One snapshot of the logs, read before the parts are listed. A compaction landing in
+        # between puts the same rows into a new part, so log rows whose id a part has are dropped.
+        logs = sorted(glob.glob(os.path.join(self.root, COMPACT_PREFIX + "*.jsonl")))
+        pending = {os.path.basename(p)[len(COMPACT_PREFIX):-len(".jsonl")] for p in logs}
+        if os.path.exists(self.delta_file):
+            logs.append(self.delta_file)
+        deltas = [self._read_jsonl(path) for path in logs]
+        files = self._part_files(lo, hi, pending)
+        frames, part_ids = [], None
+        if files:
+            expr = None
+            def both(a, b):
+                return b if a is None else a & b
+            if user is not None:
+                expr = both(expr, ds.field("user") == user)
+            if lo is not None:
+                expr = both(expr, ds.field("entry_date") >= lo)
+            if hi is not None:
+                expr = both(expr, ds.field("entry_date") < hi)
+            if symbols is not None:
+                expr = both(expr, ds.field("symbol").isin(symbols))
+            if currency is not None:
+                expr = both(expr, ds.field("currency").isin(currency))
+            if open_only:
+                expr = both(expr, ds.field("exit_price").is_null())
+            dataset = ds.dataset(files, schema=schema, format="parquet")
+            table = dataset.to_table(columns=list(dict.fromkeys(columns + ["id"])), filter=expr)
+            part_ids = table.column("id").to_pandas()
+            frames.append(table.select(columns).to_pandas())
+        for delta in deltas:
+            if row_filter is not None:
+                delta = row_filter(delta, user, lo, hi, symbols, currency, open_only)
+            if part_ids is not None and len(delta):
+                delta = delta[~delta["id"].isin(part_ids)]
+            frames.append(delta[columns])
+        frames = [f for f in frames if len(f)]
+        if not frames:
+            return self._conform(pd.DataFrame(columns=self.columns))[columns]
+        return pd.concat(frames, ignore_index=True)
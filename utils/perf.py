@@ -0,0 +1,144 @@
+import os, json, time, threading, functools, inspect
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+# Process-wide timers and counters for the hot paths: every public Storage method, every
+# utils.reporting / utils.cache function and the external calls (yfinance, OpenAI, GitHub).
+# On by default (a lock and two perf_counter() calls per call); JOURNAL_PERF=0 turns it off.
+# Export with to_json() / to_prometheus(); the sidebar perf panel reads snapshot().
+ENABLED = os.environ.get("JOURNAL_PERF", "1").lower() not in ("0", "false", "no")
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # seconds
+
+_lock = threading.Lock()
+_timers: Dict[str, Dict[str, Any]] = {}
+_counters: Dict[str, float] = {}
+_started = time.time()
+
+
+def observe(name: str, elapsed: float, error: bool = False):
+    # record one timing (seconds) for spans that don't fit timer()/timed()
+    if not ENABLED:
+        return
+    with _lock:
+        t = _timers.get(name)
+        if t is None:
+            t = _timers[name] = {"count": 0, "errors": 0, "total": 0.0, "max": 0.0, "last": 0.0,
+                                 "buckets": [0] * (len(BUCKETS) + 1)}
+        t["count"] += 1
+        t["errors"] += int(error)
+        t["total"] += elapsed
+        t["last"] = elapsed
+        t["max"] = max(t["max"], elapsed)
+        t["buckets"][bisect_left(BUCKETS, elapsed)] += 1
+
+
+@contextmanager
+def timer(name: str):
+    if not ENABLED:
+        yield
+        return
+    t0 = time.perf_counter()
+    error = False
+    try:
+        yield
+    except BaseException:
+        error = True
+        raise
+    finally:
+        observe(name, time.perf_counter() - t0, error)
+
+
+def count(name: str, n: float = 1):
+    if ENABLED:
+        with _lock:
+            _counters[name] = _counters.get(name, 0) + n
+
+
+def timed(name: str) -> Callable:
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return fn(*args, **kwargs)
+            t0 = time.perf_counter()
+            error = False
+            try:
+                return fn(*args, **kwargs)
+            except BaseException:
+                error = True
+                raise
+            finally:
+                observe(name, time.perf_counter() - t0, error)
+        wrapper.__perf_timed__ = True
+        return wrapper
+    return deco
+
+
+def instrument_class(cls, prefix: str):
+    # wrap the public methods defined on cls (properties and dunders are left alone)
+    for attr, fn in list(vars(cls).items()):
+        if attr.startswith("_") or not inspect.isfunction(fn) or getattr(fn, "__perf_timed__", False):
+            continue
+        setattr(cls, attr, timed(f"{prefix}.{attr}")(fn))
+    return cls
+
+
+def instrument_module(namespace: Dict[str, Any], prefix: str):
+    # wrap the public functions defined in a module; call as instrument_module(globals(), ...)
+    module = namespace["__name__"]
+    for attr, fn in list(namespace.items()):
+        if (attr.startswith("_") or not inspect.isfunction(fn) or fn.__module__ != module
+                or getattr(fn, "__perf_timed__", False)):
+            continue
+        namespace[attr] = timed(f"{prefix}.{attr}")(fn)
+
+
+def reset():
+    global _started
+    with _lock:
+        _timers.clear()
+        _counters.clear()
+        _started = time.time()
+
+
+def snapshot() -> Dict[str, Any]:
+    with _lock:
+        timers = {k: dict(v, buckets=list(v["buckets"])) for k, v in _timers.items()}
+        counters = dict(_counters)
+    rows: List[Dict[str, Any]] = []
+    for name, t in sorted(timers.items(), key=lambda kv: -kv[1]["total"]):
+        rows.append({"name": name, "calls": t["count"], "errors": t["errors"],
+                     "total_ms": round(t["total"] * 1000, 2),
+                     "avg_ms": round(t["total"] / t["count"] * 1000, 3) if t["count"] else 0.0,
+                     "max_ms": round(t["max"] * 1000, 2), "last_ms": round(t["last"] * 1000, 2),
+                     "buckets": t["buckets"]})
+    return {"since": _started, "enabled": ENABLED, "timers": rows, "counters": counters}
+
+
+def to_json(indent: Optional[int] = 2) -> str:
+    return json.dumps(snapshot(), indent=indent)
+
+
+def _label(name: str) -> str:
+    return name.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def to_prometheus(prefix: str = "journal") -> str:
+    snap = snapshot()
+    out = [f"# HELP {prefix}_call_seconds Wall time of instrumented calls.",
+           f"# TYPE {prefix}_call_seconds histogram"]
+    for t in snap["timers"]:
+        lbl = _label(t["name"])
+        cum = 0
+        for le, n in zip(list(BUCKETS) + ["+Inf"], t["buckets"]):
+            cum += n
+            out.append(f'{prefix}_call_seconds_bucket{{name="{lbl}",le="{le}"}} {cum}')
+        out.append(f'{prefix}_call_seconds_sum{{name="{lbl}"}} {t["total_ms"] / 1000:.6f}')
+        out.append(f'{prefix}_call_seconds_count{{name="{lbl}"}} {t["calls"]}')
+    out += [f"# HELP {prefix}_call_errors_total Instrumented calls that raised.",
+            f"# TYPE {prefix}_call_errors_total counter"]
+    out += [f'{prefix}_call_errors_total{{name="{_label(t["name"])}"}} {t["errors"]}' for t in snap["timers"]]
+    out += [f"# HELP {prefix}_events_total Event counters.", f"# TYPE {prefix}_events_total counter"]
+    out += [f'{prefix}_events_total{{name="{_label(k)}"}} {v:g}' for k, v in sorted(snap["counters"].items())]
+    return "\n".join(out) + "\n"
@@ -0,0 +1,108 @@
+from datetime import date, timedelta
+from typing import IO, Optional, Union
+import numpy as np
+import pandas as pd
+from utils.bars import get_bar_store, BarStore
+from utils.llm import risk_levels, ATR_LOOKBACK_DAYS
+from utils.prices import yahoo_tickers
+
+ATR_WINDOW = 14
+WATCHLIST_COLUMNS = ["symbol", "market", "entry", "bias", "risk_pct"]
+PLAN_COLUMNS = ["symbol", "market", "ticker", "bias", "entry", "atr", "risk_pct", "risk_per_share",
+                "sl", "t1", "t2", "qty", "risk_amount", "capital"]
+
+
+def load_watchlist(source: Union[str, IO]) -> pd.DataFrame:
+    # CSV with symbol[, market, entry, bias, risk_pct]; headers are matched case-insensitively.
+    wl = pd.read_csv(source, dtype=str, skipinitialspace=True)
+    wl.columns = [c.strip().lower() for c in wl.columns]
+    if "symbol" not in wl.columns:
+        raise ValueError("watchlist needs a 'symbol' column")
+    return normalize_watchlist(wl)
+
+
+def normalize_watchlist(wl: pd.DataFrame, market: str = "US", bias: str = "Swing Long",
+                        risk_pct: float = 1.0) -> pd.DataFrame:
+    out = pd.DataFrame(index=wl.index)
+    out["symbol"] = wl["symbol"].astype("string").str.strip().str.upper()
+    out["market"] = wl["market"].astype("string").str.strip() if "market" in wl.columns else market
+    out["market"] = out["market"].fillna(market)
+    out["entry"] = pd.to_numeric(wl["entry"], errors="coerce") if "entry" in wl.columns else np.nan
+    out["bias"] = wl["bias"].astype("string").fillna(bias) if "bias" in wl.columns else bias
+    out["risk_pct"] = (pd.to_numeric(wl["risk_pct"], errors="coerce").fillna(risk_pct)
+                       if "risk_pct" in wl.columns else risk_pct)
+    return out[out["symbol"].notna() & (out["symbol"] != "")].reset_index(drop=True)
+
+
+def atr_table(bars: pd.DataFrame, window: int = ATR_WINDOW) -> pd.DataFrame:
+    # Last ATR-like value (mean high-low range of the last `window` bars) and last close per
+    # ticker, from one long bar frame sorted by ticker/date. Same minimum history as _atr_like.
+    if bars.empty:
+        return pd.DataFrame(columns=["atr", "last_close"], dtype="float64")
+    rng = (bars["High"] - bars["Low"]).abs()
+    g = rng.groupby(bars["ticker"], sort=False)
+    tail = bars.groupby("ticker", sort=False).cumcount(ascending=False) < window
+    atr = rng[tail].groupby(bars["ticker"][tail], sort=False).mean()
+    out = pd.DataFrame({"atr": atr.where(g.size() >= window + 1),
+                        "last_close": bars.groupby("ticker", sort=False)["Close"].last()})
+    return out
+
+
+def plan_watchlist(watchlist: pd.DataFrame, risk_amount: Optional[float] = None,
+                   store: Optional[BarStore] = None, today: Optional[date] = None,
+                   fetch: bool = True) -> pd.DataFrame:
+    # ATR-based SL/T1/T2 (the AI panel's heuristic rules) for a whole watchlist in one pass.
+    # Missing entries default to the last cached close. With risk_amount, qty is the number
+    # of shares that risks at most that much between entry and SL.
+    store = store or get_bar_store()
+    today = today or date.today()
+    wl = watchlist.reset_index(drop=True).copy()
+    wl["ticker"] = yahoo_tickers(wl).to_numpy()
+    start = today - timedelta(days=ATR_LOOKBACK_DAYS)
+    tickers = wl["ticker"].unique().tolist()
+    if fetch:
+        store.ensure_many(tickers, start, today)
+    stats = atr_table(store.load_many(tickers, start, today))
+    stats = stats.reindex(wl["ticker"])
+    wl["atr"] = stats["atr"].to_numpy()
+    wl["entry"] = wl["entry"].astype("float64").fillna(pd.Series(stats["last_close"].to_numpy(), index=wl.index))
+    long = wl["bias"].astype(str).str.startswith("Swing Long").to_numpy()
+    rps, sl, t1, t2 = risk_levels(wl["entry"].to_numpy(), wl["atr"].to_numpy(), wl["risk_pct"].to_numpy(), long)
+    wl["risk_per_share"] = np.round(rps, 4)
+    wl["sl"], wl["t1"], wl["t2"] = sl, t1, t2
+    if risk_amount:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            qty = np.floor(risk_amount / rps)
+        wl["qty"] = pd.array(np.where(np.isfinite(qty), qty, np.nan), dtype="Float64").astype("Int64")
+        wl["risk_amount"] = np.round(wl["qty"].astype("float64") * rps, 2)
+        wl["capital"] = np.round(wl["qty"].astype("float64") * wl["entry"], 2)
+    else:
+        wl["qty"] = pd.array([pd.NA] * len(wl), dtype="Int64")
+        wl["risk_amount"] = np.nan
+        wl["capital"] = np.nan
+    return wl[PLAN_COLUMNS]
+
+
+def export_plan(plan: pd.DataFrame, path: str):
+    if path.endswith(".xlsx"):
+        plan.to_excel(path, index=False)  # needs openpyxl
+    elif path.endswith(".json"):
+        plan.to_json(path, orient="records", indent=2)
+    else:
+        plan.to_csv(path, index=False)
+
+
+if __name__ == "__main__":
+    import argparse, time
+    ap = argparse.ArgumentParser(description="ATR-based SL/target plan for a watchlist CSV")
+    ap.add_argument("watchlist", help="CSV with symbol[, market, entry, bias, risk_pct]")
+    ap.add_argument("--risk-amount", type=float, help="cash risked per trade, used for position size")
+    ap.add_argument("--out", help="write the plan to .csv/.json/.xlsx instead of printing it")
+    args = ap.parse_args()
+    t0 = time.perf_counter()
+    plan = plan_watchlist(load_watchlist(args.watchlist), risk_amount=args.risk_amount)
+    if args.out:
+        export_plan(plan, args.out)
+        print(f"Planned {len(plan):,} symbols in {time.perf_counter() - t0:.2f}s -> {args.out}")
+    else:
+        print(plan.to_string(index=False))
@@ -0,0 +1,152 @@
+import os, json, time, threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+import pandas as pd
+from utils import perf
+
+PRICE_CACHE_FILE = os.path.join("data", "prices.json")
+DEFAULT_TTL = 300  # seconds a quote is considered fresh
+YAHOO_SUFFIX = {"India": ".NS", "Australia": ".AX"}
+
+
+def yahoo_ticker(symbol: str, market: str) -> str:
+    # naive mapping to Yahoo tickers; user may need to adjust suffixes for some exchanges
+    return f"{symbol}{YAHOO_SUFFIX.get(market, '')}"
+
+
+def yahoo_tickers(df: pd.DataFrame) -> pd.Series:
+    suffix = df["market"].astype(str).map(YAHOO_SUFFIX).fillna("")
+    return df["symbol"].astype(str) + suffix
+
+
+class YahooPriceSource:
+    def __init__(self, max_workers: int = 8):
+        self.max_workers = max_workers
+
+    @perf.timed("external.yfinance.quote")
+    def _fetch_one(self, ticker: str) -> Optional[float]:
+        import yfinance as yf
+        try:
+            data = yf.Ticker(ticker).history(period="5d")
+            if not data.empty:
+                return float(data["Close"].iloc[-1])
+        except Exception:
+            pass
+        return None
+
+    @perf.timed("external.yfinance.quotes_batch")
+    def fetch(self, tickers: List[str]) -> Dict[str, float]:
+        import yfinance as yf
+        out: Dict[str, float] = {}
+        try:
+            # one batched request for every ticker
+            data = yf.download(tickers, period="5d", progress=False, threads=True, auto_adjust=True)
+            close = data["Close"]
+            if isinstance(close, pd.Series):
+                close = close.to_frame(tickers[0])
+            last = close.ffill().iloc[-1]
+            out = {str(t): float(v) for t, v in last.items() if pd.notna(v)}
+        except Exception:
+            pass
+        missing = [t for t in tickers if t not in out]
+        if missing:
+            # batch failed or came back partial: fall back to per-ticker requests in parallel
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(missing))) as ex:
+                for t, px in zip(missing, ex.map(self._fetch_one, missing)):
+                    if px is not None:
+                        out[t] = px
+        return out
+
+
+class StaticPriceSource:
+    # Offline source: a {ticker: price} dict, or a fixture file (JSON map or CSV with ticker,price).
+    def __init__(self, prices: Optional[Dict[str, float]] = None, path: Optional[str] = None):
+        self.prices = dict(prices or {})
+        if path:
+            if path.endswith(".json"):
+                with open(path, "r") as f:
+                    self.prices.update({k: float(v) for k, v in json.load(f).items()})
+            else:
+                fx = pd.read_csv(path)
+                self.prices.update(dict(zip(fx["ticker"].astype(str), fx["price"].astype(float))))
+
+    def fetch(self, tickers: List[str]) -> Dict[str, float]:
+        return {t: self.prices[t] for t in tickers if t in self.prices}
+
+
+def default_price_source():
+    fixture = os.environ.get("JOURNAL_PRICE_FIXTURE")
+    if fixture:
+        return StaticPriceSource(path=fixture)
+    return YahooPriceSource()
+
+
+class PriceService:
+    # TTL quote cache (in memory + JSON on disk) in front of a price source.
+    def __init__(self, source=None, ttl: float = DEFAULT_TTL, cache_file: Optional[str] = PRICE_CACHE_FILE):
+        self.source = source or default_price_source()
+        self.ttl = ttl
+        self.cache_file = cache_file
+        self._lock = threading.Lock()
+        self._quotes: Dict[str, tuple] = self._load_disk()  # ticker -> (price, fetched_at)
+        self._misses: Dict[str, float] = {}  # ticker -> last failed lookup (memory only)
+
+    def _load_disk(self) -> Dict[str, tuple]:
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return {}
+        try:
+            with open(self.cache_file, "r") as f:
+                return {k: (float(v[0]), float(v[1])) for k, v in json.load(f).items()}
+        except Exception:
+            return {}
+
+    def _save_disk(self):
+        if not self.cache_file:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.cache_file) or ".", exist_ok=True)
+            tmp = self.cache_file + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump({k: list(v) for k, v in self._quotes.items()}, f)
+            os.replace(tmp, self.cache_file)
+        except OSError:
+            pass
+
+    def get_quotes(self, tickers: Iterable[str]) -> Dict[str, float]:
+        tickers = list(dict.fromkeys(str(t) for t in tickers))
+        now = time.time()
+        with self._lock:
+            fresh = {t: self._quotes[t][0] for t in tickers
+                     if t in self._quotes and now - self._quotes[t][1] < self.ttl}
+            stale = [t for t in tickers
+                     if t not in fresh and now - self._misses.get(t, float("-inf")) >= self.ttl]
+        perf.count("prices.quote_cache_hits", len(fresh))
+        if stale:
+            perf.count("prices.quote_fetches", len(stale))
+            fetched = self.source.fetch(stale)
+            with self._lock:
+                for t, px in fetched.items():
+                    self._quotes[t] = (float(px), now)
+                # don't hammer the source for unknown symbols (or while offline) on every rerun
+                self._misses.update({t: now for t in stale if t not in fetched})
+                if fetched:
+                    self._save_disk()
+            fresh.update(fetched)
+        return fresh
+
+    def price_table(self, tickers: Iterable[str]) -> pd.Series:
+        quotes = self.get_quotes(tickers)
+        return pd.Series(quotes, dtype="float64", name="ltp")
+
+
+_SERVICE: Optional[PriceService] = None
+_SERVICE_LOCK = threading.Lock()
+
+
+def get_price_service() -> PriceService:
+    # Process-wide service so every Streamlit session shares the quote cache.
+    global _SERVICE
+    with _SERVICE_LOCK:
+        if _SERVICE is None:
+            _SERVICE = PriceService()
+        return _SERVICE
@@ -0,0 +1,62 @@
+import os, sys, json, time, threading
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+# Startup profiler, off unless JOURNAL_PROFILE=1. The app wraps its import groups in
+# phase() and calls first_render() at the end of each script run; the first run of each
+# page in a process is reported (phase timings, modules each phase pulled in, total run
+# time) and, with JOURNAL_PROFILE_FILE set, appended there as one JSON line.
+ENABLED = os.environ.get("JOURNAL_PROFILE", "").lower() not in ("", "0", "false", "no")
+PROFILE_FILE = os.environ.get("JOURNAL_PROFILE_FILE", "")
+HEAVY_MODULES = ["pandas", "numpy", "plotly", "pyarrow", "yfinance", "github", "openai", "yaml", "sqlite3"]
+
+_PROCESS_T0 = time.perf_counter()  # first import of this module ~ first script run
+_lock = threading.Lock()
+_run: Dict[str, Any] = {"t0": _PROCESS_T0, "phases": []}
+_reported: set = set()
+
+
+def start_run():
+    # call at the top of app.py; phases recorded after this belong to the current run
+    if ENABLED:
+        with _lock:
+            _run.update(t0=time.perf_counter(), phases=[])
+
+
+@contextmanager
+def phase(name: str):
+    if not ENABLED:
+        yield
+        return
+    before = set(sys.modules)
+    t = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - t
+        new = set(sys.modules) - before
+        with _lock:
+            _run["phases"].append({"phase": name, "ms": round(elapsed * 1000, 1), "new_modules": len(new),
+                                   "heavy": [m for m in HEAVY_MODULES if m in new]})
+
+
+def first_render(page: str) -> Optional[Dict[str, Any]]:
+    # report for the first run of `page` in this process, else None
+    if not ENABLED:
+        return None
+    now = time.perf_counter()
+    with _lock:
+        if page in _reported:
+            return None
+        cold = not _reported
+        _reported.add(page)
+        report = {"page": page, "cold": cold, "pid": os.getpid(),
+                  "run_ms": round((now - _run["t0"]) * 1000, 1),
+                  "since_process_ms": round((now - _PROCESS_T0) * 1000, 1),
+                  "phases": list(_run["phases"]),
+                  "loaded": [m for m in HEAVY_MODULES if m in sys.modules]}
+    if PROFILE_FILE:
+        with open(PROFILE_FILE, "a") as f:
+            f.write(json.dumps(report) + "\n")
+    print(f"[startup] {json.dumps(report)}", file=sys.stderr)
+    return report
@@ -0,0 +1,315 @@
+import os, threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from typing import Any, Dict, List, Optional
+import numpy as np
+import pandas as pd
+from utils.bars import BarStore, get_bar_store
+from utils.prices import yahoo_tickers
+from utils.sqlite_pool import get_pool
+from utils import perf
+
+# Plan replay: walk each trade's daily bars from entry to exit (to today while open) and
+# check whether its planned SL or target was hit first. Plan-followed P&L exits at that
+# level (at the open when the bar gapped through it); with no hit it is the trade's own
+# exit, or the last close while open. MAE/MFE are the worst/best excursion from entry over
+# the same bars. Direction comes from the plan (SL below entry = long), else trade_type.
+# Both P&Ls are direction-aware (a short gains when price falls).
+# Bars come from the local BarStore only, so this runs offline on cached or fixture bars.
+REPLAY_FILE = "replay.db"
+REPLAY_COLUMNS = ["id", "ticker", "side", "outcome", "hit_date", "bars", "plan_exit", "plan_pnl",
+                  "actual_pnl", "mae", "mfe", "mae_pct", "mfe_pct"]
+PLAN_INPUTS = ["ticker", "entry_date", "exit_date", "qty", "entry_price", "exit_price", "sl", "target", "side"]
+OUTCOMES = ["sl", "target", "both", "none", "no_bars"]  # both: SL and target inside one bar, counted as SL
+PARALLEL_MIN_TRADES = 50_000  # below this a process pool costs more than it saves
+
+REPLAY_SQL = """
+CREATE TABLE IF NOT EXISTS replay_results (
+  id INTEGER PRIMARY KEY,
+  fingerprint INTEGER NOT NULL,
+  ticker TEXT, side INTEGER, outcome TEXT, hit_date TEXT, bars INTEGER,
+  plan_exit REAL, plan_pnl REAL, actual_pnl REAL, mae REAL, mfe REAL, mae_pct REAL, mfe_pct REAL
+);
+"""
+
+
+def plan_inputs(trades: pd.DataFrame, today: Optional[date] = None) -> pd.DataFrame:
+    # per-trade replay inputs: Yahoo ticker, window end (exit or today), side (+1 long / -1 short)
+    today = pd.Timestamp(today or date.today()).normalize()
+    entry = pd.to_numeric(trades["entry_price"], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    sl = pd.to_numeric(trades["sl"], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    target = pd.to_numeric(trades["target"], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    short_type = trades["trade_type"].astype(str).str.contains("short", case=False).to_numpy()
+    side = np.where(sl < entry, 1, np.where(sl > entry, -1,
+                    np.where(target > entry, 1, np.where(target < entry, -1, np.where(short_type, -1, 1)))))
+    out = pd.DataFrame({
+        "id": trades["id"].to_numpy(dtype="int64"),
+        "ticker": yahoo_tickers(trades).to_numpy(),
+        "entry_date": pd.to_datetime(trades["entry_date"], errors="coerce").to_numpy(dtype="datetime64[ns]"),
+        "exit_date": pd.to_datetime(trades["exit_date"], errors="coerce").to_numpy(dtype="datetime64[ns]"),
+        "qty": pd.to_numeric(trades["qty"], errors="coerce").to_numpy(dtype="float64", na_value=np.nan),
+        "entry_price": entry,
+        "exit_price": pd.to_numeric(trades["exit_price"], errors="coerce").to_numpy(dtype="float64",
+                                                                                   na_value=np.nan),
+        "sl": sl, "target": target, "side": side.astype("int64"),
+    })
+    out["end_date"] = out["exit_date"].fillna(today)
+    return out
+
+
+def _sparse(values: np.ndarray, fn) -> List[np.ndarray]:
+    # sparse table: level k holds fn over values[i:i + 2**k]
+    levels = [values]
+    step = 1
+    while 2 * step <= len(values):
+        prev = levels[-1]
+        levels.append(fn(prev[:-step], prev[step:]))
+        step *= 2
+    return levels
+
+
+def _range(levels: List[np.ndarray], fn, s: np.ndarray, n: np.ndarray) -> np.ndarray:
+    # fn over values[s:s + n] per row (n >= 1), two overlapping power-of-two blocks
+    k = np.floor(np.log2(np.maximum(n, 1))).astype("int64")
+    out = np.empty(len(s))
+    for lvl in np.unique(k):
+        rows = k == lvl
+        t = levels[lvl]
+        out[rows] = fn(t[s[rows]], t[s[rows] + n[rows] - (1 << lvl)])
+    return out
+
+
+def _first(levels: List[np.ndarray], s: np.ndarray, e: np.ndarray, x: np.ndarray, below: bool) -> np.ndarray:
+    # first index in [s, e) with values <= x (below, on a min table) or >= x (on a max table);
+    # e where there is none. Binary lifting: skip every power-of-two block that can't contain a hit.
+    pos = s.copy()
+    for lvl in range(len(levels) - 1, -1, -1):
+        step = 1 << lvl
+        can = pos + step <= e
+        val = levels[lvl][np.where(can, pos, 0)]
+        with np.errstate(invalid="ignore"):
+            skip = can & ((val > x) if below else (val < x))
+        pos = pos + skip * step
+    base = levels[0]
+    at = base[np.minimum(pos, len(base) - 1)]
+    with np.errstate(invalid="ignore"):
+        ok = (pos < e) & ((at <= x) if below else (at >= x))   # NaN levels never hit
+    return np.where(ok, pos, e)
+
+
+def _replay_ticker(d, o, h, l, c, trades: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    # All trades on one ticker at once: the bar window of trade i is [s[i], e[i]). Range min/max
+    # and first-hit searches run on sparse tables, so cost is O(log bars) per trade whatever
+    # its holding period.
+    k = len(trades["side"])
+    out = {"outcome": np.full(k, "no_bars", dtype=object), "hit_date": np.full(k, np.datetime64("NaT"), "datetime64[ns]"),
+           "plan_exit": np.full(k, np.nan), "mae": np.full(k, np.nan), "mfe": np.full(k, np.nan)}
+    s = np.searchsorted(d, trades["entry_date"], side="left")
+    e = np.searchsorted(d, trades["end_date"], side="right")
+    n = np.where(np.isnat(trades["entry_date"]), 0, np.maximum(e - s, 0))
+    out["bars"] = n
+    has = n > 0
+    if not has.any():
+        return out
+    s, e, n = s[has], s[has] + n[has], n[has]
+    side, entry = trades["side"][has], trades["entry_price"][has]
+    sl, target, exitp = trades["sl"][has], trades["target"][has], trades["exit_price"][has]
+    lows, highs = _sparse(l, np.minimum), _sparse(h, np.maximum)
+    long = side > 0
+
+    low_min, high_max = _range(lows, np.minimum, s, n), _range(highs, np.maximum, s, n)
+    # an SL triggers on the low for a long (high for a short), a target on the other side
+    first_sl = np.where(long, _first(lows, s, e, sl, True), _first(highs, s, e, sl, False))
+    first_tg = np.where(long, _first(highs, s, e, target, False), _first(lows, s, e, target, True))
+    hit = np.minimum(first_sl, first_tg)
+    got = hit < e
+    is_sl = got & (first_sl <= first_tg)
+    level = np.where(is_sl, sl, target)
+    bar_open = o[np.minimum(hit, len(o) - 1)]
+    # after the entry bar, a gap through the level fills at the open (worse for SL, better for target)
+    gapped = got & (hit > s) & np.where(is_sl, side * (bar_open - level) <= 0, side * (bar_open - level) >= 0)
+
+    outcome = np.full(len(s), "none", dtype=object)
+    outcome[got & ~is_sl] = "target"
+    outcome[is_sl] = "sl"
+    outcome[is_sl & (first_sl == first_tg)] = "both"
+    out["outcome"][has] = outcome
+    out["hit_date"][has] = np.where(got, d[np.minimum(hit, len(d) - 1)], np.datetime64("NaT"))
+    out["plan_exit"][has] = np.where(got, np.where(gapped, bar_open, level),
+                                     np.where(np.isnan(exitp), c[e - 1], exitp))
+    out["mae"][has] = np.maximum(np.where(long, entry - low_min, high_max - entry), 0.0)
+    out["mfe"][has] = np.maximum(np.where(long, high_max - entry, entry - low_min), 0.0)
+    return out
+
+
+def _replay_group(work: List[tuple]) -> List[tuple]:
+    # process-pool unit: [(ticker, bar arrays, trade arrays)] -> [(ticker, result arrays)]
+    return [(t, _replay_ticker(*bars, trades)) for t, bars, trades in work]
+
+
+def replay_frame(inputs: pd.DataFrame, bars: pd.DataFrame, workers: int = 1) -> pd.DataFrame:
+    # Engine: inputs from plan_inputs(), bars a BarStore.load_many() frame (sorted by ticker, date).
+    # One pass per ticker; with workers > 1 tickers are spread over a process pool.
+    if inputs.empty:
+        return pd.DataFrame(columns=REPLAY_COLUMNS)
+    by_ticker = {t: g for t, g in bars.groupby("ticker", sort=False)} if not bars.empty else {}
+    empty = np.array([], dtype="datetime64[ns]"), *([np.array([])] * 4)
+    work = []
+    for t, rows in inputs.groupby("ticker", sort=False).indices.items():
+        g = by_ticker.get(t)
+        arrays = empty if g is None else (g["date"].to_numpy(dtype="datetime64[ns]"),
+                                          *(g[c].to_numpy(dtype="float64") for c in ("Open", "High", "Low", "Close")))
+        sub = {c: inputs[c].to_numpy()[rows] for c in ("entry_date", "end_date", "entry_price", "exit_price",
+                                                       "sl", "target", "qty", "side")}
+        work.append((t, arrays, sub, rows))
+    results: Dict[str, Any] = {}
+    if workers > 1 and len(inputs) >= PARALLEL_MIN_TRADES and len(work) > 1:
+        # balance by trade count: each pool task gets a similar number of rows
+        groups: List[List[tuple]] = [[] for _ in range(min(workers * 4, len(work)))]
+        sizes = [0] * len(groups)
+        for t, arrays, sub, rows in sorted(work, key=lambda w: -len(w[3])):
+            i = sizes.index(min(sizes))
+            groups[i].append((t, arrays, sub))
+            sizes[i] += len(rows)
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            for part in ex.map(_replay_group, [g for g in groups if g]):
+                results.update(part)
+    else:
+        results.update(_replay_group([(t, arrays, sub) for t, arrays, sub, _ in work]))
+
+    k = len(inputs)
+    cols = {"outcome": np.empty(k, dtype=object), "hit_date": np.empty(k, dtype="datetime64[ns]"),
+            "bars": np.empty(k, dtype="int64"), "plan_exit": np.empty(k), "mae": np.empty(k), "mfe": np.empty(k)}
+    for t, _, _, rows in work:
+        for key in cols:
+            cols[key][rows] = results[t][key]
+    entry, qty, side = (inputs[c].to_numpy() for c in ("entry_price", "qty", "side"))
+    exitp = inputs["exit_price"].to_numpy()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out = pd.DataFrame({
+            "id": inputs["id"].to_numpy(), "ticker": inputs["ticker"].to_numpy(), "side": side,
+            "outcome": cols["outcome"], "hit_date": cols["hit_date"], "bars": cols["bars"],
+            "plan_exit": cols["plan_exit"],
+            "plan_pnl": side * (cols["plan_exit"] - entry) * qty,
+            "actual_pnl": side * (exitp - entry) * qty,
+            "mae": cols["mae"] * qty, "mfe": cols["mfe"] * qty,
+            "mae_pct": cols["mae"] / entry * 100.0, "mfe_pct": cols["mfe"] / entry * 100.0,
+        })
+    return out
+
+
+def fingerprints(inputs: pd.DataFrame, coverage: Dict[str, tuple]) -> np.ndarray:
+    # Changes when a trade's plan/fill inputs change, or when its bars might have. Bars strictly
+    # inside a ticker's cached range before its last bar are final, so a closed trade inside
+    # that range keeps its fingerprint; otherwise the coverage (and refresh time) is part of it.
+    codes, tickers = pd.factorize(inputs["ticker"])
+    cov = [coverage.get(t) for t in tickers]
+    start = pd.to_datetime([c[0] if c else None for c in cov]).to_numpy(dtype="datetime64[ns]")[codes]
+    end = pd.to_datetime([c[1] if c else None for c in cov]).to_numpy(dtype="datetime64[ns]")[codes]
+    final = (start <= inputs["entry_date"].to_numpy()) & (inputs["end_date"].to_numpy() < end) \
+        & inputs["exit_date"].notna().to_numpy()
+    sig = np.array(["|".join(map(str, c)) if c else "none" for c in cov], dtype=object)[codes]
+    frame = inputs[PLAN_INPUTS + ["end_date"]].assign(bars=np.where(final, "final", sig))
+    return pd.util.hash_pandas_object(frame, index=False).to_numpy().view("int64")
+
+
+class Replayer:
+    # Replay results cached per trade id with their fingerprint (a journal's replay.db); run()
+    # only recomputes trades whose inputs or bars changed since the last run.
+    def __init__(self, path: str, store: Optional[BarStore] = None):
+        self.path = path
+        self.store = store or get_bar_store()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.pool = get_pool(path, init_sql=REPLAY_SQL)
+        self.last_run: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._memo: Optional[pd.DataFrame] = None  # the table, by id; read once per process
+
+    def _cached(self) -> pd.DataFrame:
+        # a row is valid whenever its fingerprint matches, so the memo can't serve a stale result
+        if self._memo is None:
+            with self.pool.connection() as conn:
+                df = pd.read_sql_query("SELECT * FROM replay_results", conn)
+            df["hit_date"] = pd.to_datetime(df["hit_date"]).astype("datetime64[ns]")
+            self._memo = df.set_index("id")
+        return self._memo
+
+    def _save(self, results: pd.DataFrame, fps: np.ndarray):
+        rows = results.assign(fingerprint=fps)[["id", "fingerprint"] + REPLAY_COLUMNS[1:]]
+        # column-wise tolist is far cheaper than a row-wise object frame; sqlite stores NaN as NULL
+        cols = [rows[c].tolist() for c in rows.columns if c != "hit_date"]
+        cols.insert(rows.columns.get_loc("hit_date"), rows["hit_date"].dt.strftime("%Y-%m-%d").tolist())
+        values = list(zip(*cols))
+        with self.pool.connection() as conn:
+            with conn:
+                conn.executemany(f"INSERT OR REPLACE INTO replay_results ({','.join(rows.columns)}) "
+                                 f"VALUES ({','.join(['?'] * len(rows.columns))})", values)
+        memo = self._cached()
+        self._memo = pd.concat([memo.drop(rows["id"], errors="ignore"), rows.set_index("id")])
+
+    def run(self, trades: pd.DataFrame, today: Optional[date] = None, fetch: bool = False,
+            workers: int = 1) -> pd.DataFrame:
+        # trades: a journal frame (Storage.load_trades); fetch=True first fills missing bars from
+        # the store's source, else only cached bars are used
+        inputs = plan_inputs(trades, today)
+        if inputs.empty:
+            self.last_run = {"trades": 0, "replayed": 0}
+            return pd.DataFrame(columns=REPLAY_COLUMNS)
+        tickers = inputs["ticker"].unique().tolist()
+        if fetch:
+            self.store.ensure_many(tickers, inputs["entry_date"].min(), inputs["end_date"].max())
+        fps = fingerprints(inputs, self.store.coverage_many(tickers))
+        ids = inputs["id"].to_numpy()
+        with self._lock:
+            known = self._cached()["fingerprint"].astype("Int64").reindex(ids)
+            stale = known.isna().to_numpy() | (known.fillna(0).to_numpy(dtype="int64") != fps)
+            if stale.any():
+                todo = inputs[stale].reset_index(drop=True)
+                with perf.timer("replay.compute"):
+                    bars = self.store.load_many(todo["ticker"].unique(), todo["entry_date"].min(),
+                                                todo["end_date"].max())
+                    fresh = replay_frame(todo, bars, workers)
+                self._save(fresh, fps[stale])
+            out = self._cached().reindex(ids).rename_axis("id").reset_index()[REPLAY_COLUMNS]
+        perf.count("replay.recomputed", int(stale.sum()))
+        self.last_run = {"trades": len(inputs), "replayed": int(stale.sum())}
+        return out
+
+
+def replay_summary(results: pd.DataFrame, fx_rate: Optional[np.ndarray] = None) -> Dict[str, Any]:
+    # headline numbers for the dashboard: how often the plan resolved, and what following it made;
+    # fx_rate (per row, aligned with results) converts the P&L sums to a base currency
+    counts = results["outcome"].value_counts()
+    walked = (results["outcome"] != "no_bars").to_numpy()
+    rate = np.ones(len(results)) if fx_rate is None else np.asarray(fx_rate, dtype="float64")
+    return {
+        "trades": len(results), "replayed": int(walked.sum()),
+        **{o: int(counts.get(o, 0)) for o in OUTCOMES},
+        "plan_pnl": float(np.nansum((results["plan_pnl"].to_numpy() * rate)[walked])),
+        "actual_pnl": float(np.nansum((results["actual_pnl"].to_numpy() * rate)[walked])),
+        "avg_mae_pct": float(np.nanmean(results["mae_pct"].to_numpy()[walked])) if walked.any() else 0.0,
+        "avg_mfe_pct": float(np.nanmean(results["mfe_pct"].to_numpy()[walked])) if walked.any() else 0.0,
+    }
+
+
+def open_replayer(data_dir: str, store: Optional[BarStore] = None) -> Replayer:
+    # one results cache per journal (a user's partition dir); bars stay shared in data/bars.db
+    return Replayer(os.path.join(data_dir, REPLAY_FILE), store)
+
+
+if __name__ == "__main__":
+    import argparse
+    from utils.storage import DATA_DIR, open_user_storage
+    ap = argparse.ArgumentParser(description="Replay journal plans (SL/target) against cached daily bars")
+    ap.add_argument("--user", required=True)
+    ap.add_argument("--backend", default=os.environ.get("JOURNAL_BACKEND", "sqlite"))
+    ap.add_argument("--data-dir", default=DATA_DIR)
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--fetch", action="store_true", help="fill missing bars from the bar source first")
+    args = ap.parse_args()
+    storage = open_user_storage(args.user, args.backend, args.data_dir)
+    replayer = open_replayer(storage.data_dir)
+    res = replayer.run(storage.load_trades(user=args.user), fetch=args.fetch, workers=args.workers)
+    print(f"replayed {replayer.last_run['replayed']} of {replayer.last_run['trades']} trades")
+    for k, v in replay_summary(res).items():
+        print(f"  {k}: {v:,.2f}" if isinstance(v, float) else f"  {k}: {v}")
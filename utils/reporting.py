@@ -1,75 +1,148 @@
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 import pandas as pd
 import numpy as np
 import streamlit as st
+from utils.prices import PriceService, get_price_service, yahoo_tickers
+from utils import perf
 
-def _is_closed(row):
-    return pd.notna(row.get("exit_date")) and pd.notna(row.get("exit_price"))
+def _num(df: pd.DataFrame, col: str) -> np.ndarray:
+    # typed frames (Storage.load_trades: float64 / Int64) skip the parse
+    s = df[col]
+    if not pd.api.types.is_numeric_dtype(s):
+        s = pd.to_numeric(s, errors="coerce")
+    return s.to_numpy(dtype="float64", na_value=np.nan)
 
-def compute_closed_pnl(df: pd.DataFrame) -> float:
+def _dates(df: pd.DataFrame, col: str) -> np.ndarray:
+    # reuse dates the caller already parsed; only strings get parsed here
+    s = df[col]
+    if not pd.api.types.is_datetime64_any_dtype(s):
+        s = pd.to_datetime(s, errors="coerce")
+    return s.to_numpy(dtype="datetime64[ns]")
+
+def _closed_mask(df: pd.DataFrame) -> pd.Series:
+    return df["exit_date"].notna() & df["exit_price"].notna()
+
+def compute_closed_pnl(df: pd.DataFrame, fx_rate: Optional[np.ndarray] = None) -> float:
+    # trades or ledger lots (Storage.realized_lots: signed qty, net of the lot's fees);
+    # fx_rate as in compute_open_pnl
     if df.empty:
         return 0.0
-    mask = df.apply(_is_closed, axis=1)
+    mask = _closed_mask(df)
     if not mask.any():
         return 0.0
     pnl = (df.loc[mask, "exit_price"] - df.loc[mask, "entry_price"]) * df.loc[mask, "qty"]
+    if "fees" in df.columns:
+        pnl = pnl - df.loc[mask, "fees"].fillna(0.0)
+    if fx_rate is not None:
+        pnl = pnl * np.asarray(fx_rate)[mask.to_numpy()]
     return float(pnl.sum())
 
-def _fetch_ltp(symbol: str, market: str):
-    # naive mapping to Yahoo tickers; user may need to adjust suffixes for some exchanges
-    t = symbol
-    if market == "India":
-        # NSE tickers often require ".NS"
-        t = f"{symbol}.NS"
-    elif market == "Australia":
-        t = f"{symbol}.AX"
-    try:
-        data = yf.Ticker(t).history(period="5d")
-        if not data.empty:
-            return float(data["Close"].iloc[-1])
-    except Exception:
-        pass
-    return None
-
-def compute_open_pnl(df: pd.DataFrame) -> float:
+def compute_open_pnl(df: pd.DataFrame, prices: Optional[PriceService] = None,
+                     fx_rate: Optional[np.ndarray] = None) -> float:
+    # fx_rate: per-row rate to the base currency (build_report()["fx_rate"]); native sum if None.
+    # Also takes Storage.open_positions() (signed qty at average entry).
     if df.empty:
         return 0.0
-    open_df = df[df["exit_price"].isna()]
+    is_open = df["exit_price"].isna().to_numpy()
+    open_df = df.loc[is_open, ["symbol", "market", "entry_price", "qty"]]
     if open_df.empty:
         return 0.0
-    total = 0.0
-    warnings = 0
-    for _, r in open_df.iterrows():
-        ltp = _fetch_ltp(str(r["symbol"]), str(r["market"]))
-        if ltp is None or pd.isna(ltp):
-            warnings += 1
-            continue
-        total += (ltp - float(r["entry_price"])) * float(r["qty"])
+    # one quote lookup per distinct ticker, then a vectorized join back onto the lots
+    tickers = yahoo_tickers(open_df)
+    quotes = (prices or get_price_service()).price_table(tickers.unique())
+    ltp = tickers.map(quotes)
+    pnl = (ltp - _num(open_df, "entry_price")) * _num(open_df, "qty")
+    if fx_rate is not None:
+        pnl = pnl * np.asarray(fx_rate)[is_open]
+    warnings = int(ltp.isna().sum())
     if warnings > 0:
         st.info(f"Open P&L estimated without LTP for {warnings} open trade(s) (no network or symbol mapping).")
-    return float(total)
+    return float(pnl.sum())
+
+def _pivot_rates(rates: Optional[pd.DataFrame], base: str):
+    # Per-currency (sorted dates, rates) in one pivot currency: the base itself when the
+    # table has rows quoted in it, else the most common quote currency (crossed below).
+    if rates is None or rates.empty:
+        return None, {}
+    quoted = rates["base"].astype(str)
+    pivot = base if (quoted == base).any() else quoted.mode().iat[0]
+    r = rates[quoted == pivot]
+    series = {}
+    for ccy, g in r.groupby("currency", sort=False):
+        d = pd.to_datetime(g["date"], errors="coerce").to_numpy(dtype="datetime64[ns]")
+        order = np.argsort(d, kind="stable")
+        series[str(ccy)] = (d[order], g["rate"].to_numpy(dtype="float64")[order])
+    return pivot, series
+
+def _asof(series, pivot: str, ccy: str, dates: np.ndarray) -> np.ndarray:
+    # units of pivot per 1 ccy on each date (last rate on or before it); NaN if none
+    if ccy == pivot:
+        return np.ones(len(dates))
+    if ccy not in series:
+        return np.full(len(dates), np.nan)
+    d, v = series[ccy]
+    pos = np.searchsorted(d, dates, side="right") - 1   # NaT sorts first -> -1 -> NaN
+    return np.where(pos >= 0, v[np.maximum(pos, 0)], np.nan)
+
+def _fx_codes(codes: np.ndarray, ccys, dates: np.ndarray, base: str, rates: Optional[pd.DataFrame],
+              settings: Dict[str, Any]) -> np.ndarray:
+    # Rate to `base` per row for factorized currencies: as-of join on the FX table, then the
+    # static Settings map (quoted in settings["base_currency"]) where the table has no rate.
+    out = np.full(len(codes), np.nan)
+    pivot, series = _pivot_rates(rates, base)
+    base_rate = _asof(series, pivot, base, dates) if pivot is not None else None
+    static = settings.get("fx_to_base", {}) or {}
+    static_base = float(static.get(base, 1.0 if base == settings.get("base_currency") else np.nan))
+    for i, ccy in enumerate(ccys):
+        rows = codes == i
+        if ccy == base:
+            out[rows] = 1.0
+            continue
+        if pivot is not None:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                out[rows] = _asof(series, pivot, ccy, dates[rows]) / base_rate[rows]
+        if ccy in static:
+            fill = rows & np.isnan(out)
+            out[fill] = float(static[ccy]) / static_base
+    return out
+
+def fx_to_base(currencies, dates, base: str, rates: Optional[pd.DataFrame] = None,
+               settings: Optional[Dict[str, Any]] = None) -> np.ndarray:
+    # Vectorized: rate converting each row's currency to `base` as of its date.
+    codes, uniques = pd.factorize(pd.Series(currencies))
+    dates = pd.to_datetime(pd.Series(dates), errors="coerce").to_numpy(dtype="datetime64[ns]")
+    return _fx_codes(np.asarray(codes, dtype="int64"), [str(c) for c in uniques], dates, base, rates,
+                     settings or {})
+
+def goal_in_base(settings: Dict[str, Any], base: str, rates: Optional[pd.DataFrame] = None,
+                 today: Optional[pd.Timestamp] = None) -> float:
+    # the per-currency monthly goals as one amount in base, at the latest rates
+    goals = {c: float(v) for c, v in settings.get("goals", {}).items() if float(v or 0) > 0}
+    if not goals:
+        return 0.0
+    when = (today or pd.Timestamp.today()).normalize()
+    rate = fx_to_base(list(goals), [when] * len(goals), base, rates, settings)
+    return float(np.nansum(np.array(list(goals.values())) * rate))
 
 def currency_totals(df: pd.DataFrame) -> Dict[str, float]:
     if df.empty:
         return {}
-    pnl_native = (df["exit_price"].fillna(df["entry_price"]) - df["entry_price"]) * df["qty"]
-    out = {}
-    for cur in ["INR","USD","AUD"]:
-        mask = df["currency"] == cur
-        if mask.any():
-            out[cur] = float(pnl_native.loc[mask].sum())
-    return out
+    entry, exitp = _num(df, "entry_price"), _num(df, "exit_price")
+    pnl_native = pd.Series((np.where(np.isnan(exitp), entry, exitp) - entry) * _num(df, "qty"), index=df.index)
+    totals = pnl_native.groupby(df["currency"], observed=True).sum()
+    return {str(k): float(v) for k, v in totals.items()}
 
 def days_held_col(df: pd.DataFrame) -> pd.Series:
-    ed = pd.to_datetime(df["entry_date"], errors="coerce")
-    xd = pd.to_datetime(df["exit_date"], errors="coerce")
+    ed = pd.Series(_dates(df, "entry_date"), index=df.index)
+    xd = pd.Series(_dates(df, "exit_date"), index=df.index)
     today = pd.Timestamp.today().normalize()
     effective_exit = xd.fillna(today)
     return (effective_exit - ed).dt.days
 
 def roi_col(df: pd.DataFrame) -> pd.Series:
-    invested = df["capital_invested"]
-    pnl = (df["exit_price"].fillna(df["entry_price"]) - df["entry_price"]) * df["qty"]
+    invested = _num(df, "capital_invested")
+    entry, exitp = _num(df, "entry_price"), _num(df, "exit_price")
+    pnl = (np.where(np.isnan(exitp), entry, exitp) - entry) * _num(df, "qty")
     with np.errstate(divide="ignore", invalid="ignore"):
         roi = np.where((invested > 0), pnl / invested * 100.0, np.nan)
     return pd.Series(roi, index=df.index)
@@ -87,14 +160,130 @@ def best_trades(df: pd.DataFrame) -> Dict[str, Any]:
     except Exception:
         return {"best_roi_pct": "N/A"}
 
-def goal_progress(df: pd.DataFrame, goal_ccy: str, settings: Dict[str,Any]) -> Dict[str, Any]:
+def goal_progress(df: pd.DataFrame, goal_ccy: str, settings: Dict[str,Any],
+                  fx_rates: Optional[pd.DataFrame] = None, in_base: bool = False) -> Dict[str, Any]:
     # Sum P&L for trades in that currency (closed only) this month
+    if in_base:
+        # every currency converted to the base (as of exit) vs. all goals converted to the base
+        base = settings.get("base_currency")
+        goal = goal_in_base(settings, base, fx_rates)
+        pnl = 0.0
+        if not df.empty:
+            closed = df[df["exit_price"].notna()]
+            rate = fx_to_base(closed["currency"], closed["exit_date"], base, fx_rates, settings)
+            pnl = float(np.nansum((_num(closed, "exit_price") - _num(closed, "entry_price"))
+                                  * _num(closed, "qty") * rate))
+        return {"goal": goal, "achieved": pnl, "progress_pct": (pnl / goal * 100.0) if goal > 0 else 0.0}
     if df.empty:
         return {"goal": settings["goals"].get(goal_ccy, 0.0), "achieved": 0.0, "progress_pct": 0.0}
-    mask = df["currency"] == goal_ccy
-    mdf = df.loc[mask].copy()
-    closed_mask = mdf["exit_price"].notna()
-    pnl = ((mdf.loc[closed_mask, "exit_price"] - mdf.loc[closed_mask, "entry_price"]) * mdf.loc[closed_mask, "qty"]).sum()
+    mask = (df["currency"] == goal_ccy) & df["exit_price"].notna()
+    sel = df.loc[mask]
+    pnl = np.nansum((_num(sel, "exit_price") - _num(sel, "entry_price")) * _num(sel, "qty"))
     goal = float(settings["goals"].get(goal_ccy, 0.0))
     pct = (float(pnl) / goal * 100.0) if goal > 0 else 0.0
     return {"goal": goal, "achieved": float(pnl), "progress_pct": pct}
+
+def build_report(df: pd.DataFrame, settings: Dict[str, Any], goal_ccy: str,
+                 today: Optional[pd.Timestamp] = None, fx_rates: Optional[pd.DataFrame] = None,
+                 base: Optional[str] = None) -> Dict[str, Any]:
+    # Report engine: derive every per-trade column in one NumPy pass over the frame and
+    # return all dashboard metrics. Same numbers as the per-metric helpers above.
+    # P&L is converted to `base` (default settings["base_currency"]) at the FX table rate
+    # as of each trade's exit date (entry date while open).
+    n = len(df)
+    goals = settings.get("goals", {})
+    base = base or settings.get("base_currency")
+    entry = _num(df, "entry_price")
+    exitp = _num(df, "exit_price")
+    qty = _num(df, "qty")
+    invested = _num(df, "capital_invested")
+    ed = _dates(df, "entry_date")
+    xd = _dates(df, "exit_date")
+    codes, uniques = pd.factorize(df["currency"])
+    codes = np.asarray(codes, dtype="int64")
+    ccys = [str(c) for c in uniques]
+
+    has_exit = ~np.isnan(exitp)
+    closed = has_exit & ~np.isnat(xd)
+    move = np.where(has_exit, exitp, entry) - entry
+    pnl_native = move * qty                      # open lots count as 0, as in currency_totals
+    pnl_closed = np.where(closed, pnl_native, np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        roi = np.where(invested > 0, pnl_native / invested * 100.0, np.nan)
+    today_ts = (today or pd.Timestamp.today()).normalize()
+    today = np.datetime64(today_ts.to_datetime64(), "ns")
+    days_held = np.floor((np.where(np.isnat(xd), today, xd) - ed) / np.timedelta64(1, "D"))
+
+    rate = _fx_codes(codes, ccys, np.where(closed, xd, ed), base, fx_rates, settings)  # code -1 -> nan
+    pnl_base = pnl_native * rate
+
+    known = codes >= 0
+    k = len(ccys)
+    native_by_ccy = np.bincount(codes[known], weights=np.nan_to_num(pnl_native[known]), minlength=k)
+    goal_sum = 0.0
+    if goal_ccy in ccys:
+        g = (codes == ccys.index(goal_ccy)) & has_exit
+        goal_sum = float(np.nansum(pnl_native[g]))
+    goal = float(goals.get(goal_ccy, 0.0))
+    base_by_ccy = np.bincount(codes[known], weights=np.nan_to_num(pnl_base[known]), minlength=k)
+    goal_base = goal_in_base(settings, base, fx_rates, today_ts)
+    achieved_base = float(np.nansum(pnl_base[has_exit]))
+
+    best = {} if n == 0 else {"best_roi_pct": "N/A"}
+    if n and np.any(~np.isnan(roi)):
+        i = int(np.nanargmax(roi))
+        best = {"best_roi_pct": round(float(roi[i]), 2), "symbol": str(df["symbol"].iat[i])}
+
+    return {
+        "closed_pnl": float(np.nansum(pnl_closed)),
+        "currency_totals": {c: float(v) for c, v in zip(ccys, native_by_ccy)},
+        "base_currency": settings.get("base_currency"),
+        "pnl_base_total": float(np.nansum(pnl_base)),
+        "closed_pnl_base": float(np.nansum(np.where(closed, pnl_base, np.nan))),
+        "currency_totals_base": {c: float(v) for c, v in zip(ccys, base_by_ccy)},
+        "fx_missing": int(np.count_nonzero(np.isnan(rate) & (pnl_native != 0))),
+        "best": best,
+        "goal": {"goal": goal, "achieved": goal_sum,
+                 "progress_pct": (goal_sum / goal * 100.0) if goal > 0 else 0.0},
+        "goal_base": {"goal": goal_base, "achieved": achieved_base,
+                      "progress_pct": (achieved_base / goal_base * 100.0) if goal_base > 0 else 0.0},
+        # per-row derived columns, aligned with df
+        "closed": closed,
+        "pnl_native": pnl_native,
+        "pnl_base": pnl_base,
+        "fx_rate": rate,
+        "roi_pct": roi,
+        "days_held": days_held,
+    }
+
+MONTHLY_SUMMARY_COLUMNS = ["month", "trades", "closed", "open", "wins", "win_rate", "closed_pnl_base", "pnl_base"]
+
+def monthly_summary(df: pd.DataFrame, settings: Dict[str, Any], base: Optional[str] = None,
+                    fx_rates: Optional[pd.DataFrame] = None, today: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+    # One row per entry month from a single build_report pass: trade counts, win rate and
+    # P&L in `base` (trades without an FX rate are left out of the sums, as in the report).
+    if df.empty:
+        return pd.DataFrame(columns=MONTHLY_SUMMARY_COLUMNS)
+    rep = build_report(df, settings, "", today=today, fx_rates=fx_rates, base=base)
+    closed = rep["closed"]
+    pnl_base = np.nan_to_num(rep["pnl_base"])
+    # group on integer month codes; formatting 1M dates as strings costs more than the report
+    month = _dates(df, "entry_date").astype("datetime64[M]")
+    ok = ~np.isnat(month)
+    codes, months = pd.factorize(month[ok].astype("int64"), sort=True)
+    k = len(months)
+    closed, pnl_base = closed[ok], pnl_base[ok]
+    out = pd.DataFrame({
+        "month": pd.DatetimeIndex(np.asarray(months).astype("datetime64[M]")).strftime("%Y-%m"),
+        "trades": np.bincount(codes, minlength=k),
+        "closed": np.bincount(codes, weights=closed, minlength=k).astype("int64"),
+        "wins": np.bincount(codes, weights=closed & (rep["pnl_native"][ok] > 0), minlength=k).astype("int64"),
+        "closed_pnl_base": np.bincount(codes, weights=np.where(closed, pnl_base, 0.0), minlength=k),
+        "pnl_base": np.bincount(codes, weights=pnl_base, minlength=k),
+    })
+    out["open"] = out["trades"] - out["closed"]
+    out["win_rate"] = np.where(out["closed"] > 0, out["wins"] / out["closed"].clip(lower=1) * 100.0, np.nan)
+    return out[MONTHLY_SUMMARY_COLUMNS]
+
+
+perf.instrument_module(globals(), "reporting")
@@ -0,0 +1,95 @@
+import os, sqlite3, threading, queue
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+# Applied to every pooled connection. WAL lets Streamlit sessions read while another
+# session writes; NORMAL sync is safe under WAL and avoids an fsync per commit.
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA mmap_size=134217728",
+)
+
+# sqlite3 keeps a per-connection LRU of compiled statements keyed by SQL text, so
+# long-lived connections + constant SQL strings give us prepared-statement reuse.
+STATEMENT_CACHE = 256
+
+
+class SQLitePool:
+    def __init__(self, path: str, size: int = 4, init_sql: Optional[str] = None, timeout: float = 10.0):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self._init_sql = init_sql
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._schema_ready = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False,
+                               cached_statements=STATEMENT_CACHE)
+        for p in PRAGMAS:
+            conn.execute(p)
+        if not self._schema_ready and self._init_sql:
+            conn.executescript(self._init_sql)
+            self._schema_ready = True
+        return conn
+
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                conn = self._connect()
+                self._created += 1
+                return conn
+        return self._idle.get(timeout=self.timeout)
+
+    @contextmanager
+    def connection(self):
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put(conn)
+
+    def close(self):
+        with self._lock:
+            while True:
+                try:
+                    self._idle.get_nowait().close()
+                except queue.Empty:
+                    break
+            self._created = 0
+            self._schema_ready = False
+
+
+_POOLS: Dict[str, SQLitePool] = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def get_pool(path: str, init_sql: Optional[str] = None, size: int = 4) -> SQLitePool:
+    # One pool per database file for the whole process (shared by every Streamlit session).
+    key = os.path.abspath(path)
+    pool = _POOLS.get(key)
+    if pool is None:
+        with _POOLS_LOCK:
+            pool = _POOLS.get(key)
+            if pool is None:
+                pool = SQLitePool(path, size=size, init_sql=init_sql)
+                _POOLS[key] = pool
+    return pool
+
+
+def close_all():
+    with _POOLS_LOCK:
+        for pool in _POOLS.values():
+            pool.close()
+        _POOLS.clear()
@@ -0,0 +1,298 @@
+import hashlib, html, io, json, os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from importlib.util import find_spec
+from typing import Any, Dict, List, Optional
+import pandas as pd
+from utils.reporting import build_report
+from utils.storage import Storage, ensure_settings, typed_trades
+from utils import perf
+
+# Pre-rendered monthly statements: one HTML/CSV/XLSX set per month of a journal (a user's
+# partition dir), written by a headless batch run (python -m utils.statements). Each month
+# is fingerprinted from its own rows, the settings, the FX history and its trades-per-month
+# window; a re-run only renders months whose fingerprint changed (a backdated edit touches
+# at most TRAILING_MONTHS statements), and the dashboard serves a closed month's statement
+# instead of recomputing it.
+STATEMENTS_DIR = "statements"
+MANIFEST_FILE = "manifest.json"
+FORMATS = ["html", "csv", "xlsx"]
+STATEMENT_VERSION = 1  # bump when the layout changes: every month re-renders
+TRAILING_MONTHS = 12  # the trades-per-month chart of a statement ends at its month
+STATEMENT_COLUMNS = ["id", "market", "symbol", "currency", "sector", "trade_type", "entry_date", "exit_date",
+                     "qty", "entry_price", "exit_price", "capital_invested", "sl", "target", "notes"]
+DERIVED_COLUMNS = ["days_held", "roi_pct", "pnl_base"]
+SUMMARY_KEYS = ["closed_pnl", "closed_pnl_base", "pnl_base_total", "currency_totals", "currency_totals_base",
+                "fx_missing", "best", "goal_base"]
+
+
+def statements_dir(storage: Storage) -> str:
+    return os.path.join(storage.data_dir, STATEMENTS_DIR)
+
+
+def available_formats() -> List[str]:
+    # xlsx needs openpyxl; html and csv always render
+    return [f for f in FORMATS if f != "xlsx" or find_spec("openpyxl") is not None]
+
+
+def load_manifest(storage: Storage) -> Dict[str, Any]:
+    path = os.path.join(statements_dir(storage), MANIFEST_FILE)
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"months": {}}
+
+
+def manifest_mtime(storage: Storage) -> float:
+    try:
+        return os.path.getmtime(os.path.join(statements_dir(storage), MANIFEST_FILE))
+    except OSError:
+        return 0.0
+
+
+def _write(path: str, data):
+    tmp = path + ".tmp"
+    with open(tmp, "wb" if isinstance(data, bytes) else "w") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _is_open(rows: pd.DataFrame) -> pd.Series:
+    return rows["exit_price"].isna() | rows["exit_date"].isna()
+
+
+def month_fingerprint(rows: pd.DataFrame, counts: pd.DataFrame, settings: Dict[str, Any],
+                      fx_rates: pd.DataFrame, base: str, today: pd.Timestamp) -> str:
+    # rows: every stored column of the month (query_trades), so any edit changes the hash;
+    # counts: its trades-per-month window (trailing_counts). Open trades age daily, so then today counts too.
+    h = hashlib.sha1(f"{STATEMENT_VERSION}|{base}|{json.dumps(settings, sort_keys=True, default=str)}".encode())
+    h.update(pd.util.hash_pandas_object(rows.sort_values("id"), index=False).to_numpy().tobytes())
+    h.update(pd.util.hash_pandas_object(fx_rates, index=False).to_numpy().tobytes())
+    h.update(counts.to_csv(index=False).encode())
+    if _is_open(rows).any():
+        h.update(str(today.date()).encode())
+    return h.hexdigest()
+
+
+def trailing_counts(counts: pd.DataFrame, month: str) -> pd.DataFrame:
+    return counts[counts["ym"] <= month].tail(TRAILING_MONTHS).reset_index(drop=True)
+
+
+def month_statement(rows: pd.DataFrame, settings: Dict[str, Any], base: str,
+                    fx_rates: Optional[pd.DataFrame] = None, today: Optional[pd.Timestamp] = None):
+    # statement frame (STATEMENT_COLUMNS + days_held/roi_pct/pnl_base) and its JSON-able summary
+    mdf = typed_trades(rows[[c for c in STATEMENT_COLUMNS if c in rows.columns]]).sort_values("id")
+    report = build_report(mdf, settings, base, today=today, fx_rates=fx_rates, base=base)
+    for c in DERIVED_COLUMNS:
+        mdf[c] = report[c]
+    summary = {k: report[k] for k in SUMMARY_KEYS}
+    summary.update(base=base, trades=len(mdf), open_trades=int(_is_open(mdf).sum()))
+    return mdf.reset_index(drop=True), summary
+
+
+def statement_charts(summary: Dict[str, Any], counts: pd.DataFrame) -> Dict[str, Dict[str, Any]]:
+    # The two dashboard charts as plain plotly figure dicts: st.plotly_chart and plotly.io take
+    # them as is, and skipping plotly.express validation is most of a month's render time.
+    totals = summary["currency_totals_base"]
+    return {
+        "by_currency": {"data": [{"type": "bar", "x": list(totals), "y": list(totals.values()),
+                                  "texttemplate": "%{y:.2f}"}],
+                        "layout": {"title": {"text": f"P&L by Currency (in {summary['base']})"},
+                                   "xaxis": {"title": {"text": "currency"}}, "yaxis": {"title": {"text": "pnl"}}}},
+        "per_month": {"data": [{"type": "scatter", "mode": "lines+markers", "x": counts["ym"].tolist(),
+                                "y": counts["trades"].tolist()}],
+                      "layout": {"title": {"text": f"Trades per Month (last {TRAILING_MONTHS})"}, "xaxis": {"title": {"text": "ym"}},
+                                 "yaxis": {"title": {"text": "trades"}}}},
+    }
+
+
+def _summary_rows(summary: Dict[str, Any]) -> pd.DataFrame:
+    base, goal, best = summary["base"], summary["goal_base"], summary["best"]
+    rows = [("Trades", summary["trades"]), ("Open trades", summary["open_trades"]),
+            (f"Closed P&L ({base})", round(summary["closed_pnl_base"], 2)),
+            ("Closed P&L (native sum)", round(summary["closed_pnl"], 2)),
+            (f"Total P&L ({base})", round(summary["pnl_base_total"], 2)),
+            (f"Goal ({base})", round(goal["goal"], 2)), ("Goal progress %", round(goal["progress_pct"], 1)),
+            ("Best trade ROI %", best.get("best_roi_pct", "N/A")), ("Best trade", best.get("symbol", "")),
+            ("Trades without FX rate", summary["fx_missing"])]
+    return pd.DataFrame(rows, columns=["metric", "value"])
+
+
+def _html_table(df: pd.DataFrame) -> str:
+    # plain rows; DataFrame.to_html formats cell by cell and is ~10x slower here
+    cells = df.astype(object).where(df.notna(), "").astype(str).to_numpy()
+    head = "".join(f"<th>{html.escape(str(c))}</th>" for c in df.columns)
+    body = "\n".join("<tr>" + "".join(f"<td>{html.escape(v)}</td>" for v in row) + "</tr>" for row in cells)
+    return f"<table><thead><tr>{head}</tr></thead><tbody>\n{body}\n</tbody></table>"
+
+
+def statement_html(mdf: pd.DataFrame, summary: Dict[str, Any], charts: Dict[str, Dict[str, Any]],
+                   user: str, month: str) -> str:
+    import plotly.io as pio
+    # plotly.js from the CDN keeps each file small; summary and trades read fine offline
+    figs = [pio.to_html(charts[k], full_html=False, include_plotlyjs="cdn" if i == 0 else False, validate=False)
+            for i, k in enumerate(["by_currency", "per_month"])]
+    table = mdf.round(dict.fromkeys(["entry_price", "exit_price", "capital_invested", "sl", "target",
+                                     "roi_pct", "pnl_base"], 2))
+    return f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Statement {html.escape(user)} {month}</title>
+<style>body{{font-family:sans-serif;margin:2em}} table{{border-collapse:collapse;font-size:13px}}
+td,th{{border:1px solid #ddd;padding:3px 6px;text-align:right}} .charts{{display:flex;flex-wrap:wrap}}
+.charts>div{{flex:1;min-width:420px}}</style></head><body>
+<h2>Trading statement: {html.escape(user)}, {month}</h2>
+<p>Rendered {datetime.now():%Y-%m-%d %H:%M}; amounts in {summary["base"]} unless noted.</p>
+{_html_table(_summary_rows(summary))}
+<div class="charts"><div>{figs[0]}</div><div>{figs[1]}</div></div>
+<h3>Trades</h3>
+{_html_table(table)}
+</body></html>
+"""
+
+
+def statement_xlsx(mdf: pd.DataFrame, summary: Dict[str, Any], counts: pd.DataFrame) -> bytes:
+    from openpyxl.chart import BarChart, LineChart, Reference
+    cur = pd.DataFrame({"currency": list(summary["currency_totals_base"]),
+                        f"pnl_{summary['base']}": list(summary["currency_totals_base"].values())})
+    buf = io.BytesIO()
+    with pd.ExcelWriter(buf, engine="openpyxl") as xw:
+        _summary_rows(summary).to_excel(xw, sheet_name="Summary", index=False)
+        cur.to_excel(xw, sheet_name="By currency", index=False)
+        counts.to_excel(xw, sheet_name="Trades per month", index=False)
+        mdf.to_excel(xw, sheet_name="Trades", index=False)
+        # native Excel charts over the two small sheets
+        for sheet, chart, title in [("By currency", BarChart(), "P&L by Currency"),
+                                    ("Trades per month", LineChart(), "Trades per Month")]:
+            ws = xw.sheets[sheet]
+            n = ws.max_row
+            chart.title = title
+            chart.add_data(Reference(ws, min_col=2, min_row=1, max_row=n), titles_from_data=True)
+            chart.set_categories(Reference(ws, min_col=1, min_row=2, max_row=n))
+            ws.add_chart(chart, "D2")
+    return buf.getvalue()
+
+
+def _render_month(job: Dict[str, Any]) -> Dict[str, Any]:
+    # one month, start to finish (runs in a worker process): render, write, return its manifest entry
+    month, counts, out = job["month"], job["counts"], job["out_dir"]
+    mdf, summary = month_statement(job["rows"], job["settings"], job["base"], job["fx_rates"], job["today"])
+    charts = statement_charts(summary, counts)
+    files = {"charts": f"{month}.charts.json"}
+    _write(os.path.join(out, files["charts"]), json.dumps(charts))
+    for fmt in job["formats"]:
+        files[fmt] = f"{month}.{fmt}"
+        path = os.path.join(out, files[fmt])
+        if fmt == "html":
+            _write(path, statement_html(mdf, summary, charts, job["user"], month))
+        elif fmt == "csv":
+            _write(path, mdf.to_csv(index=False))
+        elif fmt == "xlsx":
+            _write(path, statement_xlsx(mdf, summary, counts))
+    return {"fingerprint": job["fingerprint"], "user": job["user"], "base": job["base"], "files": files,
+            "rendered_at": datetime.now().isoformat(timespec="seconds"), "summary": summary}
+
+
+@perf.timed("statements.generate")
+def generate_statements(storage: Storage, user: str, months: Optional[List[str]] = None,
+                        formats: Optional[List[str]] = None, workers: int = 1, force: bool = False,
+                        today: Optional[pd.Timestamp] = None) -> Dict[str, List[str]]:
+    # Render every month (or `months`) whose fingerprint changed; months are independent, so
+    # with workers > 1 they render in a process pool. Returns {"rendered": [...], "skipped": [...]}.
+    formats = formats or available_formats()
+    if "xlsx" in formats and find_spec("openpyxl") is None:
+        raise RuntimeError("XLSX statements need openpyxl (pip install openpyxl)")
+    today = (today or pd.Timestamp.today()).normalize()
+    settings = ensure_settings(storage)
+    base = settings.get("base_currency")
+    fx = storage.fx_rates()
+    counts = storage.monthly_counts(user=user)
+    out = statements_dir(storage)
+    os.makedirs(out, exist_ok=True)
+    manifest = load_manifest(storage)
+    entries = manifest["months"]
+    all_months = counts["ym"].tolist()
+
+    jobs, skipped = [], []
+    for month in months or all_months:
+        rows = storage.query_trades(user=user, month=month)
+        upto = trailing_counts(counts, month)
+        fp = month_fingerprint(rows, upto, settings, fx, base, today)
+        old = entries.get(month, {})
+        if (not force and old.get("fingerprint") == fp and set(formats) <= set(old.get("files", {}))
+                and all(os.path.exists(os.path.join(out, f)) for f in old["files"].values())):
+            skipped.append(month)
+            continue
+        jobs.append({"month": month, "rows": rows, "counts": upto, "settings": settings, "fx_rates": fx,
+                     "base": base, "today": today, "user": user, "formats": formats, "out_dir": out,
+                     "fingerprint": fp})
+
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as ex:
+            done = list(ex.map(_render_month, jobs))
+    else:
+        done = [_render_month(j) for j in jobs]
+    for job, entry in zip(jobs, done):
+        entries[job["month"]] = entry
+    # months with no trades left: drop their files
+    for month in [m for m in entries if m not in all_months]:
+        for f in entries.pop(month).get("files", {}).values():
+            if os.path.exists(os.path.join(out, f)):
+                os.remove(os.path.join(out, f))
+    manifest["version"] = STATEMENT_VERSION
+    _write(os.path.join(out, MANIFEST_FILE), json.dumps(manifest, indent=1, default=str))
+    return {"rendered": [j["month"] for j in jobs], "skipped": skipped}
+
+
+def fresh_statement(storage: Storage, user: str, month: str, base: str,
+                    today: Optional[pd.Timestamp] = None) -> Optional[Dict[str, Any]]:
+    # The manifest entry for a closed month whose statement still matches the journal (same
+    # fingerprint, same base currency), with absolute file paths; None means compute it live.
+    today = (today or pd.Timestamp.today()).normalize()
+    if month >= today.strftime("%Y-%m"):
+        return None
+    entry = load_manifest(storage)["months"].get(month)
+    if not entry or entry.get("user") != user or entry.get("base") != base:
+        return None
+    settings = ensure_settings(storage)
+    if settings.get("base_currency") != base:
+        return None
+    counts = storage.monthly_counts(user=user)
+    fp = month_fingerprint(storage.query_trades(user=user, month=month),
+                           trailing_counts(counts, month),
+                           settings, storage.fx_rates(), base, today)
+    if fp != entry["fingerprint"]:
+        return None
+    paths = {k: os.path.join(statements_dir(storage), f) for k, f in entry["files"].items()}
+    if not all(os.path.exists(p) for p in paths.values()):
+        return None
+    return dict(entry, paths=paths)
+
+
+if __name__ == "__main__":
+    import argparse, time
+    from utils.storage import DATA_DIR, USERS_DIR, open_user_storage
+    ap = argparse.ArgumentParser(description="Render monthly statements (HTML/CSV/XLSX) for changed months")
+    who = ap.add_mutually_exclusive_group(required=True)
+    who.add_argument("--user", action="append", help="repeatable")
+    who.add_argument("--all-users", action="store_true",
+                     help="every user of the shared store and of existing partitions")
+    ap.add_argument("--backend", default=os.environ.get("JOURNAL_BACKEND", "sqlite"))
+    ap.add_argument("--data-dir", default=DATA_DIR)
+    ap.add_argument("--formats", default=",".join(available_formats()))
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--force", action="store_true", help="re-render unchanged months too")
+    args = ap.parse_args()
+    users = args.user or []
+    if args.all_users:
+        users = set(Storage(backend=args.backend, data_dir=args.data_dir).users())
+        parts = os.path.join(args.data_dir, USERS_DIR)
+        for d in (os.listdir(parts) if os.path.isdir(parts) else []):
+            users.update(Storage(backend=args.backend, data_dir=os.path.join(parts, d)).users())
+        users = sorted(users)
+    for u in users:
+        storage = open_user_storage(u, args.backend, args.data_dir)
+        t = time.perf_counter()
+        res = generate_statements(storage, u, formats=args.formats.split(","), workers=args.workers,
+                                  force=args.force)
+        print(f"{u}: rendered {len(res['rendered'])}, unchanged {len(res['skipped'])} "
+              f"in {time.perf_counter() - t:.1f}s -> {statements_dir(storage)}")
@@ -1,12 +1,23 @@
-import os, json, sqlite3, time
-from typing import Dict, Any, Optional
+import os, re, json, time, hashlib
+from typing import Dict, Any, Optional, List
 import pandas as pd
+from utils.sqlite_pool import get_pool
+from utils.csv_store import CsvStore, file_lock
+from utils.parquet_store import ParquetStore
+from utils.ledger import Ledger, fills_from_trades
+from utils import perf
 
 DATA_DIR = "data"
 SETTINGS_FILE = os.path.join(DATA_DIR, "settings.json")
 CSV_FILE = os.path.join(DATA_DIR, "trades.csv")
 SQLITE_FILE = os.path.join(DATA_DIR, "trades.db")
 BACKEND_FILE = os.path.join(DATA_DIR, "backend.txt")
+PARQUET_DIR = os.path.join(DATA_DIR, "trades_parquet")
+LEDGER_FILE = os.path.join(DATA_DIR, "ledger.db")  # fills + matched lots, for every backend
+USERS_DIR = "users"  # per-user partitions: data/users/<slug>/ holds a complete journal
+SEEDED_FILE = ".seeded"  # in a partition: that user's rows were copied from the shared store
+BACKENDS = ["sqlite", "csv", "parquet"]
+VERSION_FILE = ".data_version"  # touched on every write; its mtime is the cross-process data version
 
 SCHEMA_COLUMNS = ["id","user","market","symbol","currency","sector","trade_type",
                   "entry_date","exit_date","qty","entry_price","exit_price",
@@ -33,90 +44,771 @@ CREATE TABLE IF NOT EXISTS trades (
   created_at TEXT,
   updated_at TEXT
 );
+CREATE INDEX IF NOT EXISTS idx_trades_user_entry ON trades(user, entry_date);
+CREATE INDEX IF NOT EXISTS idx_trades_symbol ON trades(symbol);
+CREATE INDEX IF NOT EXISTS idx_trades_exit ON trades(exit_date);
+CREATE INDEX IF NOT EXISTS idx_trades_browse ON trades(user, IFNULL(entry_date, ''), id);
+CREATE TABLE IF NOT EXISTS trade_aggregates (
+  user TEXT NOT NULL,
+  month TEXT NOT NULL,
+  currency TEXT NOT NULL,
+  sector TEXT NOT NULL,
+  trade_type TEXT NOT NULL,
+  trades INTEGER NOT NULL DEFAULT 0,
+  closed_trades INTEGER NOT NULL DEFAULT 0,
+  closed_pnl REAL NOT NULL DEFAULT 0,
+  invested REAL NOT NULL DEFAULT 0,
+  wins INTEGER NOT NULL DEFAULT 0,
+  losses INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (user, month, currency, sector, trade_type)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS fx_rates (
+  base TEXT NOT NULL,
+  currency TEXT NOT NULL,
+  date TEXT NOT NULL,
+  rate REAL NOT NULL,
+  PRIMARY KEY (base, currency, date)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS journal_meta (
+  key TEXT PRIMARY KEY,
+  value TEXT
+);
+"""
+
+# Full-text index over notes for the trade browser (external content on `trades`). Writes
+# index an id range with one set-based INSERT ... SELECT rather than per-row triggers; rows
+# without notes are skipped. Optional: sqlite builds without FTS5 fall back to LIKE.
+FTS_SQL = """
+CREATE VIRTUAL TABLE IF NOT EXISTS trades_fts USING fts5(notes, content='trades', content_rowid='id');
 """
+FTS_INDEX_SQL = ("INSERT INTO trades_fts(rowid, notes) SELECT id, notes FROM trades "
+                 "WHERE id BETWEEN ? AND ? AND notes <> ''")
+
+# Trade browser sort keys. NULLs sort as the sentinel (lowest), so keyset cursors are
+# plain (value, id) pairs on both the sqlite and file paths.
+BROWSE_SORTS = {"entry_date": "", "exit_date": "", "symbol": "", "qty": -1e308, "entry_price": -1e308,
+                "exit_price": -1e308, "capital_invested": -1e308, "id": -1e308}
+BROWSE_PAGE_SIZE = 50
+
+INSERT_COLUMNS = [c for c in SCHEMA_COLUMNS if c != "id"]
+INSERT_SQL = (f"INSERT INTO trades ({','.join(INSERT_COLUMNS)}) "
+              f"VALUES ({','.join(['?'] * len(INSERT_COLUMNS))})")
+
+# Materialized per-(user, entry month, currency, sector, trade_type) totals.
+# Keys use "" for missing values so they stay unique in the sqlite primary key.
+AGG_KEYS = ["user", "month", "currency", "sector", "trade_type"]
+AGG_VALUES = ["trades", "closed_trades", "closed_pnl", "invested", "wins", "losses"]
+AGG_UPSERT_SQL = (
+    f"INSERT INTO trade_aggregates ({','.join(AGG_KEYS + AGG_VALUES)}) "
+    f"VALUES ({','.join(['?'] * (len(AGG_KEYS) + len(AGG_VALUES)))}) "
+    f"ON CONFLICT({','.join(AGG_KEYS)}) DO UPDATE SET "
+    + ", ".join(f"{v} = {v} + excluded.{v}" for v in AGG_VALUES)
+)
+AGG_FILE = "trade_aggregates.json"  # file backends; {"source": <backend signature>, "rows": [...]}
+
+# Date-indexed FX history: `rate` units of `base` for 1 unit of `currency`, effective from `date`.
+FX_COLUMNS = ["date", "currency", "base", "rate"]
+FX_FILE = "fx_rates.csv"  # file backends
+FX_UPSERT_SQL = ("INSERT INTO fx_rates (date, currency, base, rate) VALUES (?, ?, ?, ?) "
+                 "ON CONFLICT(base, currency, date) DO UPDATE SET rate = excluded.rate")
+
+# Canonical in-memory dtypes (Storage.load_trades): categoricals for the repeated labels,
+# datetime64 dates, nullable-int qty. Money stays float64: float32 can't hold cents exactly
+# past ~100k and would shift summed P&L. notes are only loaded on request.
+CATEGORY_COLUMNS = ["user", "market", "symbol", "currency", "sector", "trade_type"]
+DATE_COLUMNS = ["entry_date", "exit_date", "created_at", "updated_at"]
+FLOAT_COLUMNS = ["entry_price", "exit_price", "capital_invested", "sl", "target"]
+TYPED_COLUMNS = [c for c in SCHEMA_COLUMNS if c not in ("notes", "created_at", "updated_at")]
+
+CSV_CHUNK_ROWS = 200_000
+# read as text so ISO dates compare lexicographically, like the sqlite TEXT columns
+CSV_TEXT_COLUMNS = {"user": str, "market": str, "symbol": str, "currency": str,
+                    "entry_date": str, "exit_date": str}
+
+
+def _as_list(v) -> Optional[List[str]]:
+    if v is None:
+        return None
+    return [v] if isinstance(v, str) else list(v)
+
+
+def _entry_bounds(month: Optional[str], date_range) -> tuple:
+    # Half-open [lo, hi) bounds on entry_date as ISO strings, so both backends can
+    # filter with plain string comparisons (and sqlite can use idx_trades_user_entry).
+    lo = hi = None
+    if month:
+        p = pd.Period(month, freq="M")
+        lo, hi = str(p.start_time.date()), str((p + 1).start_time.date())
+    if date_range:
+        start, end = date_range
+        if start is not None:
+            s = str(pd.Timestamp(start).date())
+            lo = max(lo, s) if lo else s
+        if end is not None:
+            e = str((pd.Timestamp(end) + pd.Timedelta(days=1)).date())
+            hi = min(hi, e) if hi else e
+    return lo, hi
+
+
+def _present(v) -> bool:
+    return v is not None and v != "" and not (isinstance(v, float) and v != v)
+
+
+def _aggregate_rows(rows, sign: int = 1) -> Dict[tuple, List[float]]:
+    # Aggregate deltas for trade rows (dicts). sign=-1 retracts rows, so an update or
+    # close is applied as (old row, -1) + (new row, +1).
+    out: Dict[tuple, List[float]] = {}
+    for r in rows:
+        entry_date = r.get("entry_date")
+        if not _present(entry_date):
+            continue
+        key = (str(r.get("user") or ""), str(entry_date)[:7], str(r.get("currency") or ""),
+               str(r.get("sector") or ""), str(r.get("trade_type") or ""))
+        pnl = 0.0
+        closed = _present(r.get("exit_date")) and _present(r.get("exit_price"))
+        if closed and _present(r.get("entry_price")) and _present(r.get("qty")):
+            pnl = (float(r["exit_price"]) - float(r["entry_price"])) * float(r["qty"])
+        invested = float(r["capital_invested"]) if _present(r.get("capital_invested")) else 0.0
+        acc = out.setdefault(key, [0, 0, 0.0, 0.0, 0, 0])
+        acc[0] += sign
+        acc[1] += sign * int(closed)
+        acc[2] += sign * pnl
+        acc[3] += sign * invested
+        acc[4] += sign * int(pnl > 0)
+        acc[5] += sign * int(pnl < 0)
+    return out
+
+
+def _merge_aggregates(into: Dict[tuple, List[float]], delta: Dict[tuple, List[float]]):
+    for key, vals in delta.items():
+        acc = into.setdefault(key, [0, 0, 0.0, 0.0, 0, 0])
+        for i, v in enumerate(vals):
+            acc[i] += v
+        if acc[0] == 0:
+            del into[key]
+
+
+def _update_delta(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[tuple, List[float]]:
+    # one row edited in place: (old, -1) + (new, +1), keeping keys whose trade count nets to 0
+    delta = _aggregate_rows([old], sign=-1)
+    for key, vals in _aggregate_rows([new]).items():
+        acc = delta.setdefault(key, [0, 0, 0.0, 0.0, 0, 0])
+        for i, v in enumerate(vals):
+            acc[i] += v
+    return delta
+
+
+def _fx_frame(rates: pd.DataFrame) -> pd.DataFrame:
+    # normalize to FX_COLUMNS; drops rows without a valid date, currency pair or positive rate
+    df = pd.DataFrame({
+        "date": pd.to_datetime(rates["date"], errors="coerce").dt.strftime("%Y-%m-%d"),
+        "currency": rates["currency"].astype("string").str.strip().str.upper(),
+        "base": rates["base"].astype("string").str.strip().str.upper(),
+        "rate": pd.to_numeric(rates["rate"], errors="coerce"),
+    })
+    ok = df["date"].notna() & df["currency"].notna() & df["base"].notna() & (df["rate"] > 0)
+    df = df[ok].drop_duplicates(["base", "currency", "date"], keep="last")
+    return df.astype({"date": object, "currency": object, "base": object})
+
+
+def typed_trades(df: pd.DataFrame) -> pd.DataFrame:
+    # Convert a trades frame (any backend's read) to the canonical dtypes; idempotent.
+    out = {}
+    for c in df.columns:
+        s = df[c]
+        if c in CATEGORY_COLUMNS:
+            s = s if isinstance(s.dtype, pd.CategoricalDtype) else s.astype("category")
+        elif c in DATE_COLUMNS:
+            s = s if pd.api.types.is_datetime64_any_dtype(s) else pd.to_datetime(s, errors="coerce")
+        elif c in FLOAT_COLUMNS:
+            s = pd.to_numeric(s, errors="coerce").astype("float64")
+        elif c == "qty":
+            s = pd.to_numeric(s, errors="coerce")
+            try:
+                s = s.astype("Int64")
+            except TypeError:  # fractional quantities (older CSVs): keep them exact
+                s = s.astype("float64")
+        elif c == "id":
+            s = pd.to_numeric(s, errors="coerce").astype("Int64" if s.isna().any() else "int64")
+        out[c] = s
+    return pd.DataFrame(out, index=df.index)
+
+
+def _search_tokens(search: Optional[str]) -> List[str]:
+    return [t for t in "".join(c if c.isalnum() else " " for c in (search or "")).split() if t]
+
+
+def _filter_frame(df: pd.DataFrame, user=None, lo=None, hi=None, symbols=None,
+                  currency=None, open_only=False) -> pd.DataFrame:
+    mask = pd.Series(True, index=df.index)
+    if user is not None:
+        mask &= df["user"] == user
+    if lo is not None:
+        mask &= df["entry_date"] >= lo
+    if hi is not None:
+        mask &= df["entry_date"] < hi
+    if symbols is not None:
+        mask &= df["symbol"].isin(symbols)
+    if currency is not None:
+        mask &= df["currency"].isin(currency)
+    if open_only:
+        mask &= df["exit_price"].isna()
+    return df[mask.fillna(False).astype(bool)]
+
+_LOCAL_VERSIONS: Dict[str, int] = {}  # per data dir, bumped by writes in this process
+
 
 class Storage:
-    def __init__(self, backend: str = "sqlite"):
-        os.makedirs(DATA_DIR, exist_ok=True)
-        if os.path.exists(BACKEND_FILE):
+    def __init__(self, backend: str = "sqlite", data_dir: str = DATA_DIR):
+        self.data_dir = data_dir
+        self.settings_file = os.path.join(data_dir, os.path.basename(SETTINGS_FILE))
+        self.csv_file = os.path.join(data_dir, os.path.basename(CSV_FILE))
+        self.sqlite_file = os.path.join(data_dir, os.path.basename(SQLITE_FILE))
+        self.backend_file = os.path.join(data_dir, os.path.basename(BACKEND_FILE))
+        self.parquet_dir = os.path.join(data_dir, os.path.basename(PARQUET_DIR))
+        self.ledger_file = os.path.join(data_dir, os.path.basename(LEDGER_FILE))
+        os.makedirs(data_dir, exist_ok=True)
+        self.csv_store = CsvStore(self.csv_file, SCHEMA_COLUMNS)
+        self.parquet_store = ParquetStore(self.parquet_dir, SCHEMA_COLUMNS)
+        if os.path.exists(self.backend_file):
             try:
-                with open(BACKEND_FILE, "r") as f:
+                with open(self.backend_file, "r") as f:
                     saved = f.read().strip()
-                    backend = saved if saved in ("sqlite","csv") else backend
+                    backend = saved if saved in BACKENDS else backend
             except Exception:
                 pass
         self.backend = backend
+        self.fts = False
+        self._ensure_backend()
+
+    def _ensure_backend(self):
+        if self.backend not in BACKENDS:
+            raise ValueError(f"Unknown storage backend {self.backend!r}; expected one of {BACKENDS}")
         if self.backend == "sqlite":
             self._ensure_sqlite()
+        elif self.backend == "parquet":
+            self.parquet_store.ensure()
         else:
             self._ensure_csv()
 
+    @property
+    def file_store(self):
+        # append-only store behind the csv/parquet backends
+        return self.parquet_store if self.backend == "parquet" else self.csv_store
+
+    def switch_backend(self, backend: str):
+        self.backend = backend
+        self._ensure_backend()
+        self.save_backend_choice(backend)
+
     def save_backend_choice(self, backend: str):
-        with open(BACKEND_FILE, "w") as f:
+        with open(self.backend_file, "w") as f:
             f.write(backend)
+        self._bump_version()
+
+    # ---- data version (cache invalidation) ----
+    def _bump_version(self):
+        key = os.path.abspath(self.data_dir)
+        _LOCAL_VERSIONS[key] = _LOCAL_VERSIONS.get(key, 0) + 1
+        path = os.path.join(self.data_dir, VERSION_FILE)
+        with open(path, "a"):
+            pass
+        os.utime(path, None)
+
+    def data_version(self) -> tuple:
+        # Changes whenever trades, settings or the backend change, in this process
+        # (counter) or another one (stamp mtime). Costs a single stat().
+        try:
+            stamp = os.stat(os.path.join(self.data_dir, VERSION_FILE)).st_mtime_ns
+        except OSError:
+            stamp = 0
+        return _LOCAL_VERSIONS.get(os.path.abspath(self.data_dir), 0), stamp
+
+    @property
+    def pool(self):
+        # Process-wide pool; the schema is created once when the pool opens its first connection.
+        return get_pool(self.sqlite_file, init_sql=CREATE_SQL)
 
     def _ensure_sqlite(self):
-        conn = sqlite3.connect(SQLITE_FILE, check_same_thread=False)
-        cur = conn.cursor()
-        cur.execute(CREATE_SQL)
-        conn.commit()
-        cur.close()
-        conn.close()
+        with self.pool.connection() as conn:
+            built = conn.execute("SELECT value FROM journal_meta WHERE key = 'aggregates'").fetchone()
+            try:
+                with conn:
+                    conn.executescript(FTS_SQL)
+                    if not conn.execute("SELECT value FROM journal_meta WHERE key = 'fts'").fetchone():
+                        # index trades written before the FTS table existed
+                        conn.execute("INSERT INTO trades_fts(trades_fts) VALUES ('rebuild')")
+                        conn.execute("INSERT OR REPLACE INTO journal_meta (key, value) VALUES ('fts', '1')")
+                self.fts = True
+            except Exception:
+                self.fts = False  # no FTS5 in this sqlite build
+        if not built:
+            self.rebuild_aggregates()
 
     def _ensure_csv(self):
-        if not os.path.exists(CSV_FILE):
-            df = pd.DataFrame(columns=SCHEMA_COLUMNS)
-            df.to_csv(CSV_FILE, index=False)
+        self.csv_store.ensure()
 
-    def insert_trade(self, payload: Dict[str, Any]):
+    def insert_trade(self, payload: Dict[str, Any]) -> int:
+        return self.insert_trades([payload])[0]
+
+    def insert_trades(self, payloads: List[Dict[str, Any]]) -> List[int]:
+        # Bulk path: one transaction (sqlite) / one locked append (csv/parquet) for the whole batch.
+        if not payloads:
+            return []
         now = time.strftime("%Y-%m-%d %H:%M:%S")
-        payload = {**payload, "created_at": now, "updated_at": now}
+        payloads = [{**p, "created_at": now, "updated_at": now} for p in payloads]
+        if self.backend == "sqlite":
+            values = [[p.get(c) for c in INSERT_COLUMNS] for p in payloads]
+            deltas = _aggregate_rows(payloads)
+            with self.pool.connection() as conn:
+                with conn:
+                    conn.executemany(INSERT_SQL, values)
+                    last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+                    if self.fts:
+                        conn.execute(FTS_INDEX_SQL, (last_id - len(values) + 1, last_id))
+                    conn.executemany(AGG_UPSERT_SQL, [list(k) + v for k, v in deltas.items()])
+            self._bump_version()
+            # rows from a single write transaction get consecutive AUTOINCREMENT ids
+            return list(range(last_id - len(values) + 1, last_id + 1))
+        else:
+            with self.file_store.locked():
+                aggs = self._load_file_aggregates()
+                ids = self.file_store.append(payloads)
+                if aggs is None:
+                    self.rebuild_aggregates()
+                else:
+                    _merge_aggregates(aggs, _aggregate_rows(payloads))
+                    self._save_file_aggregates(aggs)
+            self._bump_version()
+            return ids
+
+    def update_trade(self, trade_id: int, changes: Dict[str, Any]):
+        # Edit one trade row in place; its aggregates move by (old row, -1) + (new row, +1).
+        unknown = set(changes) - set(INSERT_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown trade columns: {sorted(unknown)}")
+        changes = {**changes, "updated_at": time.strftime("%Y-%m-%d %H:%M:%S")}
         if self.backend == "sqlite":
-            conn = sqlite3.connect(SQLITE_FILE, check_same_thread=False)
-            cur = conn.cursor()
-            cols = [c for c in SCHEMA_COLUMNS if c != "id"]
-            cols_sql = ",".join(cols)
-            placeholders = ",".join(["?"]*len(cols))
-            values = [payload.get(c) for c in cols]
-            cur.execute(f"INSERT INTO trades ({cols_sql}) VALUES ({placeholders})", values)
-            conn.commit()
-            cur.close()
-            conn.close()
+            with self.pool.connection() as conn:
+                with conn:
+                    cur = conn.execute("SELECT * FROM trades WHERE id = ?", (int(trade_id),))
+                    row = cur.fetchone()
+                    if row is None:
+                        raise ValueError(f"No trade with id {trade_id}")
+                    old = dict(zip([d[0] for d in cur.description], row))
+                    conn.execute(f"UPDATE trades SET {', '.join(f'{c} = ?' for c in changes)} WHERE id = ?",
+                                 [*changes.values(), int(trade_id)])
+                    if self.fts and "notes" in changes:
+                        if old["notes"]:
+                            conn.execute("INSERT INTO trades_fts(trades_fts, rowid, notes) VALUES ('delete', ?, ?)",
+                                         (int(trade_id), old["notes"]))
+                        conn.execute(FTS_INDEX_SQL, (int(trade_id), int(trade_id)))
+                    delta = _update_delta(old, {**old, **changes})
+                    conn.executemany(AGG_UPSERT_SQL, [list(k) + v for k, v in delta.items()])
         else:
-            if not os.path.exists(CSV_FILE):
-                self._ensure_csv()
-            df = pd.read_csv(CSV_FILE)
-            # assign id
-            new_id = int(df["id"].max()) + 1 if "id" in df.columns and df.shape[0] > 0 else 1
-            payload_row = {c: payload.get(c) for c in SCHEMA_COLUMNS if c != "id"}
-            payload_row["id"] = new_id
-            df = pd.concat([df, pd.DataFrame([payload_row])], ignore_index=True)
-            df.to_csv(CSV_FILE, index=False)
+            with self.file_store.locked():
+                aggs = self._load_file_aggregates()  # before the rewrite changes the source signature
+                old = self.file_store.update(int(trade_id), changes)
+                if old is None:
+                    raise ValueError(f"No trade with id {trade_id}")
+                if aggs is None:
+                    self.rebuild_aggregates()
+                else:
+                    _merge_aggregates(aggs, _update_delta(old, {**old, **changes}))
+                    self._save_file_aggregates(aggs)
+        self._bump_version()
 
     def read_trades(self) -> pd.DataFrame:
         if self.backend == "sqlite":
-            conn = sqlite3.connect(SQLITE_FILE, check_same_thread=False)
-            df = pd.read_sql_query("SELECT * FROM trades", conn)
-            conn.close()
-            return df
+            with self.pool.connection() as conn:
+                return pd.read_sql_query("SELECT * FROM trades", conn)
+        elif self.backend == "parquet":
+            return self.parquet_store.query(list(SCHEMA_COLUMNS), row_filter=_filter_frame)
         else:
-            if not os.path.exists(CSV_FILE):
+            f = self.csv_store.open_complete() if os.path.exists(self.csv_file) else None
+            if f is None:
                 return pd.DataFrame(columns=SCHEMA_COLUMNS)
-            return pd.read_csv(CSV_FILE)
+            with f:
+                return pd.read_csv(f)
+
+    def query_trades(self, user: Optional[str] = None, month: Optional[str] = None,
+                     date_range=None, symbols=None, currency=None, open_only: bool = False,
+                     columns: Optional[List[str]] = None) -> pd.DataFrame:
+        # Filtered read: month is "YYYY-MM" and date_range an inclusive (start, end) pair,
+        # both on entry_date; symbols/currency take a value or a list.
+        columns = list(columns) if columns else list(SCHEMA_COLUMNS)
+        unknown = set(columns) - set(SCHEMA_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown trade columns: {sorted(unknown)}")
+        symbols, currency = _as_list(symbols), _as_list(currency)
+        lo, hi = _entry_bounds(month, date_range)
+        if self.backend == "sqlite":
+            where, params = [], []
+            if user is not None:
+                where.append("user = ?"); params.append(user)
+            if lo is not None:
+                where.append("entry_date >= ?"); params.append(lo)
+            if hi is not None:
+                where.append("entry_date < ?"); params.append(hi)
+            if symbols is not None:
+                where.append(f"symbol IN ({','.join(['?'] * len(symbols))})"); params += symbols
+            if currency is not None:
+                where.append(f"currency IN ({','.join(['?'] * len(currency))})"); params += currency
+            if open_only:
+                where.append("exit_price IS NULL")
+            sql = f"SELECT {','.join(columns)} FROM trades"
+            if where:
+                sql += " WHERE " + " AND ".join(where)
+            with self.pool.connection() as conn:
+                return pd.read_sql_query(sql, conn, params=params)
+        elif self.backend == "parquet":
+            return self.parquet_store.query(columns, user, lo, hi, symbols, currency, open_only,
+                                            row_filter=_filter_frame)
+        else:
+            filter_cols = {"user": user, "entry_date": lo or hi, "symbol": symbols,
+                           "currency": currency, "exit_price": open_only or None}
+            usecols = set(columns) | {c for c, v in filter_cols.items() if v is not None}
+            parts = []
+            for chunk in self._csv_chunks(usecols):
+                parts.append(_filter_frame(chunk, user, lo, hi, symbols, currency, open_only)[columns])
+            return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=columns)
+
+    def load_trades(self, user: Optional[str] = None, month: Optional[str] = None, date_range=None,
+                    symbols=None, currency=None, open_only: bool = False,
+                    columns: Optional[List[str]] = None, notes: bool = False) -> pd.DataFrame:
+        # query_trades() with the canonical dtypes (typed_trades), what the reporting and
+        # analytics functions expect. notes (free text, the largest column) only with notes=True
+        # or when listed in columns; the trade browser pages them in from browse_trades().
+        columns = list(columns) if columns else TYPED_COLUMNS + (["notes"] if notes else [])
+        return typed_trades(self.query_trades(user=user, month=month, date_range=date_range, symbols=symbols,
+                                              currency=currency, open_only=open_only, columns=columns))
+
+    def browse_trades(self, user: Optional[str] = None, month: Optional[str] = None, search: Optional[str] = None,
+                      sort: str = "entry_date", descending: bool = True, after: Optional[tuple] = None,
+                      limit: int = BROWSE_PAGE_SIZE, columns: Optional[List[str]] = None):
+        # One page of trades for the browser: (rows, cursor for the next page or None).
+        # Keyset pagination on (sort value, id), so page N costs the same as page 1. search
+        # matches a symbol prefix or, word by word, the notes (FTS5 on sqlite).
+        if sort not in BROWSE_SORTS:
+            raise ValueError(f"Unknown sort column {sort!r}; expected one of {list(BROWSE_SORTS)}")
+        columns = list(dict.fromkeys(["id"] + list(columns or SCHEMA_COLUMNS)))
+        tokens = _search_tokens(search)
+        lo, hi = _entry_bounds(month, None)
+        null = BROWSE_SORTS[sort]
+        op, order = ("<", "DESC") if descending else (">", "ASC")
+        if self.backend == "sqlite":
+            key = f"IFNULL({sort}, {null!r})"  # literal (not a parameter) so idx_trades_browse applies
+            where, params = [], []
+            if user is not None:
+                where.append("user = ?"); params.append(user)
+            if lo is not None:
+                where.append("entry_date >= ? AND entry_date < ?"); params += [lo, hi]
+            if tokens:
+                cond = ["symbol LIKE ?"]; params.append(tokens[0].upper() + "%")
+                if self.fts:
+                    cond.append("id IN (SELECT rowid FROM trades_fts WHERE trades_fts MATCH ?)")
+                    params.append(" AND ".join(f'"{t}"*' for t in tokens))
+                else:
+                    cond.append("(" + " AND ".join(["notes LIKE ?"] * len(tokens)) + ")")
+                    params += [f"%{t}%" for t in tokens]
+                where.append("(" + " OR ".join(cond) + ")")
+            if after is not None:
+                where.append(f"({key}, id) {op} (?, ?)"); params += [after[0], after[1]]
+            sql = f"SELECT {','.join(columns)}, {key} AS _sort_key FROM trades"
+            if where:
+                sql += " WHERE " + " AND ".join(where)
+            sql += f" ORDER BY _sort_key {order}, id {order} LIMIT ?"
+            with self.pool.connection() as conn:
+                df = pd.read_sql_query(sql, conn, params=params + [limit + 1])
+        else:
+            df = self.query_trades(user=user, month=month,
+                                   columns=list(dict.fromkeys(columns + ["symbol", "notes", sort])))
+            if tokens:
+                notes = df["notes"].fillna("").astype(str).str.lower()
+                hit = pd.Series(True, index=df.index)
+                for t in tokens:
+                    hit &= notes.str.contains(t.lower(), regex=False)
+                hit |= df["symbol"].fillna("").astype(str).str.upper().str.startswith(tokens[0].upper())
+                df = df[hit]
+            k = pd.to_numeric(df[sort], errors="coerce") if isinstance(null, float) else df[sort].astype(object)
+            df = df.assign(_sort_key=k.where(k.notna(), null), id=pd.to_numeric(df["id"], errors="coerce"))
+            if after is not None:
+                sk, ids = df["_sort_key"], df["id"]
+                m = (sk < after[0]) | ((sk == after[0]) & (ids < after[1])) if descending else \
+                    (sk > after[0]) | ((sk == after[0]) & (ids > after[1]))
+                df = df[m]
+            df = df.sort_values(["_sort_key", "id"], ascending=not descending, kind="stable").head(limit + 1)
+            df = df[columns + ["_sort_key"]].reset_index(drop=True)
+        cursor = None
+        if len(df) > limit:
+            df = df.iloc[:limit]
+            last = df.iloc[-1]
+            cursor = (last["_sort_key"].item() if hasattr(last["_sort_key"], "item") else last["_sort_key"],
+                      int(last["id"]))
+        return df.drop(columns="_sort_key"), cursor
+
+    def _csv_chunks(self, usecols):
+        # complete lines only (open_complete): a torn trailing row is left for the next append to repair
+        f = self.csv_store.open_complete() if os.path.exists(self.csv_file) else None
+        if f is None:
+            return
+        dtype = {c: t for c, t in CSV_TEXT_COLUMNS.items() if c in usecols}
+        with f:
+            yield from pd.read_csv(f, usecols=list(usecols), dtype=dtype, chunksize=CSV_CHUNK_ROWS)
+
+    # ---- migrations ----
+    def replace_all_trades(self, df: pd.DataFrame, replace: bool = False) -> int:
+        # Load a full trades frame (ids preserved) into this backend; used by migrate().
+        if not replace and len(self.query_trades(columns=["id"])):
+            raise ValueError(f"{self.backend} store in {self.data_dir} is not empty (pass replace=True)")
+        df = df.reindex(columns=SCHEMA_COLUMNS)
+        for c in ("id", "qty"):
+            df[c] = pd.to_numeric(df[c], errors="coerce").astype("Int64")
+        if self.backend == "sqlite":
+            values = df.astype(object).where(df.notna(), None).values.tolist()
+            with self.pool.connection() as conn:
+                with conn:
+                    conn.execute("DELETE FROM trades")
+                    conn.executemany(f"INSERT INTO trades ({','.join(SCHEMA_COLUMNS)}) "
+                                     f"VALUES ({','.join(['?'] * len(SCHEMA_COLUMNS))})", values)
+                    if self.fts:
+                        conn.execute("INSERT INTO trades_fts(trades_fts) VALUES ('rebuild')")
+        elif self.backend == "parquet":
+            with self.parquet_store.locked():
+                self.parquet_store.write_all(df)
+        else:
+            with self.csv_store.locked():
+                self.csv_store.compact(df.astype(object).where(df.notna(), "").values.tolist())
+        self.rebuild_aggregates()
+        return len(df)
+
+    # ---- materialized monthly aggregates ----
+    @property
+    def agg_file(self) -> str:
+        return os.path.join(self.data_dir, AGG_FILE)
+
+    def _source_signature(self) -> str:
+        if self.backend == "parquet":
+            return f"parquet:{self.parquet_store.signature()}"
+        return f"csv:{os.path.getsize(self.csv_file)}"
+
+    def _load_file_aggregates(self) -> Optional[Dict[tuple, List[float]]]:
+        # None when missing or stale (the trades store changed since the last update)
+        try:
+            with open(self.agg_file, "r") as f:
+                data = json.load(f)
+            if data.get("source") != self._source_signature():
+                return None
+            return {tuple(r[:len(AGG_KEYS)]): r[len(AGG_KEYS):] for r in data["rows"]}
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _save_file_aggregates(self, aggs: Dict[tuple, List[float]]):
+        tmp = self.agg_file + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"source": self._source_signature(),
+                       "rows": [list(k) + v for k, v in sorted(aggs.items())]}, f)
+        os.replace(tmp, self.agg_file)
+
+    def rebuild_aggregates(self):
+        # Full backfill from the trades table/file (first run, imports, external edits).
+        cols = ["user", "entry_date", "currency", "sector", "trade_type", "exit_date",
+                "exit_price", "entry_price", "qty", "capital_invested"]
+        if self.backend == "sqlite":
+            with self.pool.connection() as conn:
+                with conn:
+                    conn.execute("DELETE FROM trade_aggregates")
+                    cur = conn.execute(f"SELECT {','.join(cols)} FROM trades")
+                    aggs: Dict[tuple, List[float]] = {}
+                    while True:
+                        batch = cur.fetchmany(50_000)
+                        if not batch:
+                            break
+                        _merge_aggregates(aggs, _aggregate_rows(dict(zip(cols, r)) for r in batch))
+                    conn.executemany(AGG_UPSERT_SQL, [list(k) + v for k, v in aggs.items()])
+                    conn.execute("INSERT OR REPLACE INTO journal_meta (key, value) VALUES ('aggregates', '1')")
+        else:
+            with self.file_store.locked():
+                aggs = {}
+                if self.backend == "parquet":
+                    chunks = [self.parquet_store.query(cols, row_filter=_filter_frame)]
+                else:
+                    chunks = self._csv_chunks(set(cols))
+                for chunk in chunks:
+                    chunk = chunk.astype(object).where(chunk.notna(), None)
+                    _merge_aggregates(aggs, _aggregate_rows(chunk.to_dict("records")))
+                self._save_file_aggregates(aggs)
+        self._bump_version()
+
+    def monthly_aggregates(self, user: Optional[str] = None, month: Optional[str] = None) -> pd.DataFrame:
+        # O(months x groups): reads the materialized totals, never the trades.
+        if self.backend == "sqlite":
+            sql, params, where = f"SELECT {','.join(AGG_KEYS + AGG_VALUES)} FROM trade_aggregates", [], []
+            if user is not None:
+                where.append("user = ?"); params.append(user)
+            if month is not None:
+                where.append("month = ?"); params.append(month)
+            if where:
+                sql += " WHERE " + " AND ".join(where)
+            with self.pool.connection() as conn:
+                return pd.read_sql_query(sql + " ORDER BY month", conn, params=params)
+        else:
+            aggs = self._load_file_aggregates()
+            if aggs is None:
+                self.rebuild_aggregates()
+                aggs = self._load_file_aggregates() or {}
+            df = pd.DataFrame([list(k) + v for k, v in aggs.items()], columns=AGG_KEYS + AGG_VALUES)
+            if user is not None:
+                df = df[df["user"] == user]
+            if month is not None:
+                df = df[df["month"] == month]
+            return df.sort_values("month", kind="stable").reset_index(drop=True)
+
+    def monthly_counts(self, user: Optional[str] = None) -> pd.DataFrame:
+        # Trades per entry month ("ym", "trades"), oldest first.
+        if self.backend == "sqlite":
+            sql, params = "SELECT month AS ym, SUM(trades) AS trades FROM trade_aggregates", []
+            if user is not None:
+                sql += " WHERE user = ?"; params.append(user)
+            with self.pool.connection() as conn:
+                df = pd.read_sql_query(sql + " GROUP BY month HAVING SUM(trades) > 0 ORDER BY month", conn,
+                                       params=params)
+            return df.astype({"trades": "int64"})
+        aggs = self.monthly_aggregates(user=user)
+        counts = aggs.groupby("month", sort=True)["trades"].sum()
+        return counts[counts > 0].astype("int64").rename_axis("ym").reset_index(name="trades")
+
+    def users(self) -> List[str]:
+        if self.backend == "sqlite":
+            with self.pool.connection() as conn:
+                return [r[0] for r in conn.execute("SELECT DISTINCT user FROM trades WHERE user IS NOT NULL ORDER BY user")]
+        return sorted(self.query_trades(columns=["user"])["user"].dropna().astype(str).unique())
+
+    # ---- FX rate history ----
+    @property
+    def fx_file(self) -> str:
+        return os.path.join(self.data_dir, FX_FILE)
+
+    def save_fx_rates(self, rates: pd.DataFrame) -> int:
+        # Upsert (date, currency, base, rate) rows; a later save for the same day wins.
+        df = _fx_frame(rates)
+        if df.empty:
+            return 0
+        if self.backend == "sqlite":
+            with self.pool.connection() as conn:
+                with conn:
+                    conn.executemany(FX_UPSERT_SQL, df[FX_COLUMNS].itertuples(index=False, name=None))
+        else:
+            with file_lock(self.fx_file, self.fx_file + ".lock"):
+                merged = _fx_frame(pd.concat([self._read_fx_file(), df], ignore_index=True))
+                tmp = self.fx_file + ".tmp"
+                merged.sort_values(["base", "currency", "date"]).to_csv(tmp, index=False)
+                os.replace(tmp, self.fx_file)
+        self._bump_version()
+        return len(df)
+
+    def _read_fx_file(self) -> pd.DataFrame:
+        if not os.path.exists(self.fx_file):
+            return pd.DataFrame(columns=FX_COLUMNS)
+        return pd.read_csv(self.fx_file, dtype={"date": str, "currency": str, "base": str})
+
+    def fx_rates(self, base: Optional[str] = None) -> pd.DataFrame:
+        # FX_COLUMNS sorted by base, currency, date
+        if self.backend == "sqlite":
+            sql, params = f"SELECT {','.join(FX_COLUMNS)} FROM fx_rates", []
+            if base is not None:
+                sql += " WHERE base = ?"; params.append(base)
+            with self.pool.connection() as conn:
+                return pd.read_sql_query(sql + " ORDER BY base, currency, date", conn, params=params)
+        df = self._read_fx_file()
+        if base is not None:
+            df = df[df["base"] == base]
+        return df.sort_values(["base", "currency", "date"], kind="stable").reset_index(drop=True)
+
+    # ---- position ledger (fills -> lots) ----
+    @property
+    def ledger(self) -> Ledger:
+        return Ledger(self.ledger_file)
+
+    def add_fills(self, fills: List[Dict[str, Any]]) -> List[int]:
+        # Scale-ins/outs as BUY/SELL fills; only the touched (user, market, symbol) positions re-match.
+        ids = self.ledger.add_fills(fills)
+        self._bump_version()
+        return ids
+
+    def _trade_row(self, trade_id: int, user: Optional[str] = None) -> Dict[str, Any]:
+        if self.backend == "sqlite":
+            with self.pool.connection() as conn:
+                df = pd.read_sql_query("SELECT * FROM trades WHERE id = ?", conn, params=[int(trade_id)])
+        else:
+            df = self.query_trades(user=user)
+            df = df[pd.to_numeric(df["id"], errors="coerce") == int(trade_id)]
+        if df.empty:
+            raise ValueError(f"No trade with id {trade_id}")
+        return df.iloc[0].to_dict()
+
+    def close_trade(self, trade_id: int, qty: float, price: float, date, fees: float = 0.0,
+                    user: Optional[str] = None) -> int:
+        # Close all or part of a journal trade with a fill linked to it. Lot-level P&L comes from
+        # the ledger; once the closes cover the trade's qty, the row gets exit_date and the
+        # qty-weighted exit_price so journal figures count it as closed.
+        trade = self._trade_row(trade_id, user)
+        if _present(trade.get("exit_price")):
+            raise ValueError(f"Trade {trade_id} is already closed in the journal")
+        ledger = self.ledger
+        linked = ledger.fills_for_trade(trade_id)
+        if linked.empty:
+            ledger.add_fills(fills_from_trades(pd.DataFrame([trade])))
+            linked = ledger.fills_for_trade(trade_id)
+        opening = linked["side"].iat[0]
+        remaining = float(trade["qty"]) - float(linked.loc[linked["side"] != opening, "qty"].sum())
+        if remaining <= 1e-9:
+            raise ValueError(f"Trade {trade_id} is already fully closed in the ledger")
+        if qty <= 0 or qty > remaining + 1e-9:
+            raise ValueError(f"Close qty must be in (0, {remaining:g}] for trade {trade_id}")
+        fill = {"user": trade["user"], "market": trade["market"], "symbol": trade["symbol"],
+                "currency": trade["currency"], "side": "BUY" if opening == "SELL" else "SELL",
+                "date": str(pd.Timestamp(date).date()), "qty": float(qty), "price": float(price),
+                "fees": float(fees or 0.0), "trade_id": int(trade_id)}
+        fill_id = self.add_fills([fill])[0]
+        if remaining - qty <= 1e-9:
+            closes = pd.concat([linked[linked["side"] != opening], pd.DataFrame([fill])], ignore_index=True)
+            exit_price = float((closes["qty"] * closes["price"]).sum() / closes["qty"].sum())
+            self.update_trade(trade_id, {"exit_date": closes["date"].max(), "exit_price": exit_price})
+        return fill_id
+
+    def import_trades_to_ledger(self, user: Optional[str] = None) -> int:
+        # Seed the ledger with fills for journal trades it has not seen yet (by trade id).
+        trades = self.query_trades(user=user)
+        seen = set(self.ledger.fills(user)["trade_id"].dropna().astype(int))
+        trades = trades[~pd.to_numeric(trades["id"], errors="coerce").isin(seen)]
+        return len(self.add_fills(fills_from_trades(trades)))
+
+    def realized_lots(self, user: Optional[str] = None, month: Optional[str] = None) -> pd.DataFrame:
+        # month filters on the lot's exit date
+        lo, hi = _entry_bounds(month, None)
+        return self.ledger.realized_lots(user, lo=lo, hi=hi)
+
+    def open_positions(self, user: Optional[str] = None, by_lot: bool = False) -> pd.DataFrame:
+        return self.ledger.open_lots(user) if by_lot else self.ledger.open_positions(user)
 
     def save_settings(self, settings: Dict[str, Any]):
-        with open(SETTINGS_FILE, "w") as f:
+        with open(self.settings_file, "w") as f:
             json.dump(settings, f, indent=2)
+        self._bump_version()
 
     def read_settings(self) -> Dict[str, Any]:
-        if not os.path.exists(SETTINGS_FILE):
+        if not os.path.exists(self.settings_file):
             return {}
         try:
-            with open(SETTINGS_FILE, "r") as f:
+            with open(self.settings_file, "r") as f:
                 return json.load(f)
         except Exception:
             return {}
 
+perf.instrument_class(Storage, "storage")
+
+
 def ensure_settings(storage: "Storage") -> Dict[str, Any]:
     default_settings = {
         "base_currency": "AUD",
@@ -127,9 +819,122 @@ def ensure_settings(storage: "Storage") -> Dict[str, Any]:
     if not s:
         storage.save_settings(default_settings)
         return default_settings
-    # fill missing keys
-    for k, v in default_settings.items():
-        if k not in s:
-            s[k] = v
-    storage.save_settings(s)
+    # fill missing keys; only touch the file if something was actually missing
+    missing = {k: v for k, v in default_settings.items() if k not in s}
+    if missing:
+        s.update(missing)
+        storage.save_settings(s)
     return s
+
+
+def open_backend(backend: str, data_dir: str = DATA_DIR) -> Storage:
+    # A Storage pinned to `backend`, ignoring the saved backend choice.
+    store = Storage(backend=backend, data_dir=data_dir)
+    if store.backend != backend:
+        store.backend = backend
+        store._ensure_backend()
+    return store
+
+
+def user_slug(user: str) -> str:
+    # filesystem-safe partition name; a hash suffix keeps e.g. "a b" and "a_b" apart
+    slug = re.sub(r"[^A-Za-z0-9_.-]", "_", str(user)).strip("._") or "_"
+    if slug != user:
+        slug += "-" + hashlib.sha1(str(user).encode()).hexdigest()[:8]
+    return slug
+
+
+def user_data_dir(user: str, data_dir: str = DATA_DIR) -> str:
+    return os.path.join(data_dir, USERS_DIR, user_slug(user))
+
+
+def split_user(user: str, target: Storage, data_dir: str = DATA_DIR) -> int:
+    # Copy one user's trades, settings, FX history and ledger fills from the shared store in
+    # data_dir into their partition. The shared store is left as is.
+    shared = Storage(backend=target.backend, data_dir=data_dir)
+    trades = shared.query_trades(user=user)
+    if len(trades):
+        target.replace_all_trades(trades, replace=True)
+    if not target.read_settings() and shared.read_settings():
+        target.save_settings(shared.read_settings())
+    target.save_fx_rates(shared.fx_rates())
+    if os.path.exists(shared.ledger_file):
+        fills = shared.ledger.fills(user).drop(columns=["id", "created_at"])
+        if len(fills):
+            target.add_fills(fills.astype(object).where(fills.notna(), None).to_dict("records"))
+    return len(trades)
+
+
+def open_user_storage(user: str, backend: str = "sqlite", data_dir: str = DATA_DIR) -> Storage:
+    # The user's own partition (own files, settings, data version and so cache keys). The first
+    # open copies that user's rows out of the shared pre-partitioning store.
+    store = Storage(backend=backend, data_dir=user_data_dir(user, data_dir))
+    marker = os.path.join(store.data_dir, SEEDED_FILE)
+    if not os.path.exists(marker):
+        with file_lock(marker, marker + ".lock"):
+            if not os.path.exists(marker):
+                split_user(user, store, data_dir)
+                with open(marker, "w") as f:
+                    f.write(time.strftime("%Y-%m-%d %H:%M:%S"))
+    return store
+
+
+def split_users(data_dir: str = DATA_DIR, backend: str = "sqlite") -> Dict[str, int]:
+    # Partition every user of the shared store (already split users are skipped).
+    return {u: len(open_user_storage(u, backend, data_dir).query_trades(columns=["id"]))
+            for u in Storage(backend=backend, data_dir=data_dir).users()}
+
+
+def journal_dirs(data_dir: str = DATA_DIR) -> List[str]:
+    # the shared store and every user partition under it
+    users = os.path.join(data_dir, USERS_DIR)
+    parts = sorted(d.path for d in os.scandir(users) if d.is_dir()) if os.path.isdir(users) else []
+    return [data_dir] + parts
+
+
+def migrate(src: str, dst: str, data_dir: str = DATA_DIR, replace: bool = False) -> int:
+    source, target = open_backend(src, data_dir), open_backend(dst, data_dir)
+    n = target.replace_all_trades(source.read_trades(), replace)
+    target.save_fx_rates(source.fx_rates())
+    return n
+
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Journal storage maintenance")
+    ap.add_argument("command", choices=["rebuild-aggregates", "migrate", "import-ledger", "split-users"])
+    ap.add_argument("--backend", default=os.environ.get("JOURNAL_BACKEND", "sqlite"))
+    ap.add_argument("--data-dir", default=DATA_DIR)
+    ap.add_argument("--from", dest="src", choices=BACKENDS, help="migrate: source backend")
+    ap.add_argument("--to", dest="dst", choices=BACKENDS, help="migrate: target backend")
+    ap.add_argument("--replace", action="store_true", help="migrate: overwrite a non-empty target")
+    ap.add_argument("--user", help="only this user's partition (default: the shared store and every partition)")
+    ap.add_argument("--switch", action="store_true", help="migrate: make the target the active backend")
+    args = ap.parse_args()
+    if args.command == "migrate" and (not args.src or not args.dst or args.src == args.dst):
+        ap.error("migrate needs distinct --from and --to backends")
+    if args.command == "split-users":
+        for u, n in split_users(args.data_dir, args.backend).items():
+            print(f"{u}: {n} trades in {user_data_dir(u, args.data_dir)}")
+        dirs = []
+    elif args.user:
+        dirs = [open_user_storage(args.user, args.backend, args.data_dir).data_dir]
+    else:
+        dirs = journal_dirs(args.data_dir)
+    for d in dirs:
+        if args.command == "rebuild-aggregates":
+            store = Storage(backend=args.backend, data_dir=d)
+            store.rebuild_aggregates()
+            print(f"Rebuilt aggregates for {store.backend} store in {store.data_dir}")
+        elif args.command == "migrate":
+            try:
+                n = migrate(args.src, args.dst, d, replace=args.replace)
+            except ValueError as e:
+                ap.error(str(e))
+            if args.switch:
+                open_backend(args.dst, d).save_backend_choice(args.dst)
+            print(f"Migrated {n} trades from {args.src} to {args.dst} in {d}")
+        elif args.command == "import-ledger":
+            store = Storage(backend=args.backend, data_dir=d)
+            n = store.import_trades_to_ledger(args.user)
+            print(f"Added {n} fills to {store.ledger_file}")
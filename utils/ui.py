@@ -4,10 +4,73 @@ def app_header(title: str):
     st.title(title)
     st.caption("Multi-market (India/US/Australia) • Multi-currency (INR/USD/AUD) • Swing")
 
+PAGES = ["Record Trade", "Import Trades", "Monthly Report", "Analytics", "Settings"]
+
 def sidebar_nav() -> str:
+    # ?page=<name> opens a page directly (bookmarks, bench/bench_startup.py)
+    start = st.query_params.get("page")
     with st.sidebar:
         st.markdown("## Navigation")
-        return st.radio("Go to", ["Record Trade", "Monthly Report", "Settings"], index=0)
+        return st.radio("Go to", PAGES, index=PAGES.index(start) if start in PAGES else 0)
+
+def sync_status(status: dict):
+    with st.sidebar:
+        if status["pending_since"] is None:
+            st.caption("☁️ GitHub sync: up to date")
+        else:
+            msg = f"☁️ GitHub sync: {status['lag']:.0f}s behind"
+            if status["last_error"]:
+                msg += f" (retry #{status['attempts']}: {status['last_error'][:60]})"
+            st.caption(msg)
+
+def profile_panel(report):
+    # startup profiler output (JOURNAL_PROFILE=1); None on warm runs
+    if not report:
+        return
+    with st.sidebar.expander(f"⏱ Startup: {report['page']} in {report['run_ms']:.0f} ms"):
+        st.caption(f"{'Cold' if report['cold'] else 'Warm'} process; heavy modules loaded: "
+                   f"{', '.join(report['loaded']) or 'none'}")
+        for p in report["phases"]:
+            st.caption(f"{p['phase']}: {p['ms']:.0f} ms, {p['new_modules']} modules "
+                       f"{'(' + ', '.join(p['heavy']) + ')' if p['heavy'] else ''}")
+
+def trade_browser(fetch, sorts, key: str):
+    # Paged table over fetch(search, sort, descending, after) -> (rows, next cursor). Only
+    # the current page reaches the browser; previous cursors are kept for "Prev".
+    c1, c2, c3 = st.columns([2, 1, 1])
+    search = c1.text_input("Search symbol / notes", key=f"{key}_q")
+    sort = c2.selectbox("Sort by", sorts, key=f"{key}_sort")
+    descending = c3.toggle("Newest / largest first", value=True, key=f"{key}_desc")
+    pages = st.session_state.setdefault(f"{key}_pages", {"query": None, "cursors": [None]})
+    if pages["query"] != (search, sort, descending):
+        pages.update(query=(search, sort, descending), cursors=[None])
+    rows, nxt = fetch(search, sort, descending, pages["cursors"][-1])
+    st.dataframe(rows, use_container_width=True, hide_index=True)
+    b1, b2, b3 = st.columns([1, 1, 4])
+    if b1.button("◀ Prev", disabled=len(pages["cursors"]) == 1, key=f"{key}_prev"):
+        pages["cursors"].pop()
+        st.rerun()
+    if b2.button("Next ▶", disabled=nxt is None, key=f"{key}_next"):
+        pages["cursors"].append(nxt)
+        st.rerun()
+    b3.caption(f"Page {len(pages['cursors'])}" + ("" if nxt else " (last)"))
+
+def perf_panel(perf):
+    # sidebar toggle: hot-path timers since the last reset, with JSON / Prometheus export
+    with st.sidebar:
+        if not st.toggle("⏱ Perf panel", key="perf_panel"):
+            return
+        snap = perf.snapshot()
+        rows = [{k: t[k] for k in ("name", "calls", "total_ms", "avg_ms", "max_ms", "errors")} for t in snap["timers"]]
+        st.dataframe(rows, use_container_width=True, hide_index=True, height=300)
+        if snap["counters"]:
+            st.caption(" • ".join(f"{k}: {v:g}" for k, v in sorted(snap["counters"].items())))
+        c1, c2, c3 = st.columns(3)
+        c1.download_button("JSON", perf.to_json(), file_name="journal_perf.json", mime="application/json")
+        c2.download_button("Prom", perf.to_prometheus(), file_name="journal_perf.prom", mime="text/plain")
+        if c3.button("Reset", key="perf_reset"):
+            perf.reset()
+            st.rerun()
 
 def currency_badge(ccy: str) -> str:
     colors = {"INR": "#e76f51", "USD": "#2a9d8f", "AUD": "#457b9d"}